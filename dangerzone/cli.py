@@ -1,24 +1,69 @@
 import logging
+import os
 import sys
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import click
 from colorama import Back, Fore, Style
 
-from . import args, errors, shutdown, startup
-from .document import ARCHIVE_SUBDIR, SAFE_EXTENSION
-from .isolation_provider.container import Container
-from .isolation_provider.dummy import Dummy
-from .isolation_provider.qubes import Qubes, is_qubes_native_conversion
-from .logic import DangerzoneCore
+from . import args, errors
+from .conversion_errors import DEFAULT_FIDELITY, FIDELITY_PROFILES
+from .document import ARCHIVE_SUBDIR, SAFE_EXTENSION, Document
+from .journal import Journal
+from .logic import DangerzoneCore, get_supported_extensions
+from .scheduler import Order
 from .settings import Settings
 from .util import get_version, replace_control_chars
 
+if TYPE_CHECKING:
+    from .isolation_provider.base import IsolationProvider
+
+log = logging.getLogger(__name__)
+
 
 def print_header(s: str) -> None:
     click.echo("")
     click.echo(Style.BRIGHT + s)
 
 
+def iter_documents(
+    directories: tuple[str, ...], files_from: str | None, archive: bool
+) -> Iterator[Document]:
+    """Lazily create documents from directories and file lists.
+
+    Only files with a supported extension are taken into account. Documents are
+    created as the directories and file lists are read, and they are validated right
+    before their conversion.
+    """
+    extensions = set(get_supported_extensions())
+    for directory in directories:
+        yield from Document.from_directory(
+            directory, extensions=extensions, archive=archive
+        )
+
+    if files_from is None:
+        return
+
+    with click.open_file(files_from, "rb") as f:
+        for line in f:
+            filename = os.fsdecode(line.rstrip(b"\r\n"))
+            if not filename:
+                continue
+            sanitized = replace_control_chars(filename)
+            if os.path.splitext(filename)[1].lower() not in extensions:
+                log.warning(f"Skipping '{sanitized}', as its format is not supported")
+                continue
+            # A bad entry must not abort the documents that follow it.
+            try:
+                doc = Document(filename, archive=archive, lazy=True)
+            except errors.DocumentFilenameException as e:
+                log.warning(f"Skipping '{sanitized}': {e}")
+                continue
+            yield doc
+
+
 @click.command()
 @click.option(
     "--output-filename",
@@ -32,6 +77,74 @@ def print_header(s: str) -> None:
     flag_value=True,
     help=f"Archives the unsafe version in a subdirectory named '{ARCHIVE_SUBDIR}'",
 )
+@click.option(
+    "--recursive",
+    "directories",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False),
+    metavar="DIR",
+    help=(
+        "Convert all the documents with a supported format under a directory and its"
+        " subdirectories. Can be specified multiple times."
+    ),
+)
+@click.option(
+    "--files-from",
+    type=click.Path(exists=True, allow_dash=True, dir_okay=False),
+    metavar="FILE",
+    help=(
+        "Read the filenames of the documents to convert from a file, one per line."
+        " Use '-' to read them from the standard input."
+    ),
+)
+@click.option(
+    "--order",
+    type=click.Choice([o.value for o in Order]),
+    default=Order.ADDED.value,
+    show_default=True,
+    help=(
+        "The order in which documents are converted: in the order they were"
+        " provided, or smallest first, so that large documents do not hold back"
+        " the rest."
+    ),
+)
+@click.option(
+    "--fidelity",
+    type=click.Choice(list(FIDELITY_PROFILES)),
+    default=DEFAULT_FIDELITY,
+    show_default=True,
+    help=(
+        "The resolution of the safe documents: 'fast' for text documents, or 'high'"
+        " for scans and images that need more detail, at the cost of speed and size."
+    ),
+)
+@click.option(
+    "--ocr-workers",
+    type=click.IntRange(min=1),
+    nargs=2,
+    metavar="MIN MAX",
+    help=(
+        "The minimum and maximum number of pages to OCR in parallel. Within these"
+        " limits, the number of workers follows the load of the system. Defaults to"
+        " 1 and the number of CPUs."
+    ),
+)
+@click.option(
+    "--ocr-queue",
+    type=click.IntRange(min=1),
+    help=(
+        "How many pages may wait for OCR. Defaults to the maximum number of OCR"
+        " workers."
+    ),
+)
+@click.option(
+    "--resume",
+    flag_value=True,
+    help=(
+        "Resume a previous run with the same arguments that was interrupted. Documents"
+        " that were converted successfully and have not changed since are skipped."
+    ),
+)
 @click.option(
     "--unsafe-dummy-conversion", "dummy_conversion", flag_value=True, hidden=True
 )
@@ -48,6 +161,26 @@ def print_header(s: str) -> None:
     flag_value=True,
     help="Run Dangerzone in debug mode, to get logs from gVisor.",
 )
+@click.option(
+    "--debug-log-dir",
+    type=click.Path(file_okay=False, allow_dash=True),
+    metavar="DIR",
+    help=(
+        "With --debug, write the debug output of each conversion to a file in this"
+        " directory while the conversion runs. Use '-' to log it as it arrives"
+        " instead."
+    ),
+)
+@click.option(
+    "--debug-log-max-bytes",
+    type=click.IntRange(min=1),
+    metavar="BYTES",
+    help=(
+        "With --debug, how many bytes of the most recent debug output of each"
+        " conversion to keep, and log once the conversion completes. Defaults to 1"
+        " MiB."
+    ),
+)
 @click.option(
     "--set-container-runtime",
     required=False,
@@ -80,6 +213,15 @@ def run(
     debug: bool,
     set_container_runtime: str | None = None,
     linger: bool = False,
+    directories: tuple[str, ...] = (),
+    files_from: str | None = None,
+    resume: bool = False,
+    order: str = Order.ADDED.value,
+    fidelity: str = DEFAULT_FIDELITY,
+    ocr_workers: tuple[int, int] | None = None,
+    ocr_queue: int | None = None,
+    debug_log_dir: str | None = None,
+    debug_log_max_bytes: int | None = None,
 ) -> None:
     setup_logging()
     display_banner()
@@ -96,23 +238,71 @@ def run(
             )
             click.echo(f"Set the settings container_runtime to {container_runtime}")
         sys.exit(0)
-    elif not filenames:
+    elif not filenames and not directories and not files_from:
         raise click.UsageError("Missing argument 'FILENAMES...'")
 
+    assert filenames is not None
+    # The isolation providers and the startup/shutdown tasks pull in PyMuPDF and the
+    # updater, so we import them only once we know that we have to convert documents.
+    # This keeps `--version`, `--help` and usage errors fast.
+    from . import shutdown, startup
+    from .isolation_provider.container import Container
+    from .isolation_provider.dummy import Dummy
+    from .isolation_provider.qubes import Qubes, is_qubes_native_conversion
+
+    # Keep a journal of the conversions, so that an interrupted run can be resumed.
+    # The journal is identified by the arguments of the run.
+    journal = Journal.for_job(
+        {
+            "filenames": [os.path.abspath(f) for f in filenames],
+            "directories": [os.path.abspath(d) for d in directories],
+            "files_from": (
+                files_from if files_from in (None, "-") else os.path.abspath(files_from)
+            ),
+            "output_filename": output_filename,
+            "archive": archive,
+            "ocr_lang": ocr_lang,
+            "fidelity": fidelity,
+        },
+        resume=resume,
+    )
+
+    if ocr_workers and ocr_workers[0] > ocr_workers[1]:
+        raise click.BadParameter(
+            "MIN must not be greater than MAX", param_hint="--ocr-workers"
+        )
+    min_workers, max_workers = ocr_workers or (1, None)
+    provider_args: dict[str, Any] = {
+        "fidelity": fidelity,
+        "ocr_min_workers": min_workers,
+        "ocr_max_workers": max_workers,
+        "ocr_max_queued": ocr_queue,
+    }
+    if debug_log_dir:
+        provider_args["stream_stderr"] = True
+        if debug_log_dir != "-":
+            provider_args["stderr_log_dir"] = Path(debug_log_dir)
+    if debug_log_max_bytes:
+        provider_args["stderr_max_bytes"] = debug_log_max_bytes
     if getattr(sys, "dangerzone_dev", False) and dummy_conversion:
-        dangerzone = DangerzoneCore(Dummy())
+        provider: IsolationProvider = Dummy(**provider_args)
     elif is_qubes_native_conversion():
-        dangerzone = DangerzoneCore(Qubes())
+        provider = Qubes(**provider_args)
     else:
-        dangerzone = DangerzoneCore(Container(debug=debug))
+        provider = Container(debug=debug, **provider_args)
+    dangerzone = DangerzoneCore(provider, journal=journal)
 
-    if len(filenames) == 1 and output_filename:
-        dangerzone.add_document_from_filename(filenames[0], output_filename, archive)
-    elif len(filenames) > 1 and output_filename:
+    streamed = bool(directories or files_from)
+    if output_filename and (len(filenames) > 1 or streamed):
         click.echo("--output-filename can only be used with one input file.")
         sys.exit(1)
-    else:
-        for filename in filenames:
+
+    for filename in filenames:
+        if journal.is_completed(filename):
+            journal.skip(filename)
+        elif output_filename:
+            dangerzone.add_document_from_filename(filename, output_filename, archive)
+        else:
             dangerzone.add_document_from_filename(filename, archive=archive)
 
     # Validate OCR language
@@ -154,7 +344,15 @@ def run(
             )
             sys.exit(1)
         print_header("Converting document(s) to safe PDF")
-        dangerzone.convert_documents(ocr_lang)
+        if streamed:
+            documents = journal.filter_pending(
+                iter_documents(directories, files_from, archive)
+            )
+            dangerzone.convert_documents(
+                ocr_lang, documents=documents, order=Order(order)
+            )
+        else:
+            dangerzone.convert_documents(ocr_lang, order=Order(order))
     finally:
         if dangerzone.isolation_provider.requires_install() and not linger:
             task_container_stop = shutdown.ContainerStopTask()
@@ -165,6 +363,17 @@ def run(
     documents_safe = dangerzone.get_safe_documents()
     documents_failed = dangerzone.get_failed_documents()
 
+    if journal.skipped:
+        print_header(
+            f"Skipped {len(journal.skipped)} document(s) converted in a previous run"
+        )
+
+    # Keep the journal around only if there's something left to resume.
+    if documents_failed:
+        journal.close()
+    else:
+        journal.remove()
+
     if documents_safe != []:
         print_header("Safe PDF(s) created successfully")
         for document in documents_safe:
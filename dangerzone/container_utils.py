@@ -1,4 +1,7 @@
+import atexit
+import contextlib
 import functools
+import http.client
 import json
 import logging
 import os
@@ -6,17 +9,21 @@ import platform
 import shutil
 import subprocess
 import sys
-from collections.abc import Iterable
+import threading
+from collections.abc import Generator, Iterable
 from pathlib import Path, PurePosixPath
+from typing import IO, Any
 
 from dangerzone.podman.errors.exceptions import PodmanNotInstalled
 
 from . import errors
+from .podman.client import PodmanClient
 from .podman.command import PodmanCommand
-from .podman.errors import CommandError
+from .podman.errors import APIError, CommandError, PodmanError
 from .settings import Settings
 from .util import (
     get_cache_dir,
+    get_host_memory,
     get_resource_path,
     get_tails_socks_proxy,
     get_version,
@@ -28,7 +35,32 @@ CONTAINERS_CONF_PATH = get_cache_dir() / "containers.conf"
 SECCOMP_PATH = get_cache_dir() / "shared" / "seccomp.gvisor.json"
 PODMAN_MACHINE_PREFIX = "dz-internal-"
 PODMAN_MACHINE_NAME = f"{PODMAN_MACHINE_PREFIX}{get_version()}"
+PODMAN_SOCKET_PATH = get_cache_dir() / "podman.sock"
 TIMEOUT_KILL = 5  # Timeout in seconds until the kill command returns.
+TIMEOUT_SERVICE = 10  # Timeout in seconds until the Podman service replies.
+TIMEOUT_EVENTS = 2  # Timeout in seconds until an expected container event arrives.
+
+# How many documents the container isolation provider converts in parallel.
+# FIXME hardcoded 1 until length conversions are better handled
+# https://github.com/freedomofpress/dangerzone/issues/257
+MAX_PARALLEL_CONVERSIONS = 1
+
+# Memory of the Podman machine, per conversion that runs in parallel (in MiB).
+MACHINE_MEMORY_BASE = 1024
+MACHINE_MEMORY_PER_CONVERSION = 1536
+MACHINE_MEMORY_MIN = 2048
+# Round the memory of the machine down to a multiple of this amount (in MiB).
+MACHINE_MEMORY_STEP = 512
+
+# Errors of the Podman REST API, after which we fall back to the Podman CLI.
+PODMAN_API_ERRORS = (
+    APIError,
+    OSError,
+    http.client.HTTPException,
+    ValueError,
+    KeyError,
+    TypeError,
+)
 
 log = logging.getLogger(__name__)
 
@@ -42,16 +74,23 @@ def get_runtime_version() -> tuple[int, int]:
     just knowing the major and minor version, since writing/installing a full-blown
     semver parser is an overkill.
     """
-    # Get the Docker/Podman version, using a Go template.
-    podman = init_podman_command()
-    query = "{{.Client.Version}}"
-
-    try:
-        version = podman.run(["version", "-f", query])
-        assert isinstance(version, str)
-    except Exception as e:
-        msg = f"Could not get the version of Podman: {e}"
-        raise RuntimeError(msg) from e
+    version = None
+    client = get_podman_client()
+    if client is not None:
+        with podman_api_fallback("get the version of Podman"):
+            version = client.version()["Version"]
+
+    if version is None:
+        # Get the Docker/Podman version, using a Go template.
+        podman = init_podman_command()
+        query = "{{.Client.Version}}"
+
+        try:
+            version = podman.run(["version", "-f", query])
+            assert isinstance(version, str)
+        except Exception as e:
+            msg = f"Could not get the version of Podman: {e}"
+            raise RuntimeError(msg) from e
 
     # Parse this version and return the major/minor parts, since we don't need the
     # rest.
@@ -139,7 +178,37 @@ def make_seccomp_json_accessible() -> Path | PurePosixPath:
         return SECCOMP_PATH
 
 
-def create_containers_conf() -> Path:
+def get_machine_resources(
+    parallel_conversions: int = MAX_PARALLEL_CONVERSIONS,
+) -> tuple[int, int]:
+    """Get the CPUs and memory (in MiB) of the Podman machine.
+
+    Because the Podman machine is short-lived, it gets all the CPUs of the host. Each
+    conversion that runs in parallel gets `MACHINE_MEMORY_PER_CONVERSION` MiB of
+    memory, on top of a base for the machine itself, but the machine never gets more
+    than half of the total memory of the host, unless that is below
+    `MACHINE_MEMORY_MIN`.
+
+    The size depends only on the host and the number of parallel conversions, and
+    not on its current load, so that the machine is not recreated on every start.
+    """
+    parallel_conversions = max(1, parallel_conversions)
+    cpus = os.cpu_count() or 1
+
+    memory = MACHINE_MEMORY_BASE + MACHINE_MEMORY_PER_CONVERSION * parallel_conversions
+    host_memory = get_host_memory()
+    if host_memory is not None:
+        total, _ = host_memory
+        memory = min(memory, total // 2 // 2**20)
+    memory = max(
+        MACHINE_MEMORY_MIN, memory // MACHINE_MEMORY_STEP * MACHINE_MEMORY_STEP
+    )
+    return cpus, memory
+
+
+def create_containers_conf(
+    parallel_conversions: int = MAX_PARALLEL_CONVERSIONS,
+) -> Path:
     # Determine path of vendored Podman helpers.
     #
     # We cannot simply use the vendored Podman binary in order to start a Podman
@@ -165,25 +234,34 @@ def create_containers_conf() -> Path:
     volume = volume.replace("\\", "\\\\")
     SECCOMP_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    # Determine CPU count.
+    # Determine the resources of the Podman machine.
     #
     # Because the Podman machine is short-lived, we can employ more CPU cores than the
-    # default for the duration of the conversion.
-    cpu_count = os.cpu_count() or 1
+    # default for the duration of the conversion. Its memory is sized based on the
+    # number of parallel conversions, and the memory of the host.
+    cpus, memory = get_machine_resources(parallel_conversions)
 
     content = f"""\
 [engine]
 helper_binaries_dir=["{helper_binaries_dir}"]
 
 [machine]
-cpus={cpu_count}
+cpus={cpus}
+memory={memory}
 volumes=["{volume}"]
 rosetta=false
 """
-    # FIXME: Do not unconditionally write to this file.
+    # Rewrite the file only if its content has changed, so that Podman does not
+    # consider the configuration modified on every start.
     dst = CONTAINERS_CONF_PATH
     dst.parent.mkdir(parents=True, exist_ok=True)
-    dst.write_text(content)
+    try:
+        changed = dst.read_text() != content
+    except OSError:
+        changed = True
+    if changed:
+        log.debug(f"Writing Podman configuration (cpus={cpus}, memory={memory}MiB)")
+        dst.write_text(content)
     return dst
 
 
@@ -202,7 +280,7 @@ def init_podman_command() -> PodmanCommand:
     options = env = None
     if platform.system() != "Linux" and not settings.custom_runtime_specified():
         env = os.environ.copy()
-        env["CONTAINERS_CONF"] = str(create_containers_conf())
+        env["CONTAINERS_CONF"] = str(create_containers_conf(MAX_PARALLEL_CONVERSIONS))
         options = PodmanCommand.GlobalOptions(
             connection=PODMAN_MACHINE_NAME,
             storage_opt="overlay.mount_program=/usr/bin/fuse-overlayfs",
@@ -231,8 +309,54 @@ def init_podman_command() -> PodmanCommand:
             )
 
 
+@functools.cache
+def get_podman_client() -> PodmanClient | None:
+    """Get a client for the REST API of Podman, if the user has enabled it.
+
+    Forking a `podman` process for every query is slow, so the user can opt in to
+    start a `podman system service` once, and query it over its Unix socket instead.
+    This is supported only on Linux. If the service fails to start, we use the Podman
+    CLI instead.
+    """
+    if not Settings().get("podman_api") or platform.system() != "Linux":
+        return None
+
+    podman = init_podman_command()
+    uri = f"unix://{PODMAN_SOCKET_PATH}"
+    PODMAN_SOCKET_PATH.parent.mkdir(parents=True, exist_ok=True)
+    PODMAN_SOCKET_PATH.unlink(missing_ok=True)
+    try:
+        podman.start_service(
+            uri=uri, time=0, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        podman.wait_for_service(uri, timeout=TIMEOUT_SERVICE)
+    except (PodmanError, OSError) as e:
+        log.warning(f"Could not start the Podman service, using the Podman CLI: {e}")
+        if podman.proc_service is not None:
+            podman.stop_service(timeout=TIMEOUT_KILL)
+        return None
+
+    log.debug(f"Started the Podman service at {uri}")
+    atexit.register(podman.stop_service, timeout=TIMEOUT_KILL)
+    return PodmanClient(base_url=uri)
+
+
+@contextlib.contextmanager
+def podman_api_fallback(action: str) -> Generator[None, None, None]:
+    """Suppress errors of the Podman REST API, so that the caller uses the CLI."""
+    try:
+        yield
+    except PODMAN_API_ERRORS as e:
+        log.warning(f"Could not {action} with the Podman service, using the CLI: {e}")
+
+
 def list_image_digests() -> list[str]:
     """Get the digests of all loaded Dangerzone images."""
+    client = get_podman_client()
+    if client is not None:
+        with podman_api_fallback("list the images"):
+            return [image["Digest"] for image in client.images(expected_image_name())]
+
     podman = init_podman_command()
     return (
         podman.run(
@@ -251,6 +375,16 @@ def list_image_digests() -> list[str]:
 
 def list_containers() -> list[str]:
     """Get all the Dangerzone containers."""
+    containers: list[str] | None = None
+    client = get_podman_client()
+    if client is not None:
+        with podman_api_fallback("list the containers"):
+            containers = [
+                name for cont in client.containers(all=True) for name in cont["Names"]
+            ]
+    if containers is not None:
+        return [cont for cont in containers if cont.startswith(CONTAINER_PREFIX)]
+
     podman = init_podman_command()
     containers = (
         podman.run(
@@ -269,6 +403,21 @@ def list_containers() -> list[str]:
 
 def kill_container(name: str) -> None:
     """Terminate a spawned container."""
+    client = get_podman_client()
+    if client is not None:
+        with podman_api_fallback(f"kill container '{name}'"):
+            try:
+                client.kill(name, timeout=TIMEOUT_KILL)
+            except APIError as e:
+                # The container may have stopped right before invoking this call.
+                if e.status_code not in (404, 409):
+                    raise
+            except TimeoutError:
+                log.warning(
+                    f"Could not kill container '{name}' within {TIMEOUT_KILL} seconds"
+                )
+            return
+
     podman = init_podman_command()
     try:
         # We do not check the exit code of the process here, since the container may
@@ -286,6 +435,187 @@ def kill_container(name: str) -> None:
         log.exception(f"Unexpected error occurred while killing container '{name}'")
 
 
+def kill_containers(names: Iterable[str]) -> None:
+    """Terminate and remove spawned containers, with one Podman call for each step."""
+    names = list(names)
+    if not names:
+        return
+
+    client = get_podman_client()
+    if client is not None:
+        # The Podman service does not fork a process per call, so there's no need to
+        # batch them.
+        for name in names:
+            kill_container(name)
+        return
+
+    podman = init_podman_command()
+    try:
+        # As in `kill_container()`, some containers may have stopped in the meantime,
+        # so we don't check the exit code. The containers are started with `--rm`,
+        # but we remove them explicitly as well, in case their cleanup was cut short.
+        podman.run(["kill", *names], check=False, timeout=TIMEOUT_KILL)
+        podman.run(
+            ["rm", "--force", "--ignore", *names], check=False, timeout=TIMEOUT_KILL
+        )
+    except subprocess.TimeoutExpired:
+        log.warning(f"Could not kill containers within {TIMEOUT_KILL} seconds")
+    except Exception:
+        log.exception("Unexpected error occurred while killing containers")
+
+
+def parse_container_event(event: Any) -> tuple[str, str] | None:
+    """Get the name and status of the container of a Podman or Docker event.
+
+    Removed containers have the "remove" status, regardless of the runtime. Return
+    None if the event has an unknown format.
+    """
+    if not isinstance(event, dict):
+        return None
+    if "Name" in event and "Status" in event:
+        # Podman
+        name, status = event["Name"], event["Status"]
+    else:
+        # Docker, which names the removal of a container "destroy"
+        try:
+            name, status = event["Actor"]["Attributes"]["name"], event["Action"]
+        except (KeyError, TypeError):
+            return None
+        if status == "destroy":
+            status = "remove"
+    if not isinstance(name, str) or not isinstance(status, str):
+        return None
+    return name, status
+
+
+class ContainerTracker:
+    """Track the state of the Dangerzone containers through `podman events`.
+
+    A single `podman events` process streams the lifecycle events of the containers,
+    and we keep the latest state of the Dangerzone ones in memory. This way, we don't
+    have to run `podman ps -a` to check which containers exist. The containers that
+    existed before the stream started are listed once.
+
+    The tracker is started at most once. If the stream ends, e.g., because the
+    Podman machine has stopped, or if it has events that we can't parse, the tracker
+    is no longer alive, and the callers should query Podman instead.
+    """
+
+    def __init__(self) -> None:
+        # The last event of each container, by name. Removed containers are dropped.
+        self.states: dict[str, str] = {}
+        self._seen: set[str] = set()
+        self._proc: subprocess.Popen | None = None
+        self._started = False
+        self._alive = False
+        self._cond = threading.Condition()
+
+    def ensure_started(self) -> bool:
+        """Start tracking the containers, if we haven't already. Return if alive."""
+        with self._cond:
+            if self._started:
+                return self._alive
+            self._started = True
+            try:
+                podman = init_podman_command()
+                proc = podman.run(
+                    ["events", "--format", "json", "--filter", "type=container"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    wait=False,
+                )
+                assert isinstance(proc, subprocess.Popen)
+                assert proc.stdout is not None
+            except (errors.ContainerException, PodmanError, OSError) as e:
+                log.warning(f"Could not track the container events: {e}")
+                return False
+            self._proc = proc
+            self._alive = True
+            atexit.register(self.stop)
+            threading.Thread(
+                target=self._read_events, args=(proc.stdout,), daemon=True
+            ).start()
+
+        # List the containers after subscribing to the events, so that we don't miss
+        # any container. Those that had an event in the meantime are up to date.
+        try:
+            containers = list_containers()
+        except (PodmanError, OSError) as e:
+            log.warning(f"Could not list the containers: {e}")
+            self.stop()
+            return False
+        with self._cond:
+            for name in containers:
+                if name not in self._seen:
+                    self.states[name] = "unknown"
+            return self._alive
+
+    def _read_events(self, stream: IO[bytes]) -> None:
+        for line in stream:
+            try:
+                parsed = parse_container_event(json.loads(line))
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                # If we miss an event, we may report a container as running forever,
+                # or worse, as removed. Let the callers query the containers instead.
+                log.warning(f"Could not parse container event: {line!r}")
+                self.stop()
+                return
+            name, status = parsed
+            if not name.startswith(CONTAINER_PREFIX):
+                continue
+            with self._cond:
+                self._seen.add(name)
+                if status == "remove":
+                    self.states.pop(name, None)
+                else:
+                    self.states[name] = status
+                self._cond.notify_all()
+
+        log.debug("The stream of container events has ended")
+        with self._cond:
+            self._alive = False
+            self._cond.notify_all()
+
+    def is_alive(self) -> bool:
+        with self._cond:
+            return self._alive
+
+    def containers(self) -> list[str]:
+        """Get the Dangerzone containers that have not been removed."""
+        with self._cond:
+            return list(self.states)
+
+    def wait_until_removed(self, name: str, timeout: float) -> bool:
+        """Wait until a container is removed, or the tracker is no longer alive.
+
+        Return True if the container has been removed.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: name not in self.states or not self._alive, timeout=timeout
+            )
+            return name not in self.states
+
+    def stop(self) -> None:
+        """Stop tracking the containers."""
+        with self._cond:
+            proc = self._proc
+            self._proc = None
+            self._alive = False
+            self._cond.notify_all()
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=TIMEOUT_KILL)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+CONTAINER_TRACKER = ContainerTracker()
+
+
 def delete_image_digests(
     digests: Iterable[str], container_name: str | None = None
 ) -> None:
@@ -342,8 +672,18 @@ def tag_image_by_digest(digest: str, tag: str) -> None:
     """Tag a container image by digest.
     The sha256: prefix should be omitted from the digest.
     """
-    podman = init_podman_command()
     image_id = get_image_id_by_digest(digest)
+    client = get_podman_client()
+    if client is not None:
+        repo, sep, tag_name = tag.rpartition(":")
+        if not sep or "/" in tag_name:
+            # The tag has no version part, e.g., 'localhost:5000/image'.
+            repo, tag_name = tag, "latest"
+        with podman_api_fallback(f"tag image '{image_id}'"):
+            client.tag(image_id, repo, tag_name)
+            return
+
+    podman = init_podman_command()
     podman.run(["tag", image_id, tag])
 
 
@@ -355,10 +695,16 @@ def get_image_id_by_digest(digest: str) -> str:
     # "podman images -f digest:<digest>", but it's only available
     # for podman >=4.4 (and bookworm ships 4.3)
     # So, fallback on the json format instead
-    podman = init_podman_command()
-    res = podman.run(["images", "--format", "json"])
-    assert isinstance(res, str)
-    images = json.loads(res)
+    images = None
+    client = get_podman_client()
+    if client is not None:
+        with podman_api_fallback("list the images"):
+            images = client.images()
+    if images is None:
+        podman = init_podman_command()
+        res = podman.run(["images", "--format", "json"])
+        assert isinstance(res, str)
+        images = json.loads(res)
     filtered_images = [
         image["Id"] for image in images if image["Digest"] == f"sha256:{digest}"
     ]
@@ -394,15 +740,21 @@ def get_local_image_digest(image: str | None = None) -> str:
     # update scenario.
     # `podman inspect` is avoided here as it returns the digest of the
     # architecture-bound image.
-    podman = init_podman_command()
-    res = podman.run(["images", expected_image, "--format", "{{.Digest}}"])
-    assert isinstance(res, str)
-    lines = set(res.split("\n"))
+    lines = None
+    client = get_podman_client()
+    if client is not None:
+        with podman_api_fallback("list the images"):
+            lines = {image["Digest"] for image in client.images(expected_image)}
+    if lines is None:
+        podman = init_podman_command()
+        res = podman.run(["images", expected_image, "--format", "{{.Digest}}"])
+        assert isinstance(res, str)
+        # `podman images` exits 0 with no output when the image is absent,
+        # at least on some platforms.
+        lines = set(res.split("\n")) if res else set()
     line_count = len(lines)
 
-    # `podman images` exits 0 with no output when the image is absent,
-    # at least on some platforms.
-    if not res or line_count < 1:
+    if line_count < 1:
         raise errors.ImageNotPresentException(
             f"The image {expected_image} does not exist locally"
         )
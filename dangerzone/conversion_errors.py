@@ -14,6 +14,32 @@ MAX_PAGE_HEIGHT = 10000
 DEFAULT_DPI = 150  # Pixels per inch
 INT_BYTES = 2
 
+# The resolution (in pixels per inch) of the pages, per fidelity profile. Lower
+# resolutions make conversions faster and safe documents smaller, at the cost of
+# quality.
+FIDELITY_PROFILES = {"fast": 100, "standard": DEFAULT_DPI, "high": 300}
+DEFAULT_FIDELITY = "standard"
+
+# If the host advertises it, the doc-to-pixels process sends an extended header
+# before the page count. The header starts with a magic number, which is larger than
+# MAX_PAGES, so that it can't be mistaken for the page count of older processes.
+PROTOCOL_MAGIC = 0x445A  # "DZ"
+PROTOCOL_VERSION = 1
+# Optional protocol features, as a bitmask. The doc-to-pixels process may use only
+# the features that the host has advertised.
+FEATURE_COLORSPACE = 0x0001  # Each page is tagged with its colorspace
+FEATURE_COMPRESSION = 0x0002  # The pixels of each page are compressed with zlib
+PROTOCOL_FEATURES = FEATURE_COLORSPACE | FEATURE_COMPRESSION
+
+# Compressed pixels are sent as a frame, prefixed by its length.
+FRAME_LENGTH_BYTES = 4
+
+# The colorspaces of the pages. Bilevel pages have one bit per pixel, where 1 is
+# black, and each of their rows is padded to a whole byte.
+COLORSPACE_RGB = 0
+COLORSPACE_GRAY = 1
+COLORSPACE_BILEVEL = 2
+
 
 class ConverterProcException(Exception):
     """Some exception occurred in the converter"""
@@ -101,6 +127,34 @@ class PageCountMismatch(PagesException):
     )
 
 
+class ConversionCancelled(ConversionException):
+    """The user cancelled the conversion (raised only by the client)"""
+
+    error_code = ERROR_SHIFT + 110
+    error_message = "The conversion was cancelled"
+
+
+class InvalidProtocolHeader(ConversionException):
+    """The doc-to-pixels process sent an invalid header (raised only by the client)"""
+
+    error_code = ERROR_SHIFT + 111
+    error_message = "The conversion process sent an invalid header"
+
+
+class InvalidPageColorspace(ConversionException):
+    """A page has an unknown colorspace (raised only by the client)"""
+
+    error_code = ERROR_SHIFT + 112
+    error_message = "A page has an invalid colorspace"
+
+
+class InvalidCompressedPage(ConversionException):
+    """The pixels of a page can't be decompressed (raised only by the client)"""
+
+    error_code = ERROR_SHIFT + 113
+    error_message = "A page has invalid compressed data"
+
+
 class UnexpectedConversionError(ConversionException):
     error_code = ERROR_SHIFT + 100
     error_message = "Some unexpected error occurred while converting the document"
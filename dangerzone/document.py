@@ -4,6 +4,7 @@ import os
 import platform
 import re
 import secrets
+from collections.abc import Callable, Collection, Iterator
 from pathlib import Path, PurePosixPath, PureWindowsPath
 
 from . import errors, util
@@ -13,14 +14,35 @@ ARCHIVE_SUBDIR = "unsafe"
 
 log = logging.getLogger(__name__)
 
+StateCallback = Callable[["Document", enum.auto, enum.auto], None]
+
 
 class Document:
     """Track the state of a single document.
 
     The Document class is responsible for holding the state of a single
     document, and validating its info.
+
+    Documents can be created in large numbers (e.g., when converting whole
+    directories), so we use slots and cache the paths that we derive from the input
+    filename. Passing `lazy=True` defers validating and announcing the input file
+    until `validate_input()` is called, which happens right before its conversion.
     """
 
+    __slots__ = (
+        "_archive",
+        "_default_output_filename",
+        "_input_filename",
+        "_lazy",
+        "_output_filename",
+        "_sanitized_output_filename",
+        "_state",
+        "_state_callbacks",
+        "_suffix",
+        "_validated",
+        "id",
+    )
+
     # document conversion state
     STATE_UNCONVERTED = enum.auto()
     STATE_CONVERTING = enum.auto()
@@ -33,6 +55,7 @@ class Document:
         output_filename: str | None = None,
         suffix: str = SAFE_EXTENSION,
         archive: bool = False,
+        lazy: bool = False,
     ) -> None:
         # NOTE: See https://github.com/freedomofpress/dangerzone/pull/216#discussion_r1015449418
         self.id = secrets.token_urlsafe(6)[0:6]
@@ -41,6 +64,12 @@ class Document:
         self._output_filename: str | None = None
         self._archive = False
         self._suffix = suffix
+        self._state = Document.STATE_UNCONVERTED
+        self._state_callbacks: list[StateCallback] = []
+        self._lazy = lazy
+        self._validated = False
+        self._default_output_filename: str | None = None
+        self._sanitized_output_filename: tuple[str, str] | None = None
 
         if input_filename:
             self.input_filename = input_filename
@@ -48,10 +77,56 @@ class Document:
             if output_filename:
                 self.output_filename = output_filename
 
-        self.state = Document.STATE_UNCONVERTED
-
         self.archive_after_conversion = archive
 
+    @classmethod
+    def from_directory(
+        cls,
+        path: str,
+        extensions: Collection[str] | None = None,
+        recursive: bool = True,
+        suffix: str = SAFE_EXTENSION,
+        archive: bool = False,
+    ) -> Iterator["Document"]:
+        """Create lazily validated documents for the files under a directory.
+
+        Documents are yielded as soon as they are found, so that callers can start
+        working on them before the walk completes. If `extensions` is specified, only
+        files with one of these (lowercase) extensions are considered. Files that end
+        with `suffix` are the output of previous conversions, and are skipped. Symbolic
+        links to directories, as well as the subdirectories where we archive the
+        original documents, are not followed.
+        """
+        dirs = [cls.normalize_filename(path)]
+        while dirs:
+            current = dirs.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                log.warning(f"Could not list directory: {e}")
+                continue
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and entry.name != ARCHIVE_SUBDIR:
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if entry.name.endswith(suffix):
+                    continue
+                ext = os.path.splitext(entry.name)[1].lower()
+                if extensions is None or ext in extensions:
+                    yield cls(entry.path, suffix=suffix, archive=archive, lazy=True)
+
+            # Visit the subdirectories in alphabetical order.
+            dirs.extend(reversed(subdirs))
+
     @staticmethod
     def normalize_filename(filename: str) -> str:
         return os.path.abspath(filename)
@@ -103,8 +178,20 @@ class Document:
     @input_filename.setter
     def input_filename(self, filename: str) -> None:
         filename = self.normalize_filename(filename)
-        self.validate_input_filename(filename)
         self._input_filename = filename
+        self._default_output_filename = None
+        self._validated = False
+        if not self._lazy:
+            self.validate_input()
+
+    def validate_input(self) -> None:
+        """Validate the input file, unless it has already been validated."""
+        if self._validated:
+            return
+        self.validate_input_filename(self.input_filename)
+        if self._archive:
+            self.validate_default_archive_dir()
+        self._validated = True
         self.announce_id()
 
     @property
@@ -125,7 +212,12 @@ class Document:
 
     @property
     def sanitized_output_filename(self) -> str:
-        return util.replace_control_chars(self.output_filename)
+        output_filename = self.output_filename
+        cached = self._sanitized_output_filename
+        if cached is None or cached[0] != output_filename:
+            cached = (output_filename, util.replace_control_chars(output_filename))
+            self._sanitized_output_filename = cached
+        return cached[1]
 
     @property
     def suffix(self) -> str:
@@ -135,6 +227,7 @@ class Document:
     def suffix(self, suf: str) -> None:
         if self._output_filename is None:
             self._suffix = suf
+            self._default_output_filename = None
         else:
             raise errors.SuffixNotApplicableException()
 
@@ -145,7 +238,9 @@ class Document:
     @archive_after_conversion.setter
     def archive_after_conversion(self, enabled: bool) -> None:
         if enabled:
-            self.validate_default_archive_dir()
+            # Lazily created documents check their archive dir in `validate_input()`.
+            if not self._lazy or self._validated:
+                self.validate_default_archive_dir()
             self._archive = True
         else:
             self._archive = False
@@ -170,7 +265,11 @@ class Document:
 
     @property
     def default_output_filename(self) -> str:
-        return f"{os.path.splitext(self.input_filename)[0]}{self.suffix}"
+        if self._default_output_filename is None:
+            self._default_output_filename = (
+                f"{os.path.splitext(self.input_filename)[0]}{self.suffix}"
+            )
+        return self._default_output_filename
 
     def announce_id(self) -> None:
         sanitized_filename = util.replace_control_chars(self.input_filename)
@@ -190,6 +289,30 @@ class Document:
 
         self._output_filename = os.path.join(new_path, old_filename)
 
+    @property
+    def state(self) -> enum.auto:
+        return self._state
+
+    @state.setter
+    def state(self, new_state: enum.auto) -> None:
+        old_state = self._state
+        self._state = new_state
+        for callback in self._state_callbacks:
+            callback(self, old_state, new_state)
+
+    def add_state_callback(self, callback: StateCallback) -> None:
+        """Register a function that will be called on every state change.
+
+        The function receives the document, its old state, and its new state.
+        """
+        self._state_callbacks.append(callback)
+
+    def remove_state_callback(self, callback: StateCallback) -> None:
+        try:
+            self._state_callbacks.remove(callback)
+        except ValueError:
+            pass
+
     def is_unconverted(self) -> bool:
         return self.state is Document.STATE_UNCONVERTED
 
@@ -217,13 +340,11 @@ class Document:
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Document):
             return False
-        return (
-            Path(self.input_filename).absolute()
-            == Path(other.input_filename).absolute()
-        )
+        # Input filenames are always normalized to absolute paths.
+        return self.input_filename == other.input_filename
 
     def __hash__(self) -> int:
-        return hash(str(Path(self.input_filename).absolute()))
+        return hash(self.input_filename)
 
     def __str__(self) -> str:
         return self.input_filename
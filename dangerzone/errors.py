@@ -163,6 +163,10 @@ class OtherMachineRunningError(Exception):
     pass
 
 
+class MachineLeaseError(Exception):
+    pass
+
+
 class WSLException(Exception):
     pass
 
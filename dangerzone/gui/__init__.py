@@ -33,6 +33,7 @@ class Application(QtWidgets.QApplication):
     document_selected = QtCore.Signal(list)
     application_activated = QtCore.Signal()
     color_scheme_changed = QtCore.Signal()
+    pdf_viewers_found = QtCore.Signal()
 
     def __init__(self, *args: typing.Any, **kwargs: typing.Any) -> None:
         super().__init__(*args, **kwargs)
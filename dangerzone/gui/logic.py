@@ -1,8 +1,10 @@
+import json
 import logging
 import os
 import platform
 import shlex
 import subprocess
+import threading
 import typing
 from collections import OrderedDict
 from pathlib import Path
@@ -28,10 +30,17 @@ if platform.system() == "Linux":
 
 from ..isolation_provider.base import IsolationProvider
 from ..logic import DangerzoneCore
-from ..util import get_resource_path, replace_control_chars
+from ..util import get_cache_dir, get_resource_path, replace_control_chars
 
 log = logging.getLogger(__name__)
 
+PDF_VIEWERS_CACHE = "pdf_viewers.json"
+PDF_VIEWERS_CACHE_VERSION = 1
+
+
+def get_pdf_viewers_cache() -> Path:
+    return get_cache_dir() / PDF_VIEWERS_CACHE
+
 
 class DangerzoneGui(DangerzoneCore):
     """
@@ -50,8 +59,14 @@ class DangerzoneGui(DangerzoneCore):
         # Preload font
         self.fixed_font = QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont)
 
-        # Preload ordered list of PDF viewers on computer, starting with default
-        self.pdf_viewers = self._find_pdf_viewers()
+        # Find the ordered list of PDF viewers on computer, starting with default.
+        # This may take a while, so it happens in the background, and the
+        # application emits `pdf_viewers_found` once it's done.
+        self.pdf_viewers: OrderedDict[str, str] = OrderedDict()
+        self._pdf_viewers_thread = threading.Thread(
+            target=self._load_pdf_viewers, daemon=True
+        )
+        self._pdf_viewers_thread.start()
 
         # Are we done waiting (for Docker Desktop to be installed, or for container to install)
         self.is_waiting_finished = False
@@ -78,6 +93,7 @@ class DangerzoneGui(DangerzoneCore):
 
         elif platform.system() == "Linux":
             # Get the PDF reader command
+            self.wait_for_pdf_viewers()
             args = shlex.split(self.pdf_viewers[self.settings.get("open_app")])
             # %f, %F, %u, and %U are filenames or URLS -- so replace with the file to open
             for i in range(len(args)):
@@ -94,6 +110,17 @@ class DangerzoneGui(DangerzoneCore):
             log.info(Fore.YELLOW + "> " + Fore.CYAN + args_str)
             subprocess.Popen(args)
 
+    def _load_pdf_viewers(self) -> None:
+        try:
+            self.pdf_viewers = self._find_pdf_viewers()
+        except Exception:
+            log.exception("Could not find the PDF viewers of the system")
+        self.app.pdf_viewers_found.emit()
+
+    def wait_for_pdf_viewers(self, timeout: float | None = None) -> None:
+        """Wait until the PDF viewers of the system have been found."""
+        self._pdf_viewers_thread.join(timeout)
+
     def _find_pdf_viewers(self) -> OrderedDict[str, str]:
         pdf_viewers: OrderedDict[str, str] = OrderedDict()
         if platform.system() == "Linux":
@@ -114,57 +141,104 @@ class DangerzoneGui(DangerzoneCore):
                 )
                 log.debug(f"xdg-mime query failed: {e}")
 
-            # Find all .desktop files
-            # Use dict.fromkeys (rather than a set) to retain paths order
-            # (only dict keys are used, values are set to `None`)
-            for search_path in dict.fromkeys(
+            for filename, name, exec in self._find_desktop_pdf_viewers():
+                pdf_viewers[name] = exec
+
+                # Put the default entry first
+                if filename == default_pdf_viewer:
+                    pdf_viewers.move_to_end(name, last=False)
+
+        return pdf_viewers
+
+    def _find_desktop_pdf_viewers(self) -> list[tuple[str, str, str]]:
+        """Find the desktop entries that can open PDFs.
+
+        Return the filename, name, and command of each desktop entry. Parsing all the
+        desktop entries is slow, so the result is cached, until the contents of one of
+        the application directories change.
+        """
+        # Use dict.fromkeys (rather than a set) to retain paths order
+        # (only dict keys are used, values are set to `None`)
+        search_paths = [
+            os.path.join(data_dir, "applications")
+            for data_dir in dict.fromkeys(
                 os.environ.get(
                     "XDG_DATA_DIRS",
                     "/usr/local/share:/usr/share",
                 ).split(":")
                 + [os.path.expanduser("~/.local/share")]
+            )
+        ]
+        mtimes: dict[str, float | None] = {}
+        for search_path in search_paths:
+            try:
+                mtimes[search_path] = os.stat(search_path).st_mtime
+            except OSError:
+                mtimes[search_path] = None
+
+        cache_path = get_pdf_viewers_cache()
+        try:
+            with cache_path.open("r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if (
+                cache["version"] == PDF_VIEWERS_CACHE_VERSION
+                and cache["mtimes"] == mtimes
             ):
-                search_path = os.path.join(search_path, "applications")
-                try:
-                    for filename in os.listdir(search_path):
-                        full_filename = os.path.join(search_path, filename)
-                        if os.path.splitext(filename)[1] == ".desktop":
-                            # See which ones can open PDFs
-                            try:
-                                desktop_entry = DesktopEntry(full_filename)
-                            except ParsingError:
-                                # Do not stop when encountering malformed desktop entries
-                                continue
-                            except Exception:
-                                log.exception(
-                                    "Encountered the following exception while processing desktop entry %s",
-                                    full_filename,
-                                )
-                            else:
-                                desktop_entry_name = desktop_entry.getName()
-                                if (
-                                    "application/pdf" in desktop_entry.getMimeTypes()
-                                    and "dangerzone" not in desktop_entry_name.lower()
-                                ):
-                                    pdf_viewers[desktop_entry_name] = (
-                                        desktop_entry.getExec()
-                                    )
-
-                                    # Put the default entry first
-                                    if filename == default_pdf_viewer:
-                                        try:
-                                            pdf_viewers.move_to_end(
-                                                desktop_entry_name, last=False
-                                            )
-                                        except KeyError as e:
-                                            # Should be unreachable
-                                            log.error(
-                                                f"Problem reordering applications: {e}"
-                                            )
-                except FileNotFoundError:
-                    pass
-
-        return pdf_viewers
+                log.debug(f"Using the cached PDF viewers from {cache_path}")
+                return [tuple(entry) for entry in cache["viewers"]]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.debug(f"Ignoring the cached PDF viewers: {e}")
+
+        viewers = []
+        for search_path in search_paths:
+            viewers += self._parse_desktop_entries(search_path)
+
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with cache_path.open("w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": PDF_VIEWERS_CACHE_VERSION,
+                        "mtimes": mtimes,
+                        "viewers": viewers,
+                    },
+                    f,
+                )
+        except OSError as e:
+            log.debug(f"Could not cache the PDF viewers: {e}")
+        return viewers
+
+    def _parse_desktop_entries(self, search_path: str) -> list[tuple[str, str, str]]:
+        viewers = []
+        try:
+            for filename in os.listdir(search_path):
+                full_filename = os.path.join(search_path, filename)
+                if os.path.splitext(filename)[1] == ".desktop":
+                    # See which ones can open PDFs
+                    try:
+                        desktop_entry = DesktopEntry(full_filename)
+                    except ParsingError:
+                        # Do not stop when encountering malformed desktop entries
+                        continue
+                    except Exception:
+                        log.exception(
+                            "Encountered the following exception while processing desktop entry %s",
+                            full_filename,
+                        )
+                    else:
+                        desktop_entry_name = desktop_entry.getName()
+                        if (
+                            "application/pdf" in desktop_entry.getMimeTypes()
+                            and "dangerzone" not in desktop_entry_name.lower()
+                        ):
+                            viewers.append(
+                                (filename, desktop_entry_name, desktop_entry.getExec())
+                            )
+        except FileNotFoundError:
+            pass
+        return viewers
 
 
 class Dialog(QtWidgets.QDialog):
@@ -3,8 +3,8 @@ import logging
 import os
 import platform
 import tempfile
+import threading
 import typing
-from multiprocessing.pool import ThreadPool
 
 from dangerzone.gui import shutdown, startup
 from dangerzone.gui.updater import prompt_for_checks
@@ -27,7 +27,8 @@ else:
 
 from .. import errors
 from ..document import SAFE_EXTENSION, Document
-from ..isolation_provider.qubes import is_qubes_native_conversion
+from ..logic import get_supported_extensions
+from ..scheduler import ConversionWorkers, Order, Scheduler
 from ..util import get_resource_path, get_version
 from .log_window import LogHandler, LogWindow
 from .logic import Alert, CollapsibleBox, DangerzoneGui, Dialog, Question, UpdateDialog
@@ -121,13 +122,31 @@ in order to get security updates.</p>
 HAMBURGER_MENU_SIZE = 30
 
 
+STATUS_IMAGE_SIZE = 15
+STATUS_IMAGES = [
+    "status_unconverted.png",
+    "status_converting.png",
+    "status_failed.png",
+    "status_safe.png",
+]
+
+
+# NOTE: The images below are cached for the lifetime of the process, and shared among
+# the widgets that use them. Images for different color schemes have different
+# filenames, so switching schemes does not read them again either.
+@functools.cache
+def load_resource(filename: str) -> QtCore.QByteArray:
+    """Read the contents of a resource file."""
+    return QtCore.QByteArray(get_resource_path(filename).read_bytes())
+
+
+@functools.cache
 def load_svg_image(filename: str, width: int, height: int) -> QtGui.QPixmap:
     """Load an SVG image from a filename.
 
     This answer is basically taken from: https://stackoverflow.com/a/25689790
     """
-    path = get_resource_path(filename)
-    svg_renderer = QtSvg.QSvgRenderer(str(path))
+    svg_renderer = QtSvg.QSvgRenderer(load_resource(filename))
     image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
     # Set the ARGB to 0 to prevent rendering artifacts
     image.fill(0x00000000)
@@ -136,6 +155,23 @@ def load_svg_image(filename: str, width: int, height: int) -> QtGui.QPixmap:
     return pixmap
 
 
+@functools.cache
+def load_status_image(filename: str) -> QtGui.QPixmap:
+    img = QtGui.QImage.fromData(load_resource(filename))
+    image = QtGui.QPixmap.fromImage(img)
+    return image.scaled(QtCore.QSize(STATUS_IMAGE_SIZE, STATUS_IMAGE_SIZE))
+
+
+def preload_images() -> None:
+    """Load the images that the main window shows, before it's built."""
+    for filename in STATUS_IMAGES:
+        load_status_image(filename)
+    for filename in ["spinner.svg", "spinner-dark.svg"]:
+        load_resource(filename)
+    load_svg_image("hamburger_menu.svg", width=64, height=64)
+    load_svg_image("document.svg", width=20, height=24)
+
+
 def animate_svg_image(
     filename: str, width: int, height: int, fps: int = 20
 ) -> QSvgWidget:
@@ -153,53 +189,13 @@ def animate_svg_image(
     [2] https://developer.mozilla.org/en-US/docs/Web/SVG/Reference/Element/animateTransform
     [3] https://github.com/yjg30737/pyqt-animated-svg-example
     """
-    path = get_resource_path(filename)
     svg_widget = QSvgWidget()
     svg_widget.renderer().setFramesPerSecond(fps)
-    svg_widget.load(str(path))
+    svg_widget.load(load_resource(filename))
     svg_widget.setFixedSize(width, height)
     return svg_widget
 
 
-def get_supported_extensions() -> list[str]:
-    supported_ext = [
-        ".pdf",
-        ".docx",
-        ".doc",
-        ".docm",
-        ".xlsx",
-        ".xls",
-        ".pptx",
-        ".ppt",
-        ".odt",
-        ".odg",
-        ".odp",
-        ".ods",
-        ".epub",
-        ".jpg",
-        ".jpeg",
-        ".gif",
-        ".png",
-        ".tif",
-        ".tiff",
-        ".bmp",
-        ".pnm",
-        ".pbm",
-        ".ppm",
-        ".svg",
-    ]
-
-    # XXX: We disable loading HWP/HWPX files on Qubes, because H2ORestart does not work there.
-    # See:
-    #
-    # https://github.com/freedomofpress/dangerzone/issues/494
-    hwp_filters = [".hwp", ".hwpx"]
-    if is_qubes_native_conversion():
-        supported_ext += hwp_filters
-
-    return supported_ext
-
-
 class StatusBar(QtWidgets.QStatusBar):
     def __init__(self, dangerzone: DangerzoneGui) -> None:
         super().__init__()
@@ -236,7 +232,7 @@ class StatusBar(QtWidgets.QStatusBar):
             spinner_svg = "spinner-dark.svg"
         else:
             spinner_svg = "spinner.svg"
-        self.spinner.load(str(get_resource_path(spinner_svg)))
+        self.spinner.load(load_resource(spinner_svg))
 
     def set_status_ok(self, message: str) -> None:
         self.spinner.hide()
@@ -308,6 +304,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowTitle("Dangerzone")
         self.setWindowIcon(self.dangerzone.get_window_icon())
         self.dialog: Dialog | None = None
+        preload_images()
 
         self.setMinimumWidth(600)
         if platform.system() == "Darwin":
@@ -835,6 +832,8 @@ class MainWindow(QtWidgets.QMainWindow):
             if not accept_exit:
                 e.ignore()
                 return
+            # Stop the running conversions, so that their sandboxes exit quickly.
+            self.dangerzone.cancel_conversions()
 
         ret = 2 if converting_docs else 1 if failed_docs else 0
         # We are ignoring the close event, because we want to show progress messages in
@@ -951,12 +950,17 @@ class ConversionWidget(QtWidgets.QWidget):
         self.restart_button = QtWidgets.QPushButton("Start another conversion")
         self.restart_button.clicked.connect(self.reset_for_new_conversion)
         self.restart_button.hide()
+        self.cancel_button = QtWidgets.QPushButton("Cancel conversions")
+        self.cancel_button.clicked.connect(self.cancel_clicked)
+        self.cancel_button.hide()
         self.restart_button_layout = QtWidgets.QHBoxLayout()
         self.restart_button_layout.addStretch()
         self.restart_button_layout.addWidget(self.restart_button)
+        self.restart_button_layout.addWidget(self.cancel_button)
         self.restart_button_layout.addStretch()
 
         self.documents_list.all_conversions_finished.connect(self.restart_button.show)
+        self.documents_list.all_conversions_finished.connect(self.cancel_button.hide)
 
         # Enqueued widget
         self.enqueued_widget = QtWidgets.QWidget()
@@ -969,7 +973,7 @@ class ConversionWidget(QtWidgets.QWidget):
             spinner_svg = "spinner.svg"
         self.spinner = animate_svg_image(spinner_svg, width=15, height=15)
         self.tick_icon = QtWidgets.QLabel()
-        pixmap = self.load_status_image("status_safe.png")
+        pixmap = load_status_image("status_safe.png")
         self.tick_icon.setPixmap(pixmap)
         self.tick_icon.hide()
 
@@ -1003,13 +1007,7 @@ class ConversionWidget(QtWidgets.QWidget):
             spinner_svg = "spinner-dark.svg"
         else:
             spinner_svg = "spinner.svg"
-        self.spinner.load(str(get_resource_path(spinner_svg)))
-
-    def load_status_image(self, filename: str) -> QtGui.QPixmap:
-        path = get_resource_path(filename)
-        img = QtGui.QImage(str(path))
-        image = QtGui.QPixmap.fromImage(img)
-        return image.scaled(QtCore.QSize(15, 15))
+        self.spinner.load(load_resource(spinner_svg))
 
     def conversion_is_ready_to_start(self) -> None:
         self.spinner.hide()
@@ -1076,6 +1074,7 @@ class ConversionWidget(QtWidgets.QWidget):
         self.documents_list.clear()
         self.documents_list.hide()
         self.restart_button.hide()
+        self.cancel_button.hide()
         self.doc_selection_wrapper.show()
         self.conversion_started = False
 
@@ -1083,10 +1082,14 @@ class ConversionWidget(QtWidgets.QWidget):
         self.conversion_started = True
         self.settings_widget.hide()
         self.documents_list.show()
+        self.cancel_button.show()
         self.documents_list.start_conversion()
         if self.documents_list.conversion_pending:
             self.enqueued_widget.show()
 
+    def cancel_clicked(self) -> None:
+        self.dangerzone.cancel_conversions()
+
 
 class DocSelectionWidget(QtWidgets.QWidget):
     documents_selected = QtCore.Signal(list)
@@ -1348,8 +1351,8 @@ class SettingsWidget(QtWidgets.QWidget):
             )
             self.open_checkbox.clicked.connect(self.update_ui)
             self.open_combobox = QtWidgets.QComboBox()
-            for k in self.dangerzone.pdf_viewers:
-                self.open_combobox.addItem(k, self.dangerzone.pdf_viewers[k])
+            # The PDF viewers are found in the background.
+            self.dangerzone.app.pdf_viewers_found.connect(self.update_pdf_viewers)
 
         open_layout = QtWidgets.QHBoxLayout()
         open_layout.addWidget(self.open_checkbox)
@@ -1431,11 +1434,21 @@ class SettingsWidget(QtWidgets.QWidget):
             self.open_checkbox.setCheckState(QtCore.Qt.Unchecked)
 
         if platform.system() == "Linux":
-            index = self.open_combobox.findText(
-                self.dangerzone.settings.get("open_app")
-            )
-            if index != -1:
-                self.open_combobox.setCurrentIndex(index)
+            self.update_pdf_viewers()
+
+    def update_pdf_viewers(self) -> None:
+        # Keep the choice of the user, if they made one while we were still looking
+        # for PDF viewers.
+        selected = self.open_combobox.currentText() or self.dangerzone.settings.get(
+            "open_app"
+        )
+        self.open_combobox.clear()
+        for k in self.dangerzone.pdf_viewers:
+            self.open_combobox.addItem(k, self.dangerzone.pdf_viewers[k])
+
+        index = self.open_combobox.findText(selected)
+        if index != -1:
+            self.open_combobox.setCurrentIndex(index)
 
     def check_safe_extension_is_valid(self) -> bool:
         if self.save_checkbox.checkState() == QtCore.Qt.Unchecked:
@@ -1575,18 +1588,72 @@ class SettingsWidget(QtWidgets.QWidget):
         self.start_clicked.emit()
 
 
+# Deliver the progress of the conversions to the GUI at most 10 times per second.
+PROGRESS_UPDATE_INTERVAL_MS = 100
+
+
+class ProgressAggregator(QtCore.QObject):
+    """Coalesce the progress updates of the conversions.
+
+    Conversions may report their progress once per page, from several threads at
+    once. Instead of flooding the event loop with a signal per update, we keep only
+    the latest update of each document, and deliver it at a fixed rate.
+    """
+
+    updated = QtCore.Signal(object, bool, str, int)
+
+    def __init__(self, interval_ms: int = PROGRESS_UPDATE_INTERVAL_MS) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pending: dict[Document, tuple[bool, str, int]] = {}
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def push(self, document: Document, error: bool, text: str, percentage: int) -> None:
+        """Queue a progress update. Can be called from any thread."""
+        with self._lock:
+            pending = self._pending.get(document)
+            # Never let a progress update hide an error that was not delivered yet.
+            if pending is not None and pending[0] and not error:
+                return
+            self._pending[document] = (error, text, percentage)
+
+    def flush(self) -> None:
+        """Deliver the pending updates."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        for document, (error, text, percentage) in pending.items():
+            self.updated.emit(document, error, text, percentage)
+
+    def start(self) -> None:
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def stop(self) -> None:
+        self.timer.stop()
+        self.flush()
+
+    def clear(self) -> None:
+        self.timer.stop()
+        with self._lock:
+            self._pending = {}
+
+
 class ConvertTask(QtCore.QObject):
-    finished = QtCore.Signal(bool)
-    update = QtCore.Signal(bool, str, int)
+    finished = QtCore.Signal(object, bool)
 
     def __init__(
         self,
         dangerzone: DangerzoneGui,
         document: Document,
+        progress: ProgressAggregator,
         ocr_lang: str | None = None,
     ) -> None:
         super().__init__()
         self.document = document
+        self.progress = progress
         self.ocr_lang = ocr_lang
         self.error = False
         self.dangerzone = dangerzone
@@ -1597,47 +1664,234 @@ class ConvertTask(QtCore.QObject):
             self.ocr_lang,
             self.progress_callback,
         )
-        self.finished.emit(self.error)
+        self.finished.emit(self.document, self.error)
 
     def progress_callback(self, error: bool, text: str, percentage: int) -> None:
         if error:
             self.error = True
 
-        self.update.emit(error, text, percentage)
+        self.progress.push(self.document, error, text, percentage)
+
+
+class DocumentProgress:
+    """The latest progress update of a document in the documents list."""
+
+    __slots__ = ("document", "error", "percentage", "text")
+
+    def __init__(self, document: Document) -> None:
+        self.document = document
+        self.error = False
+        self.text = ""
+        self.percentage = 0
+
 
+class DocumentsListModel(QtCore.QAbstractListModel):
+    """List model of the documents that are being converted, and their progress."""
 
-class DocumentsListWidget(QtWidgets.QListWidget):
+    DocumentRole = QtCore.Qt.UserRole
+    ProgressRole = QtCore.Qt.UserRole + 1
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.documents: list[Document] = []
+        self.rows: list[DocumentProgress] = []
+        self.row_index: dict[Document, int] = {}
+
+    def rowCount(self, parent: QtCore.QModelIndex | None = None) -> int:
+        if parent is not None and parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(
+        self, index: QtCore.QModelIndex, role: int = QtCore.Qt.DisplayRole
+    ) -> typing.Any:
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        row = self.rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return os.path.basename(row.document.input_filename)
+        elif role == QtCore.Qt.ToolTipRole:
+            return row.text or os.path.basename(row.document.input_filename)
+        elif role == self.DocumentRole:
+            return row.document
+        elif role == self.ProgressRole:
+            return row
+        return None
+
+    def add_documents(self, docs: list[Document]) -> None:
+        if not docs:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(docs) - 1)
+        for i, doc in enumerate(docs, start=first):
+            self.documents.append(doc)
+            self.rows.append(DocumentProgress(doc))
+            self.row_index[doc] = i
+        self.endInsertRows()
+
+    def set_documents(self, docs: list[Document]) -> None:
+        self.beginResetModel()
+        self.documents = []
+        self.rows = []
+        self.row_index = {}
+        for i, doc in enumerate(docs):
+            self.documents.append(doc)
+            self.rows.append(DocumentProgress(doc))
+            self.row_index[doc] = i
+        self.endResetModel()
+
+    def update_progress(
+        self, document: Document, error: bool, text: str, percentage: int
+    ) -> None:
+        i = self.row_index.get(document)
+        if i is None:
+            return
+        row = self.rows[i]
+        if error:
+            row.error = True
+            row.text = text
+        elif not row.error:
+            row.text = text
+            row.percentage = percentage
+        self.document_changed(document)
+
+    def document_changed(self, document: Document) -> None:
+        """Notify the views that a document must be repainted."""
+        i = self.row_index.get(document)
+        if i is not None:
+            index = self.index(i)
+            self.dataChanged.emit(index, index)
+
+
+class DocumentItemDelegate(QtWidgets.QStyledItemDelegate):
+    """Paint the documents of the documents list.
+
+    Each row shows the conversion status, the name of the document, and either its
+    progress or its error. Rows are painted on demand, so that the painting cost
+    scales with the visible rows, and the status images are shared among them.
+    """
+
+    MARGIN = 9
+    SPACING = 6
+    NAME_WIDTH = 200
+
+    def __init__(self, parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        self.status_images = {
+            Document.STATE_UNCONVERTED: load_status_image("status_unconverted.png"),
+            Document.STATE_CONVERTING: load_status_image("status_converting.png"),
+            Document.STATE_FAILED: load_status_image("status_failed.png"),
+            Document.STATE_SAFE: load_status_image("status_safe.png"),
+        }
+
+    def sizeHint(
+        self, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex
+    ) -> QtCore.QSize:
+        return QtCore.QSize(500, 50)
+
+    def paint(
+        self,
+        painter: QtGui.QPainter,
+        option: QtWidgets.QStyleOptionViewItem,
+        index: QtCore.QModelIndex,
+    ) -> None:
+        row: DocumentProgress | None = index.data(DocumentsListModel.ProgressRole)
+        if row is None:
+            return
+        widget = option.widget
+        style = widget.style() if widget else QtWidgets.QApplication.style()
+        style.drawPrimitive(
+            QtWidgets.QStyle.PE_PanelItemViewItem, option, painter, widget
+        )
+
+        rect = option.rect.adjusted(self.MARGIN, 0, -self.MARGIN, 0)
+        painter.save()
+
+        # Conversion status image
+        size = STATUS_IMAGE_SIZE
+        pixmap = self.status_images[row.document.state]
+        painter.drawPixmap(
+            rect.left(), rect.top() + (rect.height() - size) // 2, pixmap
+        )
+        rect.setLeft(rect.left() + size + self.SPACING)
+
+        # Document name, elided with '...' when it's too long
+        name_rect = QtCore.QRect(rect)
+        name_rect.setWidth(self.NAME_WIDTH)
+        elided = option.fontMetrics.elidedText(
+            index.data(QtCore.Qt.DisplayRole), QtCore.Qt.ElideMiddle, self.NAME_WIDTH
+        )
+        painter.drawText(
+            name_rect, QtCore.Qt.AlignVCenter | QtCore.Qt.AlignLeft, elided
+        )
+        rect.setLeft(rect.left() + self.NAME_WIDTH + self.SPACING)
+
+        if row.error:
+            painter.drawText(
+                rect,
+                QtCore.Qt.AlignVCenter | QtCore.Qt.AlignLeft | QtCore.Qt.TextWordWrap,
+                row.text,
+            )
+        else:
+            progress = QtWidgets.QStyleOptionProgressBar()
+            progress.rect = rect.adjusted(0, self.MARGIN, 0, -self.MARGIN)
+            progress.state = option.state | QtWidgets.QStyle.State_Horizontal
+            progress.minimum = 0
+            progress.maximum = 100
+            progress.progress = row.percentage
+            progress.text = f"{row.percentage}%"
+            progress.textVisible = True
+            style.drawControl(
+                QtWidgets.QStyle.CE_ProgressBar, progress, painter, widget
+            )
+
+        painter.restore()
+
+
+class DocumentsListWidget(QtWidgets.QListView):
     all_conversions_finished = QtCore.Signal()
 
     def __init__(self, dangerzone: DangerzoneGui) -> None:
         super().__init__()
         self.dangerzone = dangerzone
-        self.docs_list: list[Document] = []
-        self.docs_list_widget_map: dict[Document, DocumentWidget] = {}
         self.submitted_docs: set[Document] = set()
         self.conversion_pending = False
-
-        # Initialize thread_pool only on the first conversion
+        # Convert the smallest documents first, so that a few large documents do not
+        # hold back the rest.
+        self.scheduler = Scheduler(Order.SIZE)
+        self.tasks: dict[Document, ConvertTask] = {}
+
+        # Only the visible rows are painted, so that the cost of the list does not
+        # grow with the number of documents.
+        self.documents_model = DocumentsListModel()
+        self.setModel(self.documents_model)
+        self.setItemDelegate(DocumentItemDelegate(self))
+        self.setUniformItemSizes(True)
+        self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+
+        self.progress = ProgressAggregator()
+        self.progress.updated.connect(self.documents_model.update_progress)
+
+        # Start the conversion workers only on the first conversion
         # to ensure docker-daemon detection logic runs first
-        self.thread_pool_initized = False
+        self.workers: ConversionWorkers | None = None
+
+    @property
+    def docs_list(self) -> list[Document]:
+        return self.documents_model.documents
+
+    @docs_list.setter
+    def docs_list(self, docs: list[Document]) -> None:
+        self.documents_model.set_documents(docs)
 
     def clear(self) -> None:
-        self.docs_list = []
-        self.docs_list_widget_map = {}
         self.submitted_docs = set()
-        super().clear()
+        self.progress.clear()
+        self.documents_model.set_documents([])
 
     def documents_added(self, docs: list[Document]) -> None:
-        for document in docs:
-            item = QtWidgets.QListWidgetItem()
-            item.setSizeHint(QtCore.QSize(500, 50))
-            widget = DocumentWidget(self.dangerzone, document)
-            self.addItem(item)
-            self.setItemWidget(item, widget)
-
-            # Keep docs_list in sync with items list
-            self.docs_list.append(document)
-            self.docs_list_widget_map[document] = widget
+        self.documents_model.add_documents(docs)
 
     def start_conversion(self) -> None:
         if not self.dangerzone.is_waiting_finished:
@@ -1647,24 +1901,58 @@ class DocumentsListWidget(QtWidgets.QListWidget):
 
         self.conversion_pending = False
         log.debug("Starting conversion")
-        if not self.thread_pool_initized:
+        if self.workers is None:
             max_jobs = self.dangerzone.isolation_provider.get_max_parallel_conversions()
-            self.thread_pool = ThreadPool(max_jobs)
-            self.thread_pool_initized = True
+            self.workers = ConversionWorkers(
+                self.scheduler, self._convert_document, max_jobs
+            )
+            self.workers.start()
 
+        self.progress.start()
         for doc in self.docs_list:
             if doc in self.submitted_docs:
                 continue
             self.submitted_docs.add(doc)
-            task = ConvertTask(self.dangerzone, doc, self.get_ocr_lang())
-            doc_widget = self.docs_list_widget_map[doc]
-            task.update.connect(doc_widget.update_progress)
-            task.finished.connect(doc_widget.all_done)
-            task.finished.connect(self._on_doc_done)
-            self.thread_pool.apply_async(task.convert_document)
+            task = ConvertTask(self.dangerzone, doc, self.progress, self.get_ocr_lang())
+            task.finished.connect(self._on_task_finished)
+            self.tasks[doc] = task
+            # The workers convert whichever document the scheduler picks next.
+            self.dangerzone.submit_document(self.scheduler, doc)
+
+    def _convert_document(self, doc: Document) -> None:
+        self.tasks.pop(doc).convert_document()
+
+    def show_context_menu(self, pos: QtCore.QPoint) -> None:
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return
+        document = index.data(DocumentsListModel.DocumentRole)
+        if document.is_safe() or document.is_failed():
+            return
+
+        menu = QtWidgets.QMenu(self)
+        cancel_action = menu.addAction("Cancel conversion")
+        cancel_action.triggered.connect(
+            lambda: self.dangerzone.cancel_conversions([document])
+        )
+        menu.exec(self.viewport().mapToGlobal(pos))
+
+    def _on_task_finished(self, document: Document, error: bool) -> None:
+        # Make sure that the last updates of the document are shown, before handling
+        # the end of its conversion.
+        self.progress.flush()
+        self.documents_model.document_changed(document)
+
+        if not error and self.dangerzone.settings.get("open"):
+            self.dangerzone.open_pdf_viewer(document.output_filename)
+
+        self._on_doc_done()
 
     def _on_doc_done(self) -> None:
-        if all(doc.is_safe() or doc.is_failed() for doc in self.docs_list):
+        # Query the state indexes, instead of scanning the documents after each
+        # conversion.
+        if not self.dangerzone.has_pending_documents():
+            self.progress.stop()
             self.all_conversions_finished.emit()
 
     def get_ocr_lang(self) -> str | None:
@@ -1676,100 +1964,6 @@ class DocumentsListWidget(QtWidgets.QListWidget):
         return ocr_lang
 
 
-class DocumentWidget(QtWidgets.QWidget):
-    def __init__(
-        self,
-        dangerzone: DangerzoneGui,
-        document: Document,
-    ) -> None:
-        super().__init__()
-        self.dangerzone = dangerzone
-        self.document = document
-
-        self.error = False
-
-        # Dangerous document label
-        self.dangerous_doc_label = QtWidgets.QLabel()
-        self.dangerous_doc_label.setAlignment(
-            QtCore.Qt.AlignVCenter | QtCore.Qt.AlignLeft
-        )
-        doc_name = os.path.basename(self.document.input_filename)
-        self.dangerous_doc_label.setToolTip(doc_name)
-        self.dangerous_doc_label.setMinimumWidth(200)
-        self.dangerous_doc_label.setMaximumWidth(200)
-        # Elide text with '...' when the filename is too long for the label width
-        metrics = self.dangerous_doc_label.fontMetrics()
-        elided = metrics.elidedText(doc_name, QtCore.Qt.ElideMiddle, 200)
-        self.dangerous_doc_label.setText(elided)
-
-        # Conversion status images
-        self.img_status_unconverted = self.load_status_image("status_unconverted.png")
-        self.img_status_converting = self.load_status_image("status_converting.png")
-        self.img_status_failed = self.load_status_image("status_failed.png")
-        self.img_status_safe = self.load_status_image("status_safe.png")
-        self.status_image = QtWidgets.QLabel()
-        self.status_image.setMaximumWidth(15)
-        self.status_image.setPixmap(self.img_status_unconverted)
-
-        # Error label
-        self.error_label = QtWidgets.QLabel()
-        self.error_label.setAlignment(QtCore.Qt.AlignVCenter | QtCore.Qt.AlignLeft)
-        self.error_label.setWordWrap(True)
-        self.error_label.setTextFormat(QtCore.Qt.PlainText)
-        self.error_label.hide()  # only show on error
-
-        # Progress bar
-        self.progress = QtWidgets.QProgressBar()
-        self.progress.setRange(0, 100)
-        self.progress.setValue(0)
-
-        # Layout
-        layout = QtWidgets.QHBoxLayout()
-        layout.addWidget(self.status_image)
-        layout.addWidget(self.dangerous_doc_label)
-        layout.addWidget(self.progress)
-        layout.addWidget(self.error_label)
-        self.setLayout(layout)
-
-    def update_progress(self, error: bool, text: str, percentage: int) -> None:
-        self.update_status_image()
-        if error:
-            self.error = True
-            self.error_label.setText(text)
-            self.error_label.setToolTip(text)
-            self.error_label.show()
-            self.progress.hide()
-        else:
-            self.progress.setToolTip(text)
-            self.progress.setValue(percentage)
-
-    def load_status_image(self, filename: str) -> QtGui.QPixmap:
-        path = get_resource_path(filename)
-        img = QtGui.QImage(str(path))
-        image = QtGui.QPixmap.fromImage(img)
-        return image.scaled(QtCore.QSize(15, 15))
-
-    def update_status_image(self) -> None:
-        if self.document.is_unconverted():
-            self.status_image.setPixmap(self.img_status_unconverted)
-        elif self.document.is_converting():
-            self.status_image.setPixmap(self.img_status_converting)
-        elif self.document.is_failed():
-            self.status_image.setPixmap(self.img_status_failed)
-        elif self.document.is_safe():
-            self.status_image.setPixmap(self.img_status_safe)
-
-    def all_done(self) -> None:
-        self.update_status_image()
-
-        if self.error:
-            return
-
-        # Open
-        if self.dangerzone.settings.get("open"):
-            self.dangerzone.open_pdf_viewer(self.document.output_filename)
-
-
 class QLabelClickable(QtWidgets.QLabel):
     """QLabel with a 'clicked' event"""
 
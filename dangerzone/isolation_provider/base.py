@@ -1,4 +1,5 @@
 import contextlib
+import functools
 import logging
 import multiprocessing as mp
 import os
@@ -7,26 +8,49 @@ import signal
 import subprocess
 import sys
 import threading
+import time
+import zlib
 from abc import ABC, abstractmethod
 from collections import deque
 from collections.abc import Callable, Iterator
-from concurrent.futures import ProcessPoolExecutor
-from io import BytesIO
-from typing import IO
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from pathlib import Path
+from typing import IO, Any
 
 import fitz
 from colorama import Fore, Style
 
 from .. import conversion_errors as errors
-from ..conversion_errors import DEFAULT_DPI, INT_BYTES
+from ..conversion_errors import DEFAULT_DPI, DEFAULT_FIDELITY, INT_BYTES
 from ..document import Document
+from ..errors import DocumentFilenameException
 from ..util import get_tessdata_dir, replace_control_chars
+from .ocr import OcrScaler
+from .pipeline import Page, Pipeline, Stage
 
 log = logging.getLogger(__name__)
 
 TIMEOUT_EXCEPTION = 15
 TIMEOUT_GRACE = 15
 TIMEOUT_FORCE = 5
+# How often we check if a conversion has been cancelled, while waiting for OCR.
+CANCEL_POLL_INTERVAL = 0.5
+# How many documents we keep the conversion metrics of, until they are read.
+MAX_STATS_DOCUMENTS = 100
+
+# Upper bound for the debug output of the doc-to-pixels process that we keep in
+# memory. gVisor can be very chatty when `RUNSC_DEBUG=1` is set, so we keep only the
+# most recent part of it.
+STDERR_MAX_BYTES = 1024 * 1024
+# Upper bound for a single line that we read from the stderr of the doc-to-pixels
+# process. Longer lines are split into multiple ones.
+STDERR_MAX_LINE_BYTES = 64 * 1024
 
 
 def _signal_process_group(p: subprocess.Popen, signo: int) -> None:
@@ -61,20 +85,179 @@ def kill_process_group(p: subprocess.Popen) -> None:
         _signal_process_group(p, signal.SIGKILL)
 
 
-def read_bytes(f: IO[bytes], size: int, exact: bool = True) -> bytes:
-    """Read bytes from a file-like object."""
-    buf = f.read(size)
-    if exact and len(buf) != size:
-        raise errors.ConverterProcException()
-    return buf
+def max_compressed_size(size: int) -> int:
+    """Get the largest size that zlib can compress `size` bytes into."""
+    # This is a generous version of zlib's compressBound().
+    return size + size // 1000 + 64
 
 
-def read_int(f: IO[bytes]) -> int:
-    """Read 2 bytes from a file-like object, and decode them as int."""
-    untrusted_int = f.read(INT_BYTES)
-    if len(untrusted_int) != INT_BYTES:
-        raise errors.ConverterProcException()
-    return int.from_bytes(untrusted_int, "big", signed=False)
+class ProtocolReader:
+    """Parse the output of the doc-to-pixels process.
+
+    Fields are read into preallocated buffers, and pages into a buffer that is
+    reused across pages, so that reading pages of the same size does not allocate
+    memory for their pixels. Reads that return fewer bytes than requested, as may
+    happen with pipes, are retried until the field is complete.
+    """
+
+    def __init__(self, f: IO[bytes]) -> None:
+        self.f = f
+        self._int_buf = memoryview(bytearray(errors.FRAME_LENGTH_BYTES))
+        self._pixels = bytearray()
+        self._frame = bytearray()
+
+    def readinto(self, view: memoryview) -> None:
+        """Fill a buffer with the output of the process."""
+        pos = 0
+        while pos < len(view):
+            n = self.f.readinto(view[pos:])  # type: ignore[attr-defined]
+            if not n:
+                raise errors.ConverterProcException()
+            pos += n
+
+    def read_into_buffer(self, buf: bytearray, size: int) -> bytearray:
+        """Read `size` bytes into a reusable buffer, resizing it if needed."""
+        if len(buf) > size:
+            del buf[size:]
+        elif len(buf) < size:
+            buf.extend(bytes(size - len(buf)))
+        with memoryview(buf) as view:
+            self.readinto(view)
+        return buf
+
+    def read_int(self, size: int = INT_BYTES) -> int:
+        """Read 2 bytes (by default), and decode them as int."""
+        view = self._int_buf[:size]
+        self.readinto(view)
+        return int.from_bytes(view, "big", signed=False)
+
+    def read_header(self) -> tuple[int, int, int]:
+        """Read the header of the output.
+
+        Return the number of pages, their resolution, and the protocol features that
+        the process uses. Processes that do not send an extended header send only the
+        number of pages, which have the default resolution.
+        """
+        untrusted_int = self.read_int()
+        if untrusted_int != errors.PROTOCOL_MAGIC:
+            return untrusted_int, DEFAULT_DPI, 0
+
+        version = self.read_int()
+        if version != errors.PROTOCOL_VERSION:
+            raise errors.InvalidProtocolHeader(
+                f"Unsupported protocol version {version}"
+            )
+        features = self.read_int()
+        if features & ~errors.PROTOCOL_FEATURES:
+            raise errors.InvalidProtocolHeader(
+                f"Unsupported protocol features {features:#06x}"
+            )
+        dpi = self.read_int()
+        if dpi not in errors.FIDELITY_PROFILES.values():
+            raise errors.InvalidProtocolHeader(f"Unsupported page resolution {dpi} DPI")
+        n_pages = self.read_int()
+        return n_pages, dpi, features
+
+    def read_pixels(self, size: int) -> bytearray:
+        """Read the pixels of a page.
+
+        The returned buffer is overwritten by the next page, so it must be copied if
+        it's needed for longer.
+        """
+        return self.read_into_buffer(self._pixels, size)
+
+    def read_compressed_pixels(self, size: int) -> bytes:
+        """Read the pixels of a page, compressed in a frame of `size` bytes.
+
+        The frame cannot make us read or decompress more data than `size` bytes need,
+        so that a compromised sandbox cannot exhaust the memory of the host.
+        """
+        length = self.read_int(errors.FRAME_LENGTH_BYTES)
+        if length > max_compressed_size(size):
+            raise errors.InvalidCompressedPage()
+        untrusted_frame = self.read_into_buffer(self._frame, length)
+
+        decompressor = zlib.decompressobj()
+        try:
+            untrusted_data = decompressor.decompress(untrusted_frame, size)
+        except zlib.error:
+            raise errors.InvalidCompressedPage()
+        if (
+            len(untrusted_data) != size
+            or not decompressor.eof
+            or decompressor.unconsumed_tail
+            or decompressor.unused_data
+        ):
+            raise errors.InvalidCompressedPage()
+        return untrusted_data
+
+
+def page_size(width: int, height: int, colorspace: int) -> int:
+    """Get the size in bytes of the pixels of a page."""
+    if colorspace == errors.COLORSPACE_RGB:
+        return width * height * 3
+    elif colorspace == errors.COLORSPACE_GRAY:
+        return width * height
+    elif colorspace == errors.COLORSPACE_BILEVEL:
+        return (width + 7) // 8 * height
+    raise errors.InvalidPageColorspace()
+
+
+# The gray samples of the 8 pixels of each possible byte of bilevel pixels. Set bits
+# are black pixels, as in binary PBM images.
+_BILEVEL_TO_GRAY = [
+    bytes(0x00 if byte & (0x80 >> bit) else 0xFF for bit in range(8))
+    for byte in range(256)
+]
+
+
+def bilevel_to_gray(
+    untrusted_data: bytes | bytearray, untrusted_width: int, untrusted_height: int
+) -> bytes:
+    """Expand bilevel pixels (one bit per pixel) into gray ones (one byte per pixel).
+
+    Each row of bilevel pixels is padded to a whole number of bytes. We expand them
+    in Python, so that MuPDF does not have to parse untrusted image data.
+    """
+    row_bytes = (untrusted_width + 7) // 8
+    if len(untrusted_data) != row_bytes * untrusted_height:
+        raise ValueError("Bilevel pixels do not match the size of the page")
+    samples = b"".join(map(_BILEVEL_TO_GRAY.__getitem__, untrusted_data))
+    stride = row_bytes * 8
+    if stride != untrusted_width:
+        # Drop the padding of each row.
+        samples = b"".join(
+            samples[i : i + untrusted_width] for i in range(0, len(samples), stride)
+        )
+    return samples
+
+
+def pixels_to_pixmap(
+    untrusted_data: bytes | bytearray,
+    untrusted_width: int,
+    untrusted_height: int,
+    colorspace: int = errors.COLORSPACE_RGB,
+    dpi: int = DEFAULT_DPI,
+) -> fitz.Pixmap:
+    """Create a pixmap out of the pixels of a page."""
+    if colorspace == errors.COLORSPACE_BILEVEL:
+        samples = bilevel_to_gray(untrusted_data, untrusted_width, untrusted_height)
+        if len(samples) != untrusted_width * untrusted_height:
+            raise ValueError("Gray pixels do not match the size of the page")
+        pixmap = fitz.Pixmap(
+            fitz.csGRAY, untrusted_width, untrusted_height, samples, False
+        )
+    else:
+        cs = fitz.CS_GRAY if colorspace == errors.COLORSPACE_GRAY else fitz.CS_RGB
+        pixmap = fitz.Pixmap(
+            fitz.Colorspace(cs),
+            untrusted_width,
+            untrusted_height,
+            untrusted_data,
+            False,
+        )
+    pixmap.set_dpi(dpi, dpi)
+    return pixmap
 
 
 def sanitize_debug_text(text: bytes) -> str:
@@ -83,6 +266,67 @@ def sanitize_debug_text(text: bytes) -> str:
     return replace_control_chars(untrusted_text, keep_newlines=True)
 
 
+class StderrBuffer:
+    """Keep the most recent output of a process's stderr in memory.
+
+    This is a ring buffer of lines that holds at most `max_bytes` bytes. Once it's
+    full, the oldest lines are dropped to make room for the new ones.
+    """
+
+    def __init__(self, max_bytes: int = STDERR_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.dropped_bytes = 0
+        self._lines: deque[bytes] = deque()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def write(self, line: bytes) -> None:
+        with self._lock:
+            if len(line) > self.max_bytes:
+                self.dropped_bytes += len(line) - self.max_bytes
+                line = line[-self.max_bytes :]
+            self._lines.append(line)
+            self._size += len(line)
+            while self._size > self.max_bytes:
+                dropped = self._lines.popleft()
+                self._size -= len(dropped)
+                self.dropped_bytes += len(dropped)
+
+    def getvalue(self) -> bytes:
+        with self._lock:
+            return b"".join(self._lines)
+
+
+class StderrStreamer:
+    """Sanitize the lines of a process's stderr and forward them as they arrive.
+
+    Lines are sent to the logger, or to a log file, if one is specified. Nothing is
+    kept in memory.
+    """
+
+    def __init__(self, document: Document, log_file: Path | None = None) -> None:
+        self.document = document
+        self.log_file = log_file
+        self._file: IO[str] | None = None
+        if log_file is not None:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            self._file = log_file.open("w", encoding="utf-8")
+
+    def write(self, line: bytes) -> None:
+        text = sanitize_debug_text(line)
+        if self._file is not None:
+            self._file.write(text)
+            self._file.flush()
+        else:
+            text = text.rstrip("\n")
+            log.info(f"[doc {self.document.id}] {text}")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
 def _ocr_pool_initializer() -> None:
     """Initialize OCR worker processes with optimal thread settings."""
     # Limit Tesseract to 1 thread per worker
@@ -97,17 +341,12 @@ def _ocr_page_worker(
     height: int,
     ocr_lang: str,
     tessdata_dir: str,
+    dpi: int = DEFAULT_DPI,
+    colorspace: int = errors.COLORSPACE_RGB,
 ) -> bytes:
     """Worker function for multiprocessing OCR. Returns PDF bytes."""
     try:
-        pixmap = fitz.Pixmap(
-            fitz.Colorspace(fitz.CS_RGB),
-            width,
-            height,
-            pixmap_bytes,
-            False,
-        )
-        pixmap.set_dpi(DEFAULT_DPI, DEFAULT_DPI)
+        pixmap = pixels_to_pixmap(pixmap_bytes, width, height, colorspace, dpi)
         return pixmap.pdfocr_tobytes(
             compress=True,
             language=ocr_lang,
@@ -124,8 +363,52 @@ class IsolationProvider(ABC):
     Abstracts an isolation provider
     """
 
-    def __init__(self, debug: bool = False) -> None:
+    def __init__(
+        self,
+        debug: bool = False,
+        stderr_max_bytes: int = STDERR_MAX_BYTES,
+        stream_stderr: bool = False,
+        stderr_log_dir: Path | None = None,
+        fidelity: str = DEFAULT_FIDELITY,
+        ocr_min_workers: int = 1,
+        ocr_max_workers: int | None = None,
+        ocr_max_queued: int | None = None,
+    ) -> None:
+        """Initialize the isolation provider.
+
+        The debug output of the conversion process is kept in a buffer of at most
+        `stderr_max_bytes` bytes, and logged once the conversion completes. If
+        `stream_stderr` is set, it's logged line by line as it arrives instead, or
+        written to a per-document log file under `stderr_log_dir`, if specified.
+
+        The `fidelity` profile sets the resolution of the pages that the conversion
+        process is asked for.
+
+        Pages are OCRed by `ocr_min_workers` to `ocr_max_workers` worker processes
+        (by default, up to the number of CPUs), depending on the load of the system.
+        At most `ocr_max_queued` pages wait for a worker.
+        """
+        if fidelity not in errors.FIDELITY_PROFILES:
+            raise ValueError(f"Unknown fidelity profile '{fidelity}'")
         self.debug = debug
+        self.fidelity = fidelity
+        self.dpi = errors.FIDELITY_PROFILES[fidelity]
+        self.ocr_min_workers = ocr_min_workers
+        self.ocr_max_workers = ocr_max_workers
+        self.ocr_max_queued = ocr_max_queued
+        self._stats_lock = threading.Lock()
+        # OCR metrics, per document ID
+        self.ocr_stats: dict[str, dict[str, float]] = {}
+        # Metrics of each stage of the conversion pipeline, per document ID
+        self.pipeline_stats: dict[str, dict[str, dict[str, float]]] = {}
+        self.stderr_max_bytes = stderr_max_bytes
+        self.stream_stderr = stream_stderr
+        self.stderr_log_dir = stderr_log_dir
+        # Keep track of the running conversion processes, so that we can stop them
+        # if their conversion is cancelled.
+        self._cancel_lock = threading.Lock()
+        self._cancelled: set[str] = set()
+        self._procs: dict[str, subprocess.Popen] = {}
         if self.should_capture_stderr():
             self.proc_stderr = subprocess.PIPE
         else:
@@ -134,6 +417,46 @@ class IsolationProvider(ABC):
     def should_capture_stderr(self) -> bool:
         return self.debug or getattr(sys, "dangerzone_dev", False)
 
+    def get_protocol_env(self) -> dict[str, str]:
+        """Get the environment that advertises the protocol of the host.
+
+        Conversion processes that understand it reply with an extended header. Older
+        ones ignore it, and send pages at the default resolution.
+        """
+        return {
+            "DZ_PROTOCOL_VERSION": str(errors.PROTOCOL_VERSION),
+            "DZ_PROTOCOL_FEATURES": str(errors.PROTOCOL_FEATURES),
+            "DZ_DPI": str(self.dpi),
+        }
+
+    def cancel(self, document: Document) -> None:
+        """Cancel the conversion of a document.
+
+        If the conversion has not started yet, it will fail as soon as it starts.
+        Else, its conversion process is stopped in the background, and we stop
+        waiting for its OCR results.
+        """
+        if document.is_safe() or document.is_failed():
+            return
+        with self._cancel_lock:
+            self._cancelled.add(document.id)
+            p = self._procs.get(document.id)
+        if p is not None:
+            log.info(f"Cancelling the conversion of doc {document.id}")
+            threading.Thread(
+                target=self.ensure_stop_doc_to_pixels_proc,
+                args=(document, p),
+                daemon=True,
+            ).start()
+
+    def is_cancelled(self, document: Document) -> bool:
+        with self._cancel_lock:
+            return document.id in self._cancelled
+
+    def raise_if_cancelled(self, document: Document) -> None:
+        if self.is_cancelled(document):
+            raise errors.ConversionCancelled()
+
     def convert(
         self,
         document: Document,
@@ -141,8 +464,22 @@ class IsolationProvider(ABC):
         progress_callback: Callable | None = None,
     ) -> None:
         self.progress_callback = progress_callback
+        try:
+            # Skip the documents whose conversion was cancelled while they were
+            # queued, and forget about them.
+            self.raise_if_cancelled(document)
+            # Documents that have been created lazily are validated only now.
+            document.validate_input()
+        except (errors.ConversionCancelled, DocumentFilenameException) as e:
+            with self._cancel_lock:
+                self._cancelled.discard(document.id)
+            self.print_progress(document, True, str(e), 0)
+            document.mark_as_failed()
+            return
+
         document.mark_as_converting()
         try:
+            self.raise_if_cancelled(document)
             with self.doc_to_pixels_proc(document) as conversion_proc:
                 self.convert_with_proc(document, ocr_lang, conversion_proc)
             document.mark_as_safe()
@@ -157,22 +494,25 @@ class IsolationProvider(ABC):
             )
             self.print_progress(document, True, str(e), 0)
             document.mark_as_failed()
+        finally:
+            with self._cancel_lock:
+                self._cancelled.discard(document.id)
 
     def pixels_to_pdf_page(
         self,
-        untrusted_data: bytes,
+        untrusted_data: bytes | bytearray,
         untrusted_width: int,
         untrusted_height: int,
+        dpi: int = DEFAULT_DPI,
+        colorspace: int = errors.COLORSPACE_RGB,
     ) -> fitz.Document:
-        """Convert a byte array of RGB pixels into a PDF page"""
-        pixmap = fitz.Pixmap(
-            fitz.Colorspace(fitz.CS_RGB),
-            untrusted_width,
-            untrusted_height,
-            untrusted_data,
-            False,
+        """Convert a byte array of pixels into a PDF page.
+
+        Grayscale and bilevel pages are stored as DeviceGray images.
+        """
+        pixmap = pixels_to_pixmap(
+            untrusted_data, untrusted_width, untrusted_height, colorspace, dpi
         )
-        pixmap.set_dpi(DEFAULT_DPI, DEFAULT_DPI)
 
         page_doc = fitz.Document()
         page_doc.insert_file(pixmap)
@@ -186,7 +526,6 @@ class IsolationProvider(ABC):
         ocr_lang: str | None,
         p: subprocess.Popen,
     ) -> None:
-        percentage = 0.0
         # Write the content of the to-be-converted document to the stdin of
         # the conversion process.
         with open(document.input_filename, "rb") as f:
@@ -199,130 +538,283 @@ class IsolationProvider(ABC):
 
             # And read the stdout, which should contain the pixel buffers
             assert p.stdout
-            n_pages = read_int(p.stdout)
+            reader = ProtocolReader(p.stdout)
+            n_pages, dpi, features = reader.read_header()
+            if dpi != self.dpi:
+                log.warning(
+                    f"Requested pages at {self.dpi} DPI ({self.fidelity} fidelity),"
+                    f" but the conversion process sends them at {dpi} DPI"
+                )
             if n_pages == 0 or n_pages > errors.MAX_PAGES:
                 raise errors.MaxPagesException()
-            step = 100 / n_pages
 
             safe_doc = fitz.Document()
+            pipeline = self.create_pipeline(
+                document, ocr_lang, reader, features, dpi, n_pages, safe_doc
+            )
+            pipeline.run(Page(number) for number in range(1, n_pages + 1))
+            self.record_pipeline_stats(document, pipeline)
 
-            # If we are doing OCR, start a pool of workers to do it in parallel
-            if ocr_lang:
-                max_workers = max(1, round(mp.cpu_count() / 2))
-                ocr_pool = ProcessPoolExecutor(
-                    max_workers=max_workers,
-                    initializer=_ocr_pool_initializer,
-                    mp_context=mp.get_context("spawn"),
-                )
+        # Ensure nothing else is read after all bitmaps are obtained
+        p.stdout.close()
 
-                # Pre-compute tessdata path to pass to workers (they can't access
-                # sys.dangerzone_dev which is set only in the main process)
-                tessdata_dir = str(get_tessdata_dir())
-                ocr_futures: deque = deque()  # stores (page_num, future) tuples
-                ocr_page_num = 0  # tracks how many pages have completed OCR
-            else:
-                ocr_pool = None
-                tessdata_dir = None
-
-            def drain_ocr_futures(block_until_below: int | None = None) -> None:
-                """
-                Collect completed OCR pages (from the front of the queue)
-                and append them to the resulting safe_doc.
-
-                If block_until_below is set, wait on futures until the
-                queue size drops below that threshold.
-                """
-                nonlocal ocr_page_num
-                while ocr_futures:
-                    if (
-                        block_until_below is not None
-                        and len(ocr_futures) <= block_until_below
-                    ):
-                        break
-                    _, future = ocr_futures[0]
-                    if not future.done():
-                        if block_until_below is None:
-                            break  # non-blocking: stop at first incomplete
-                        future.result()  # blocking: wait for the future to complete
-                    _page, future = ocr_futures.popleft()
-                    page_pdf_bytes = future.result()
-                    page_doc = fitz.open("pdf", page_pdf_bytes)
-                    safe_doc.insert_pdf(page_doc)
-                    ocr_page_num += 1
-                    ocr_percentage = (ocr_page_num / n_pages) * 100
-                    text = f"Converted page {ocr_page_num}/{n_pages} to searchable PDF"
-                    self.print_progress(document, False, text, ocr_percentage)
+        # TODO handle leftover code input
+        text = "Successfully converted document"
+        self.print_progress(document, False, text, 100)
 
-            try:
-                for page in range(1, n_pages + 1):
-                    # Block if too many pages are waiting for OCR, to avoid
-                    # filling RAM with pixel buffers from the sandbox.
-                    # Wait until the queue drains to the number of workers
-                    # before resuming.
-                    if ocr_lang and len(ocr_futures) >= 2 * max_workers:
-                        drain_ocr_futures(block_until_below=max_workers)
-
-                    # Consume each page of the rasterizer's output...
-                    width = read_int(p.stdout)
-                    height = read_int(p.stdout)
-                    if not (1 <= width <= errors.MAX_PAGE_WIDTH):
-                        raise errors.MaxPageWidthException()
-                    if not (1 <= height <= errors.MAX_PAGE_HEIGHT):
-                        raise errors.MaxPageHeightException()
-
-                    num_pixels = width * height * 3  # three color channels
-                    untrusted_pixels = read_bytes(
-                        p.stdout,
-                        num_pixels,
-                    )
+    def create_pipeline(
+        self,
+        document: Document,
+        ocr_lang: str | None,
+        reader: ProtocolReader,
+        features: int,
+        dpi: int,
+        n_pages: int,
+        safe_doc: fitz.Document,
+    ) -> Pipeline:
+        """Create the pipeline that turns the pages of the process into a safe PDF.
+
+        The pages are read from the process, encoded as PDF pages (with OCR, if
+        requested), assembled into the safe document, and finally written to disk.
+        Subclasses can add more stages to this pipeline.
+        """
+        pipeline = Pipeline()
+        pipeline.add_stage(
+            "read", functools.partial(self.read_pages, document, reader, features)
+        )
+        if ocr_lang:
+            encode: Stage = functools.partial(self.ocr_pages, document, ocr_lang, dpi)
+            pipeline.add_stage("ocr", encode)
+        else:
+            pipeline.add_stage("encode", functools.partial(self.encode_pages, dpi))
+        pipeline.add_stage(
+            "assemble",
+            functools.partial(
+                self.assemble_pages, document, safe_doc, n_pages, bool(ocr_lang)
+            ),
+        )
+        pipeline.add_stage(
+            "write", functools.partial(self.write_pages, document, safe_doc)
+        )
+        return pipeline
 
-                    # ... and send them to the OCR worker pool...
-                    if ocr_lang:
-                        assert ocr_pool is not None
-                        assert tessdata_dir is not None
-                        future = ocr_pool.submit(
-                            _ocr_page_worker,
-                            untrusted_pixels,
-                            width,
-                            height,
-                            ocr_lang,
-                            tessdata_dir,
-                        )
-                        ocr_futures.append((page, future))
+    def read_pages(
+        self,
+        document: Document,
+        reader: ProtocolReader,
+        features: int,
+        pages: Iterator[Page],
+    ) -> Iterator[Page]:
+        """Read the pixels of each page from the output of the conversion process.
+
+        The dimensions of each page are validated before its pixels are read, so
+        that the conversion process cannot make us read arbitrary amounts of data.
+        """
+        for page in pages:
+            self.raise_if_cancelled(document)
+            width = reader.read_int()
+            height = reader.read_int()
+            if not (1 <= width <= errors.MAX_PAGE_WIDTH):
+                raise errors.MaxPageWidthException()
+            if not (1 <= height <= errors.MAX_PAGE_HEIGHT):
+                raise errors.MaxPageHeightException()
+            if features & errors.FEATURE_COLORSPACE:
+                colorspace = reader.read_int()
+            else:
+                colorspace = errors.COLORSPACE_RGB
 
-                        # Non-blocking drain of any completed futures
-                        drain_ocr_futures()
-                    else:
-                        # ... Or process immediately (if no OCR is requested)
-                        page_pdf = self.pixels_to_pdf_page(
-                            untrusted_pixels,
-                            width,
-                            height,
-                        )
-                        safe_doc.insert_pdf(page_pdf)
-                        percentage += step
-                        text = f"Converted page {page}/{n_pages} to PDF"
-                        self.print_progress(document, False, text, percentage)
+            num_bytes = page_size(width, height, colorspace)
+            if features & errors.FEATURE_COMPRESSION:
+                page.pixels = reader.read_compressed_pixels(num_bytes)
+            else:
+                page.pixels = reader.read_pixels(num_bytes)
+            page.width = width
+            page.height = height
+            page.colorspace = colorspace
+            yield page
+
+    def encode_pages(self, dpi: int, pages: Iterator[Page]) -> Iterator[Page]:
+        """Convert the pixels of each page into a PDF page."""
+        for page in pages:
+            assert page.pixels is not None
+            page.pdf = self.pixels_to_pdf_page(
+                page.pixels, page.width, page.height, dpi, page.colorspace
+            )
+            page.pixels = None
+            yield page
 
-                # Once all pages have been submitted, wait for remaining futures
-                if ocr_lang:
-                    drain_ocr_futures(block_until_below=0)
+    def ocr_pages(
+        self, document: Document, ocr_lang: str, dpi: int, pages: Iterator[Page]
+    ) -> Iterator[Page]:
+        """Convert the pixels of each page into a searchable PDF page.
 
-            finally:
-                if ocr_pool is not None:
-                    ocr_pool.shutdown()
+        Pages are OCRed in parallel by a pool of workers, whose size is adjusted by
+        an `OcrScaler`, and are yielded in order. At most `max_queued` pages wait for
+        a worker, to avoid filling RAM with pixel buffers from the sandbox.
+        """
+        scaler = OcrScaler(
+            self.ocr_min_workers, self.ocr_max_workers, self.ocr_max_queued
+        )
+        ocr_pool: Executor | None = self.create_ocr_pool(scaler.max_workers)
+        # Pre-compute tessdata path to pass to workers (they can't access
+        # sys.dangerzone_dev which is set only in the main process)
+        tessdata_dir = str(get_tessdata_dir())
+        ocr_pending: deque[tuple[Page, tuple]] = deque()
+        ocr_futures: deque[tuple[Page, Future]] = deque()
+
+        def record_ocr_latency(future: Future, submitted: float) -> None:
+            if not future.cancelled() and future.exception() is None:
+                latency = time.monotonic() - submitted
+                scaler.page_done(latency, pages_waiting=bool(ocr_pending))
+
+        def submit_ocr_pages() -> None:
+            """Send the waiting pages to the OCR workers that are available."""
+            assert ocr_pool is not None
+            running = sum(1 for _, f in ocr_futures if not f.done())
+            while ocr_pending and running < scaler.workers:
+                page, args = ocr_pending.popleft()
+                submitted = time.monotonic()
+                future = ocr_pool.submit(_ocr_page_worker, *args)
+                future.add_done_callback(
+                    functools.partial(record_ocr_latency, submitted=submitted)
+                )
+                ocr_futures.append((page, future))
+                running += 1
+
+        def completed_ocr_pages(block: bool = False) -> Iterator[Page]:
+            """
+            Send the waiting pages to the OCR workers, and yield the completed OCR
+            pages (from the front of the queue).
+
+            If block is set, wait until at least one page completes first.
+            """
+            submit_ocr_pages()
+            if block:
+                # Wait for a page to complete, unless the conversion is cancelled in
+                # the meantime.
+                running = [f for _, f in ocr_futures if not f.done()]
+                while running:
+                    self.raise_if_cancelled(document)
+                    done, _ = wait(
+                        running,
+                        timeout=CANCEL_POLL_INTERVAL,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    if done:
+                        break
+                submit_ocr_pages()
 
-        # Ensure nothing else is read after all bitmaps are obtained
-        p.stdout.close()
+            while ocr_futures and ocr_futures[0][1].done():
+                page, future = ocr_futures.popleft()
+                page.pdf = fitz.open("pdf", future.result())
+                yield page
 
+        try:
+            for page in pages:
+                while len(ocr_pending) >= scaler.max_queued:
+                    yield from completed_ocr_pages(block=True)
+
+                assert page.pixels is not None
+                # The pixels wait for a worker, so they must not be overwritten by
+                # the next page.
+                args = (
+                    bytes(page.pixels),
+                    page.width,
+                    page.height,
+                    ocr_lang,
+                    tessdata_dir,
+                    dpi,
+                    page.colorspace,
+                )
+                page.pixels = None
+                ocr_pending.append((page, args))
+                yield from completed_ocr_pages()
+
+            # Once all pages have been read, wait for the remaining ones
+            while ocr_pending or ocr_futures:
+                yield from completed_ocr_pages(block=True)
+            self.record_ocr_stats(document, scaler)
+        except BaseException:
+            # Do not wait for the OCR of the pending pages, since we won't use it.
+            if ocr_pool is not None:
+                ocr_pool.shutdown(wait=False, cancel_futures=True)
+                ocr_pool = None
+            raise
+        finally:
+            if ocr_pool is not None:
+                ocr_pool.shutdown()
+
+    def assemble_pages(
+        self,
+        document: Document,
+        safe_doc: fitz.Document,
+        n_pages: int,
+        searchable: bool,
+        pages: Iterator[Page],
+    ) -> Iterator[Page]:
+        """Append each PDF page to the safe document."""
+        kind = "searchable PDF" if searchable else "PDF"
+        for page in pages:
+            assert page.pdf is not None
+            safe_doc.insert_pdf(page.pdf)
+            page.pdf = None
+            text = f"Converted page {page.number}/{n_pages} to {kind}"
+            self.print_progress(document, False, text, page.number / n_pages * 100)
+            yield page
+
+    def write_pages(
+        self, document: Document, safe_doc: fitz.Document, pages: Iterator[Page]
+    ) -> Iterator[Page]:
+        """Write the safe document, once all of its pages have been assembled."""
+        yield from pages
         # Saving it with a different name first, because PyMuPDF cannot handle
         # non-Unicode chars.
         safe_doc.save(document.sanitized_output_filename)
         os.replace(document.sanitized_output_filename, document.output_filename)
 
-        # TODO handle leftover code input
-        text = "Successfully converted document"
-        self.print_progress(document, False, text, 100)
+    def _keep_stats(self, stats: dict[str, Any], doc_id: str, value: Any) -> None:
+        # Keep the metrics of the most recent documents only, in case nobody reads
+        # them.
+        with self._stats_lock:
+            stats[doc_id] = value
+            while len(stats) > MAX_STATS_DOCUMENTS:
+                del stats[next(iter(stats))]
+
+    def pop_pipeline_stats(
+        self, document: Document
+    ) -> dict[str, dict[str, float]] | None:
+        """Get the metrics of the pipeline stages for a document, and forget them."""
+        with self._stats_lock:
+            return self.pipeline_stats.pop(document.id, None)
+
+    def pop_ocr_stats(self, document: Document) -> dict[str, float] | None:
+        """Get the OCR metrics of a document, and forget them."""
+        with self._stats_lock:
+            return self.ocr_stats.pop(document.id, None)
+
+    def record_pipeline_stats(self, document: Document, pipeline: Pipeline) -> None:
+        stats = pipeline.stats()
+        self._keep_stats(self.pipeline_stats, document.id, stats)
+        log.info(
+            f"[doc {document.id}] Time per stage: "
+            + ", ".join(f"{name} {s['seconds']:.2f}s" for name, s in stats.items())
+        )
+
+    def create_ocr_pool(self, max_workers: int) -> Executor:
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_ocr_pool_initializer,
+            mp_context=mp.get_context("spawn"),
+        )
+
+    def record_ocr_stats(self, document: Document, scaler: OcrScaler) -> None:
+        stats = scaler.stats()
+        self._keep_stats(self.ocr_stats, document.id, stats)
+        log.info(
+            f"[doc {document.id}] OCRed {stats['pages']} pages with up to"
+            f" {stats['peak_workers']} workers, at {stats['seconds_per_page']:.2f}s"
+            f" per page and {stats['utilisation']:.0%} utilisation"
+        )
 
     def print_progress(
         self, document: Document, error: bool, text: str, percentage: float
@@ -425,50 +917,94 @@ class IsolationProvider(ABC):
         timeout_force: int = TIMEOUT_FORCE,
     ) -> Iterator[subprocess.Popen]:
         """Start a conversion process, pass it to the caller, and then clean it up."""
-        # Store the proc stderr in memory
-        stderr = BytesIO()
         p = self.start_doc_to_pixels_proc(document)
-        stderr_thread = self.start_stderr_thread(p, stderr)
+        with self._cancel_lock:
+            self._procs[document.id] = p
 
         if platform.system() != "Windows":
             assert os.getpgid(p.pid) != os.getpgid(os.getpid()), (
                 "Parent shares same PGID with child"
             )
 
+        stderr: StderrBuffer | StderrStreamer | None = None
+        stderr_thread = None
         try:
+            # Create a sink for the debug output only if we capture it.
+            if p.stderr:
+                stderr = self.create_stderr_sink(document)
+                stderr_thread = self.start_stderr_thread(p, stderr)
+            # The conversion may have been cancelled while the process was starting.
+            self.raise_if_cancelled(document)
             yield p
         except errors.ConverterProcException as e:
+            if self.is_cancelled(document):
+                raise errors.ConversionCancelled() from e
             exception = self.get_proc_exception(p, timeout_exception)
             raise exception from e
         finally:
             self.ensure_stop_doc_to_pixels_proc(
                 document, p, timeout_grace=timeout_grace, timeout_force=timeout_force
             )
+            with self._cancel_lock:
+                self._procs.pop(document.id, None)
+
+            if stderr is not None:
+                incomplete = ""
+                if stderr_thread:
+                    # Wait for the thread to complete. If it's still alive, mention it in the debug log.
+                    stderr_thread.join(timeout=1)
+                    if stderr_thread.is_alive():
+                        incomplete = "(incomplete) "
+
+                if isinstance(stderr, StderrStreamer):
+                    stderr.close()
+                    if stderr.log_file is not None:
+                        log.info(
+                            f"Conversion output (doc to pixels) {incomplete}written"
+                            f" to {stderr.log_file}"
+                        )
+                    else:
+                        log.info(f"----- DOC TO PIXELS LOG END {incomplete}-----")
+                else:
+                    debug_bytes = stderr.getvalue()
+                    debug_log = sanitize_debug_text(debug_bytes)
+                    if stderr.dropped_bytes:
+                        debug_log = (
+                            f"[... {stderr.dropped_bytes} bytes omitted ...]\n"
+                            + debug_log
+                        )
 
-            if stderr_thread:
-                # Wait for the thread to complete. If it's still alive, mention it in the debug log.
-                stderr_thread.join(timeout=1)
-
-                debug_bytes = stderr.getvalue()
-                debug_log = sanitize_debug_text(debug_bytes)
+                    log.info(
+                        "Conversion output (doc to pixels)\n"
+                        f"----- DOC TO PIXELS LOG START {incomplete}-----\n"
+                        f"{debug_log}"  # no need for an extra newline here
+                        "----- DOC TO PIXELS LOG END -----"
+                    )
 
-                incomplete = "(incomplete) " if stderr_thread.is_alive() else ""
+    def create_stderr_sink(self, document: Document) -> StderrBuffer | StderrStreamer:
+        """Create the object that will receive the stderr of the conversion process."""
+        if not self.stream_stderr:
+            return StderrBuffer(self.stderr_max_bytes)
 
-                log.info(
-                    "Conversion output (doc to pixels)\n"
-                    f"----- DOC TO PIXELS LOG START {incomplete}-----\n"
-                    f"{debug_log}"  # no need for an extra newline here
-                    "----- DOC TO PIXELS LOG END -----"
-                )
+        log_file = None
+        if self.stderr_log_dir is not None:
+            log_file = self.stderr_log_dir / f"doc-to-pixels-{document.id}.log"
+        else:
+            log.info(
+                "Conversion output (doc to pixels)\n----- DOC TO PIXELS LOG START -----"
+            )
+        return StderrStreamer(document, log_file)
 
     def start_stderr_thread(
-        self, process: subprocess.Popen, stderr: IO[bytes]
+        self,
+        process: subprocess.Popen,
+        stderr: StderrBuffer | StderrStreamer,
     ) -> threading.Thread | None:
         """Start a thread to read stderr from the process"""
 
         def _stream_stderr(process_stderr: IO[bytes]) -> None:
             try:
-                for line in process_stderr:
+                while line := process_stderr.readline(STDERR_MAX_LINE_BYTES):
                     stderr.write(line)
             except (OSError, ValueError) as e:
                 log.debug(f"Stderr stream closed: {e}")
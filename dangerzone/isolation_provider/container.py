@@ -93,6 +93,9 @@ class Container(IsolationProvider):
         debug_args = []
         if self.debug:
             debug_args += ["-e", "RUNSC_DEBUG=1"]
+        protocol_args = []
+        for key, value in self.get_protocol_env().items():
+            protocol_args += ["-e", f"{key}={value}"]
 
         enable_stdin = ["-i"]
         set_name = ["--name", name]
@@ -102,12 +105,16 @@ class Container(IsolationProvider):
             ["run"]
             + security_args
             + debug_args
+            + protocol_args
             + prevent_leakage_args
             + enable_stdin
             + set_name
             + image_name
             + command
         )
+        # Track the containers before starting this one, so that we can later on
+        # check that it's gone, without listing all the containers.
+        container_utils.CONTAINER_TRACKER.ensure_started()
         podman = container_utils.init_podman_command()
         proc = podman.run(
             args,
@@ -160,10 +167,17 @@ class Container(IsolationProvider):
         # after a podman kill / docker kill invocation, this will likely be the case,
         # else the container runtime (Docker/Podman) has experienced a problem, and we
         # should report it.
-        podman = container_utils.init_podman_command()
         name = self.doc_to_pixels_container_name(document)
+        tracker = container_utils.CONTAINER_TRACKER
+        if tracker.is_alive():
+            if tracker.wait_until_removed(name, timeout=container_utils.TIMEOUT_EVENTS):
+                return
+            if tracker.is_alive():
+                log.warning(f"Container '{name}' did not stop gracefully")
+                return
+
         try:
-            all_containers = podman.run(["ps", "-a"])
+            all_containers = container_utils.list_containers()
         except CommandError as e:
             # FIXME: This fallback should be removed once we drop support for Ubuntu
             # 22.04. It's there because `podman ps -a` somehow fails on Ubuntu 22.04,
@@ -175,11 +189,8 @@ class Container(IsolationProvider):
             )
             return
 
-        assert isinstance(all_containers, str)
         if name in all_containers:
             log.warning(f"Container '{name}' did not stop gracefully")
 
     def get_max_parallel_conversions(self) -> int:
-        # FIXME hardcoded 1 until length conversions are better handled
-        # https://github.com/freedomofpress/dangerzone/issues/257
-        return 1
+        return container_utils.MAX_PARALLEL_CONVERSIONS
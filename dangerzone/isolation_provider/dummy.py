@@ -1,8 +1,20 @@
 import logging
+import os
 import subprocess
 import sys
+import zlib
+from typing import Any
 
-from ..conversion_errors import INT_BYTES
+from ..conversion_errors import (
+    COLORSPACE_GRAY,
+    DEFAULT_FIDELITY,
+    FEATURE_COLORSPACE,
+    FEATURE_COMPRESSION,
+    FRAME_LENGTH_BYTES,
+    INT_BYTES,
+    PROTOCOL_MAGIC,
+    PROTOCOL_VERSION,
+)
 from ..document import Document
 from ..errors import UnsafeIsolationProvider
 from .base import IsolationProvider, terminate_process_group
@@ -10,15 +22,41 @@ from .base import IsolationProvider, terminate_process_group
 log = logging.getLogger(__name__)
 
 
+def write_int(num: int) -> None:
+    sys.stdout.buffer.write(num.to_bytes(INT_BYTES, "big", signed=False))
+
+
 def dummy_script() -> None:
     sys.stdin.buffer.read()
     pages = 2
     width = height = 9
-    sys.stdout.buffer.write(pages.to_bytes(INT_BYTES, "big", signed=False))
+    features = 0
+    if "DZ_PROTOCOL_VERSION" in os.environ:
+        # Send compressed grayscale pages, if the host supports them.
+        features = int(os.environ["DZ_PROTOCOL_FEATURES"]) & (
+            FEATURE_COLORSPACE | FEATURE_COMPRESSION
+        )
+        write_int(PROTOCOL_MAGIC)
+        write_int(PROTOCOL_VERSION)
+        write_int(features)
+        write_int(int(os.environ["DZ_DPI"]))
+    write_int(pages)
     for page in range(pages):
-        sys.stdout.buffer.write(width.to_bytes(INT_BYTES, "big", signed=False))
-        sys.stdout.buffer.write(height.to_bytes(INT_BYTES, "big", signed=False))
-        sys.stdout.buffer.write(width * height * 3 * b"A")
+        write_int(width)
+        write_int(height)
+        if features & FEATURE_COLORSPACE:
+            write_int(COLORSPACE_GRAY)
+            pixels = width * height * b"A"
+        else:
+            pixels = width * height * 3 * b"A"
+        if features & FEATURE_COMPRESSION:
+            frame = zlib.compress(pixels)
+            sys.stdout.buffer.write(
+                len(frame).to_bytes(FRAME_LENGTH_BYTES, "big", signed=False)
+            )
+            sys.stdout.buffer.write(frame)
+        else:
+            sys.stdout.buffer.write(pixels)
 
 
 class Dummy(IsolationProvider):
@@ -28,11 +66,11 @@ class Dummy(IsolationProvider):
     Useful for testing without the need to use docker.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, fidelity: str = DEFAULT_FIDELITY, **kwargs: Any) -> None:
         # Sanity check
         if not getattr(sys, "dangerzone_dev", False):
             raise UnsafeIsolationProvider()
-        super().__init__()
+        super().__init__(fidelity=fidelity, **kwargs)
 
     @staticmethod
     def requires_install() -> bool:
@@ -51,6 +89,7 @@ class Dummy(IsolationProvider):
             stdout=subprocess.PIPE,
             stderr=self.proc_stderr,
             start_new_session=True,
+            env={**os.environ, **self.get_protocol_env()},
         )
 
     def terminate_doc_to_pixels_proc(
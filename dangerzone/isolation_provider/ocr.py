@@ -0,0 +1,149 @@
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+log = logging.getLogger(__name__)
+
+# How many recent pages we take into account, when deciding whether to add or remove
+# an OCR worker.
+LATENCY_WINDOW = 8
+# Adding a worker must improve the throughput by at least this factor, else it's
+# removed.
+MIN_SCALE_UP_GAIN = 1.05
+
+
+def get_load_average() -> float | None:
+    """Get the load average of the system over the last minute, if available."""
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        # Not available on Windows.
+        return None
+
+
+class OcrScaler:
+    """Decide how many pages are OCRed in parallel.
+
+    We start with half the CPUs of the system, and adjust the number of workers once
+    per `LATENCY_WINDOW` pages:
+
+    * If the load average exceeds the number of CPUs, the system is oversubscribed,
+      possibly by other processes, so we remove a worker.
+    * If the last added worker did not improve the throughput, because each page
+      became slower, we remove it.
+    * If pages are waiting for a worker and the system has idle CPUs, we add one.
+
+    The number of workers stays within `min_workers` and `max_workers`. Besides the
+    pages that are being OCRed, at most `max_queued` pages wait for a worker, so that
+    their pixels do not fill up the memory.
+    """
+
+    def __init__(
+        self,
+        min_workers: int = 1,
+        max_workers: int | None = None,
+        max_queued: int | None = None,
+        load_average: Callable[[], float | None] = get_load_average,
+    ) -> None:
+        self.cpus = os.cpu_count() or 1
+        self.max_workers = max_workers or self.cpus
+        self.min_workers = min_workers
+        if not 1 <= self.min_workers <= self.max_workers:
+            raise ValueError(
+                f"Invalid OCR worker limits: {self.min_workers}-{self.max_workers}"
+            )
+        self.max_queued = max_queued or self.max_workers
+        if self.max_queued < 1:
+            raise ValueError("At least one page must be allowed to wait for OCR")
+        self.load_average = load_average
+        self.workers = self._clamp(round(self.cpus / 2))
+
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._since_adjustment = 0
+        # The number of workers and page latency before the last added worker.
+        self._before_scale_up: tuple[int, float] | None = None
+
+        # Metrics
+        self.pages = 0
+        self.busy_seconds = 0.0
+        self.peak_workers = self.workers
+        self._worker_seconds = 0.0
+        self._started = self._last_change = time.monotonic()
+
+    def _clamp(self, workers: int) -> int:
+        return max(self.min_workers, min(self.max_workers, workers))
+
+    def _set_workers(self, workers: int) -> None:
+        now = time.monotonic()
+        self._worker_seconds += (now - self._last_change) * self.workers
+        self._last_change = now
+        if workers != self.workers:
+            log.debug(f"Scaling OCR workers from {self.workers} to {workers}")
+        self.workers = workers
+        self.peak_workers = max(self.peak_workers, workers)
+
+    def page_done(self, latency: float, pages_waiting: bool) -> None:
+        """Record how long it took to OCR a page, and adjust the workers if needed."""
+        with self._lock:
+            self.pages += 1
+            self.busy_seconds += latency
+            self._latencies.append(latency)
+            self._since_adjustment += 1
+            if self._since_adjustment >= LATENCY_WINDOW:
+                self._since_adjustment = 0
+                self._adjust(statistics.median(self._latencies), pages_waiting)
+
+    def _adjust(self, latency: float, pages_waiting: bool) -> None:
+        load = self.load_average()
+        if load is not None and load > self.cpus:
+            self._before_scale_up = None
+            self._set_workers(self._clamp(self.workers - 1))
+        elif self._before_scale_up is not None and self._scale_up_hurt(latency):
+            workers, _ = self._before_scale_up
+            self._before_scale_up = None
+            self._set_workers(workers)
+        elif (
+            pages_waiting
+            and self.workers < self.max_workers
+            and (load is None or load < self.cpus - 1)
+        ):
+            self._before_scale_up = (self.workers, latency)
+            self._set_workers(self.workers + 1)
+        else:
+            self._before_scale_up = None
+
+    def _scale_up_hurt(self, latency: float) -> bool:
+        """Check if the throughput did not improve after adding a worker."""
+        assert self._before_scale_up is not None
+        workers, previous_latency = self._before_scale_up
+        throughput = self.workers / latency if latency > 0 else float("inf")
+        previous_throughput = workers / previous_latency if previous_latency > 0 else 0
+        return throughput < previous_throughput * MIN_SCALE_UP_GAIN
+
+    def utilisation(self) -> float:
+        """Get the fraction of the time that the workers were busy."""
+        with self._lock:
+            worker_seconds = (
+                self._worker_seconds
+                + (time.monotonic() - self._last_change) * self.workers
+            )
+            if worker_seconds <= 0:
+                return 0.0
+            return min(1.0, self.busy_seconds / worker_seconds)
+
+    def stats(self) -> dict[str, float]:
+        utilisation = self.utilisation()
+        with self._lock:
+            return {
+                "pages": self.pages,
+                "workers": self.workers,
+                "peak_workers": self.peak_workers,
+                "utilisation": utilisation,
+                "seconds_per_page": self.busy_seconds / self.pages if self.pages else 0,
+                "elapsed": time.monotonic() - self._started,
+            }
@@ -0,0 +1,122 @@
+"""Pipeline of the stages that turn the pages of a document into a safe PDF.
+
+Each stage is a function that takes an iterator over the pages of the previous stage,
+and returns an iterator over the pages for the next one, typically a generator. The
+stages are lazy, so a page moves to the next stage as soon as it's ready, and pages
+are buffered only by the stages that choose to, e.g., while they wait for OCR. This
+bounds the memory that the pages of a document occupy.
+
+Stages can be inserted between the existing ones, without changing the rest. The
+pipeline measures how many pages each stage produced, and how long it took, so that
+its bottleneck can be found.
+"""
+
+import logging
+import time
+from collections.abc import Callable, Generator, Iterable, Iterator
+
+import fitz
+
+from .. import conversion_errors as errors
+
+log = logging.getLogger(__name__)
+
+
+class Page:
+    """A page of a document, as it moves through the pipeline.
+
+    The pixels of a page may be overwritten once the next page is read, so stages
+    that keep pages around must copy them.
+    """
+
+    __slots__ = ("colorspace", "height", "number", "pdf", "pixels", "width")
+
+    def __init__(self, number: int) -> None:
+        self.number = number
+        self.width = 0
+        self.height = 0
+        self.colorspace = errors.COLORSPACE_RGB
+        self.pixels: bytes | bytearray | None = None
+        self.pdf: fitz.Document | None = None
+
+
+Stage = Callable[[Iterator[Page]], Iterator[Page]]
+
+
+class Pipeline:
+    """A sequence of named stages that process pages."""
+
+    def __init__(self, stages: Iterable[tuple[str, Stage]] = ()) -> None:
+        self.stages: list[tuple[str, Stage]] = []
+        for name, stage in stages:
+            self.add_stage(name, stage)
+        # Metrics, per stage
+        self.pages: dict[str, int] = {}
+        self.seconds: dict[str, float] = {}
+
+    @property
+    def names(self) -> list[str]:
+        return [name for name, _ in self.stages]
+
+    def add_stage(self, name: str, stage: Stage, before: str | None = None) -> None:
+        """Add a stage at the end of the pipeline, or before another stage."""
+        if name in self.names:
+            raise ValueError(f"Stage '{name}' is already in the pipeline")
+        if before is None:
+            self.stages.append((name, stage))
+        elif before in self.names:
+            self.stages.insert(self.names.index(before), (name, stage))
+        else:
+            raise ValueError(f"Stage '{before}' is not in the pipeline")
+
+    def _measure(self, name: str, pages: Iterator[Page]) -> Generator[Page, None, None]:
+        """Measure the time it takes for a stage, and its upstream, to yield pages."""
+        self.pages[name] = 0
+        self.seconds[name] = 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                page = next(pages)
+            except StopIteration:
+                return
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+            self.pages[name] += 1
+            yield page
+
+    def run(self, pages: Iterable[Page]) -> None:
+        """Pass the pages through all the stages."""
+        iterators: list[Iterator[Page]] = []
+        upstream = iter(pages)
+        for name, stage in self.stages:
+            iterators.append(stage(upstream))
+            upstream = self._measure(name, iterators[-1])
+            iterators.append(upstream)
+
+        try:
+            for _ in upstream:
+                pass
+        finally:
+            # If a stage failed, close the stages that wait for pages, so that they
+            # release their resources right away. Close the downstream ones first.
+            for it in reversed(iterators):
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()
+
+        # The time of each stage includes the time of its upstream stages, so we
+        # subtract it.
+        upstream_seconds = 0.0
+        for name in self.names:
+            seconds = self.seconds[name]
+            self.seconds[name] = max(0.0, seconds - upstream_seconds)
+            upstream_seconds = seconds
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                "pages": self.pages.get(name, 0),
+                "seconds": self.seconds.get(name, 0),
+            }
+            for name in self.names
+        }
@@ -1,17 +1,28 @@
+import functools
 import io
 import logging
 import os
 import subprocess
 import sys
 import zipfile
+from collections.abc import Iterator
 from typing import IO
 
 from ..document import Document
+from ..settings import Settings
 from ..updater.signatures import is_container_tar_bundled
+from ..util import get_host_memory
 from .base import IsolationProvider
 
 log = logging.getLogger(__name__)
 
+# How many documents are converted in parallel, each in its own disposable qube, unless
+# the settings specify otherwise.
+DEFAULT_PARALLEL_CONVERSIONS = 2
+# The memory that each parallel conversion needs in this qube, to assemble the pages
+# of the safe document (in bytes).
+MEMORY_PER_CONVERSION = 768 * 2**20
+
 
 class Qubes(IsolationProvider):
     """Uses a disposable qube for performing the conversion"""
@@ -21,7 +32,20 @@ class Qubes(IsolationProvider):
         return False
 
     def get_max_parallel_conversions(self) -> int:
-        return 1
+        """Get how many disposable qubes can convert documents in parallel.
+
+        The number is taken from the `qubes_parallel_conversions` setting, and is
+        bounded by the available memory. A qube cannot query the free memory of the
+        host, but the Qubes memory balancer grows or shrinks the memory of each qube
+        according to it, so we use the memory that this qube has available instead.
+        """
+        parallel = Settings().get("qubes_parallel_conversions")
+        parallel = max(1, parallel or DEFAULT_PARALLEL_CONVERSIONS)
+        host_memory = get_host_memory()
+        if host_memory is not None:
+            _, available = host_memory
+            parallel = max(1, min(parallel, available // MEMORY_PER_CONVERSION))
+        return parallel
 
     def start_doc_to_pixels_proc(self, document: Document) -> subprocess.Popen:
         conv_mod_path = os.environ.get("DANGERZONE_INSECURE_CONVERTER_PATH", None)
@@ -31,16 +55,17 @@ class Qubes(IsolationProvider):
             # Basically, the change is that we also transfer the necessary Python
             # code as a zipfile, before sending the doc that the user requested.
             qrexec_policy = "dz.ConvertDev"
-            stderr = subprocess.PIPE
         else:
             qrexec_policy = "dz.Convert"
-            stderr = subprocess.DEVNULL
 
+        # Each conversion has its own `qrexec-client-vm` process, with its own pipes,
+        # so that conversions in parallel disposable qubes do not mix their output.
+        # Their stderr is read by a separate thread for each process.
         p = subprocess.Popen(
             ["/usr/bin/qrexec-client-vm", "@dispvm:dz-dvm", qrexec_policy],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=stderr,
+            stderr=self.proc_stderr,
             # Start the conversion process in a new session, so that we can later on
             # kill the process group, without killing the controlling script.
             start_new_session=True,
@@ -86,25 +111,47 @@ class Qubes(IsolationProvider):
 
     def teleport_dz_module(self, conv_path: str, wpipe: IO[bytes]) -> None:
         """Send the dangerzone module to another qube, as a zipfile."""
-        # Grab the absolute file path of the dangerzone module.
-        temp_file = io.BytesIO()
-
-        with zipfile.ZipFile(temp_file, "w") as z:
-            z.mkdir("dangerzone_insecure_converter/")
-            for root, _, files in os.walk(conv_path):
-                for file in files:
-                    if file.endswith(".py"):
-                        file_path = os.path.join(root, file)
-                        relative_path = os.path.relpath(file_path, conv_path)
-                        z.write(file_path, relative_path)
+        zipped = _zip_dz_module(conv_path, _fingerprint_dz_module(conv_path))
 
         # Send the following data:
         # 1. The size of the Python zipfile, so that the server can know when to
         #    stop.
         # 2. The Python zipfile itself.
-        bufsize_bytes = len(temp_file.getvalue()).to_bytes(4, "big")
-        wpipe.write(bufsize_bytes)
-        wpipe.write(temp_file.getvalue())
+        wpipe.write(len(zipped).to_bytes(4, "big"))
+        wpipe.write(zipped)
+
+
+def _list_dz_module(conv_path: str) -> Iterator[tuple[str, str]]:
+    """List the Python files of the dangerzone module, and their relative paths."""
+    for root, _, files in os.walk(conv_path):
+        for file in files:
+            if file.endswith(".py"):
+                file_path = os.path.join(root, file)
+                yield file_path, os.path.relpath(file_path, conv_path)
+
+
+def _fingerprint_dz_module(conv_path: str) -> tuple[tuple[str, int, int], ...]:
+    """Get the relative path, mtime and size of each file of the dangerzone module."""
+    fingerprint = []
+    for file_path, relative_path in _list_dz_module(conv_path):
+        st = os.stat(file_path)
+        fingerprint.append((relative_path, st.st_mtime_ns, st.st_size))
+    return tuple(sorted(fingerprint))
+
+
+@functools.lru_cache(maxsize=1)
+def _zip_dz_module(conv_path: str, fingerprint: tuple) -> bytes:
+    """Zip the dangerzone module.
+
+    The zipfile is cached for as long as the files of the module do not change, as
+    denoted by their `fingerprint`, so that we don't zip it for every conversion.
+    """
+    temp_file = io.BytesIO()
+    with zipfile.ZipFile(temp_file, "w") as z:
+        z.mkdir("dangerzone_insecure_converter/")
+        for file_path, relative_path in _list_dz_module(conv_path):
+            z.write(file_path, relative_path)
+    return temp_file.getvalue()
 
 
 def is_qubes_native_conversion() -> bool:
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO, Any
+
+from .document import Document
+from .util import get_cache_dir, replace_control_chars
+
+log = logging.getLogger(__name__)
+
+JOURNAL_DIR = "journals"
+
+STATE_NAMES = {
+    Document.STATE_UNCONVERTED: "unconverted",
+    Document.STATE_CONVERTING: "converting",
+    Document.STATE_SAFE: "safe",
+    Document.STATE_FAILED: "failed",
+}
+
+
+def get_journal_dir() -> Path:
+    return get_cache_dir() / JOURNAL_DIR
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Journal:
+    """Append-only record of the state transitions of the documents in a job.
+
+    Each line of the journal is a JSON object that describes a state transition of a
+    document, along with the hash of its input file and its output filename. Once a
+    job is interrupted, we can replay its journal to learn which documents have been
+    converted successfully, and skip them when the job is resumed.
+    """
+
+    def __init__(self, path: Path, resume: bool = False) -> None:
+        self.path = path
+        self.skipped: list[str] = []
+        self.records: dict[str, dict[str, Any]] = {}
+        self._file: IO[str] | None = None
+        self._lock = threading.Lock()
+
+        if resume:
+            self.load()
+        else:
+            # Start with a clean slate, so that a later resumption does not take into
+            # account stale records.
+            self.path.unlink(missing_ok=True)
+
+    @classmethod
+    def for_job(cls, job: dict[str, Any], resume: bool = False) -> "Journal":
+        """Get the journal of a job, as identified by its parameters."""
+        job_json = json.dumps(job, sort_keys=True, ensure_ascii=True)
+        job_id = hashlib.sha256(job_json.encode()).hexdigest()[:16]
+        return cls(get_journal_dir() / f"{job_id}.jsonl", resume=resume)
+
+    def load(self) -> None:
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self.records[record["input"]] = record
+                    except (ValueError, KeyError, TypeError):
+                        # The last line may be incomplete, if the job was interrupted
+                        # while writing it.
+                        log.debug(f"Skipping malformed journal line: {line!r}")
+        except FileNotFoundError:
+            log.info("No previous run found to resume, starting from scratch")
+
+    def is_completed(self, input_filename: str) -> bool:
+        """Check if a document has been converted successfully in a previous run.
+
+        The document must be marked as safe, its output must still exist, and its
+        input must not have changed since its conversion.
+        """
+        record = self.records.get(Document.normalize_filename(input_filename))
+        if record is None or record.get("state") != "safe":
+            return False
+        # Records may lack some keys, e.g., if we could not hash the input.
+        output, sha256 = record.get("output"), record.get("sha256")
+        if not isinstance(output, str) or not isinstance(sha256, str):
+            return False
+        try:
+            return os.path.exists(output) and sha256 == file_sha256(record["input"])
+        except OSError:
+            return False
+
+    def filter_pending(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Yield only the documents that have not been converted successfully."""
+        for doc in documents:
+            if self.is_completed(doc.input_filename):
+                self.skip(doc.input_filename)
+            else:
+                yield doc
+
+    def skip(self, input_filename: str) -> None:
+        sanitized = replace_control_chars(input_filename)
+        log.debug(f"Skipping '{sanitized}', which was converted in a previous run")
+        self.skipped.append(input_filename)
+
+    def record(self, doc: Document, old_state: Any, new_state: Any) -> None:
+        """Append a state transition of a document to the journal.
+
+        This method can be registered as a state callback of a document.
+        """
+        entry = {
+            "time": time.time(),
+            "id": doc.id,
+            "input": doc.input_filename,
+            "output": doc.output_filename,
+            "state": STATE_NAMES[new_state],
+        }
+        if new_state is Document.STATE_SAFE:
+            try:
+                entry["sha256"] = file_sha256(doc.input_filename)
+            except OSError as e:
+                log.warning(f"Could not hash the input of doc {doc.id}: {e}")
+
+        line = json.dumps(entry, ensure_ascii=True) + "\n"
+        with self._lock:
+            self.records[doc.input_filename] = entry
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self.path.open("a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            # Make sure that the record survives a sudden stop of the system.
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self) -> None:
+        """Remove the journal, once it's no longer needed."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -1,25 +1,76 @@
-import concurrent.futures
+import enum
 import json
 import logging
-from collections.abc import Callable
+import threading
+import typing
+from collections.abc import Callable, Iterable, Iterator
 
 import colorama
 
 from . import errors
 from .document import Document
-from .isolation_provider.base import IsolationProvider
+from .journal import Journal
+from .scheduler import ConversionWorkers, Order, Scheduler
 from .settings import Settings
-from .util import get_resource_path
+from .util import get_resource_path, replace_control_chars
+
+if typing.TYPE_CHECKING:
+    from .isolation_provider.base import IsolationProvider
 
 log = logging.getLogger(__name__)
 
 
+def get_supported_extensions() -> list[str]:
+    supported_ext = [
+        ".pdf",
+        ".docx",
+        ".doc",
+        ".docm",
+        ".xlsx",
+        ".xls",
+        ".pptx",
+        ".ppt",
+        ".odt",
+        ".odg",
+        ".odp",
+        ".ods",
+        ".epub",
+        ".jpg",
+        ".jpeg",
+        ".gif",
+        ".png",
+        ".tif",
+        ".tiff",
+        ".bmp",
+        ".pnm",
+        ".pbm",
+        ".ppm",
+        ".svg",
+    ]
+
+    # XXX: We disable loading HWP/HWPX files on Qubes, because H2ORestart does not work there.
+    # See:
+    #
+    # https://github.com/freedomofpress/dangerzone/issues/494
+    hwp_filters = [".hwp", ".hwpx"]
+    # Imported here, so that the isolation providers (and PyMuPDF) are not loaded
+    # when the CLI just prints its version or usage.
+    from .isolation_provider.qubes import is_qubes_native_conversion
+
+    if is_qubes_native_conversion():
+        supported_ext += hwp_filters
+
+    return supported_ext
+
+
 class DangerzoneCore:
     """
     Singleton of shared state / functionality throughout the app
     """
 
-    def __init__(self, isolation_provider: IsolationProvider) -> None:
+    def __init__(
+        self, isolation_provider: "IsolationProvider", journal: Journal | None = None
+    ) -> None:
         # Initialize terminal colors
         colorama.init(autoreset=True)
 
@@ -32,6 +83,20 @@ class DangerzoneCore:
         self.settings = Settings()
         self.documents: list[Document] = []
         self.isolation_provider = isolation_provider
+        # Record the state transitions of the documents, if requested.
+        self.journal = journal
+
+        # Index the documents by their (normalized) input filename, and by their
+        # conversion state, so that we don't have to scan the whole list of documents
+        # on every addition or query. Both indexes refer to the documents by their
+        # position in the list, so that queries return them in the order they were
+        # added.
+        self._documents_lock = threading.Lock()
+        self._documents_by_filename: dict[str, int] = {}
+        self._documents_by_state: dict[enum.auto, dict[int, Document]] = {}
+        # The documents that have been submitted for conversion, so that we know
+        # which ones are queued.
+        self._submitted_documents: set[Document] = set()
 
     def add_document_from_filename(
         self,
@@ -43,17 +108,63 @@ class DangerzoneCore:
         self.add_document(doc)
 
     def add_document(self, doc: Document) -> None:
-        if doc in self.documents:
-            raise errors.AddedDuplicateDocumentException()
-        self.documents.append(doc)
+        key = doc.input_filename
+        with self._documents_lock:
+            if key in self._documents_by_filename:
+                raise errors.AddedDuplicateDocumentException()
+            i = len(self.documents)
+            self._documents_by_filename[key] = i
+            self._documents_by_state.setdefault(doc.state, {})[i] = doc
+            self.documents.append(doc)
+        doc.add_state_callback(self._on_document_state_change)
+        if self.journal is not None:
+            doc.add_state_callback(self.journal.record)
 
     def clear_documents(self) -> None:
         log.debug("Removing all documents")
-        self.documents = []
+        with self._documents_lock:
+            for doc in self.documents:
+                doc.remove_state_callback(self._on_document_state_change)
+                if self.journal is not None:
+                    doc.remove_state_callback(self.journal.record)
+            self.documents = []
+            self._documents_by_filename = {}
+            self._documents_by_state = {}
+            self._submitted_documents = set()
+
+    def _on_document_state_change(
+        self, doc: Document, old_state: enum.auto, new_state: enum.auto
+    ) -> None:
+        with self._documents_lock:
+            i = self._documents_by_filename.get(doc.input_filename)
+            if i is None or self.documents[i] is not doc:
+                return
+            self._documents_by_state.get(old_state, {}).pop(i, None)
+            self._documents_by_state.setdefault(new_state, {})[i] = doc
+
+    def _get_documents_by_state(self, state: enum.auto) -> list[Document]:
+        with self._documents_lock:
+            docs = self._documents_by_state.get(state, {})
+            return [docs[i] for i in sorted(docs)]
 
     def convert_documents(
-        self, ocr_lang: str | None, stdout_callback: Callable | None = None
+        self,
+        ocr_lang: str | None,
+        stdout_callback: Callable | None = None,
+        documents: Iterable[Document] | None = None,
+        order: Order = Order.ADDED,
+        priority: Callable[[Document], int] | None = None,
     ) -> None:
+        """Convert the added documents in parallel.
+
+        Callers can also pass an iterable of extra `documents`, which can be lazy.
+        These documents are added and submitted for conversion as soon as they are
+        produced, so that conversions can start before the iterable is exhausted.
+
+        Documents are converted in the provided `order`, unless a `priority` function
+        is provided, in which case documents with a higher priority go first.
+        """
+
         def convert_doc(document: Document) -> None:
             try:
                 self.isolation_provider.convert(
@@ -69,17 +180,91 @@ class DangerzoneCore:
                 document.mark_as_failed()
 
         max_jobs = self.isolation_provider.get_max_parallel_conversions()
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs) as executor:
-            executor.map(convert_doc, self.documents)
+        if documents is None:
+            docs: Iterable[Document] = list(self.documents)
+            max_pending = None
+        else:
+            # Do not enumerate the extra documents too far ahead of the conversions.
+            docs = self._add_streamed_documents(documents)
+            max_pending = 2 * max_jobs
+        scheduler = Scheduler(order, max_pending=max_pending)
+        if documents is None:
+            # All the documents are known beforehand, so submit them before the
+            # workers start, else the first ones would be converted before the rest
+            # could be ordered.
+            for doc in docs:
+                self.submit_document(scheduler, doc, priority(doc) if priority else 0)
+            scheduler.close()
+            docs = []
+
+        workers = ConversionWorkers(scheduler, convert_doc, max_jobs)
+        workers.start()
+        try:
+            for doc in docs:
+                self.submit_document(scheduler, doc, priority(doc) if priority else 0)
+        finally:
+            scheduler.close()
+            workers.join()
+
+    def _add_streamed_documents(
+        self, documents: Iterable[Document]
+    ) -> Iterator[Document]:
+        """Yield the added documents, followed by the newly added ones."""
+        yield from list(self.documents)
+        for doc in documents:
+            try:
+                self.add_document(doc)
+            except errors.AddedDuplicateDocumentException:
+                filename = replace_control_chars(doc.input_filename)
+                log.warning(f"Skipping document '{filename}', as it was added twice")
+                continue
+            yield doc
+
+    def submit_document(
+        self, scheduler: Scheduler, doc: Document, priority: int = 0
+    ) -> None:
+        """Submit a document to a scheduler, and mark it as queued."""
+        with self._documents_lock:
+            self._submitted_documents.add(doc)
+        scheduler.submit(doc, priority)
+
+    def cancel_conversions(self, documents: Iterable[Document] | None = None) -> None:
+        """Cancel the conversion of the provided documents.
+
+        If no documents are provided, cancel the conversion of all the documents that
+        are queued or being converted.
+        """
+        if documents is None:
+            # Unconverted documents that have not been submitted yet must not be
+            # cancelled, else they would fail as soon as they are converted later on.
+            with self._documents_lock:
+                submitted = set(self._submitted_documents)
+            documents = [
+                doc
+                for doc in (
+                    self.get_converting_documents() + self.get_unconverted_documents()
+                )
+                if doc in submitted
+            ]
+        for doc in documents:
+            self.isolation_provider.cancel(doc)
+
+    def has_pending_documents(self) -> bool:
+        """Check if any document is waiting for its conversion, or being converted."""
+        with self._documents_lock:
+            return any(
+                self._documents_by_state.get(state)
+                for state in (Document.STATE_UNCONVERTED, Document.STATE_CONVERTING)
+            )
 
     def get_unconverted_documents(self) -> list[Document]:
-        return [doc for doc in self.documents if doc.is_unconverted()]
+        return self._get_documents_by_state(Document.STATE_UNCONVERTED)
 
     def get_safe_documents(self) -> list[Document]:
-        return [doc for doc in self.documents if doc.is_safe()]
+        return self._get_documents_by_state(Document.STATE_SAFE)
 
     def get_failed_documents(self) -> list[Document]:
-        return [doc for doc in self.documents if doc.is_failed()]
+        return self._get_documents_by_state(Document.STATE_FAILED)
 
     def get_converting_documents(self) -> list[Document]:
-        return [doc for doc in self.documents if doc.is_converting()]
+        return self._get_documents_by_state(Document.STATE_CONVERTING)
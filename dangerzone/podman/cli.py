@@ -78,13 +78,37 @@ def init(cpus: int, memory: int, timezone: str) -> None:
 
 
 @main.command()
+@click.option(
+    "--idle-timeout",
+    type=click.IntRange(1),
+    help="Stop the machine once it has been idle for this many minutes.",
+)
 @requires_wsl
-def start() -> None:
+def start(idle_timeout: int | None) -> None:
     """Start the Dangerzone Podman machine."""
     try:
         manager = PodmanMachineManager()
         manager.start()
         click.echo(f"Machine started: {manager.name}")
+        if idle_timeout:
+            manager.spawn_reaper(idle_timeout)
+    except PodmanError as e:
+        click.echo(f"❌ {e}")
+        raise click.Abort()
+
+
+@main.command()
+@click.option(
+    "--idle-timeout",
+    type=click.IntRange(1),
+    default=10,
+    show_default=True,
+    help="Stop the machine once it has been idle for this many minutes.",
+)
+def reap(idle_timeout: int) -> None:
+    """Stop the Dangerzone Podman machine once no conversion uses it."""
+    try:
+        PodmanMachineManager().reap(idle_timeout * 60)
     except PodmanError as e:
         click.echo(f"❌ {e}")
         raise click.Abort()
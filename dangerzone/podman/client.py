@@ -0,0 +1,212 @@
+"""Client for the REST API of Podman.
+
+This client talks to a `podman system service` over its Unix socket, so that querying
+Podman does not require forking a new `podman` process, which has to start the Go
+runtime (and, on Windows/macOS, connect to the Podman machine over SSH).
+
+It supports just the calls that Dangerzone needs, and it uses only the standard
+library, since the Python Podman client is not a dependency of Dangerzone.
+"""
+
+import http.client
+import json
+import queue
+import socket
+import urllib.parse
+from typing import Any
+
+from . import errors
+
+API_VERSION = "v4.0.0"
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_POOL_SIZE = 4
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket."""
+
+    def __init__(self, socket_path: str, timeout: float | None = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class APIResponse:
+    """The response of the Podman service to a request."""
+
+    def __init__(self, status_code: int, reason: str, content: bytes) -> None:
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        """Raise an `APIError` if the service reported an error."""
+        if self.ok:
+            return
+        try:
+            explanation = self.json().get("message")
+        except (ValueError, AttributeError):
+            explanation = self.text or None
+        cls = errors.NotFound if self.status_code == 404 else errors.APIError
+        raise cls(self.reason, response=self, explanation=explanation)
+
+
+def socket_path_from_uri(uri: str) -> str:
+    """Get the path of the Unix socket from a URI like 'unix:///run/podman.sock'."""
+    parsed = urllib.parse.urlparse(uri)
+    if parsed.scheme not in ("unix", "http+unix"):
+        raise errors.PodmanError(f"Unsupported URI for the Podman service: {uri}")
+    return urllib.parse.unquote(parsed.netloc + parsed.path)
+
+
+class PodmanClient:
+    """Client for the REST API of a Podman service.
+
+    The client keeps up to `max_pool_size` idle connections open, and reuses them
+    across requests. It can be shared between threads.
+
+    Attributes:
+        socket_path (str): The path of the Unix socket of the service.
+        timeout (float): The default timeout for each request, in seconds.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_pool_size: int = DEFAULT_POOL_SIZE,
+    ) -> None:
+        self.socket_path = socket_path_from_uri(base_url)
+        self.timeout = timeout
+        self._pool: queue.LifoQueue[UnixHTTPConnection] = queue.LifoQueue(
+            maxsize=max_pool_size
+        )
+
+    def __enter__(self) -> "PodmanClient":  # noqa: PYI034
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close all the idle connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _get_connection(self) -> tuple[UnixHTTPConnection, bool]:
+        """Get an idle connection, or a new one. Return also if it was idle."""
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout), False
+
+    def _put_connection(self, conn: UnixHTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> APIResponse:
+        """Send a request to the libpod API, and return its response.
+
+        Args:
+            method (str): The HTTP method of the request.
+            path (str): The path of the endpoint, without the API prefix.
+            params (dict, optional): The query parameters of the request.
+            timeout (float, optional): How long to wait for the response. Defaults to
+                the timeout of the client.
+
+        Raises:
+            errors.APIError: If the service reported an error.
+            OSError: If the service could not be reached.
+        """
+        url = f"/{API_VERSION}/libpod{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+
+        while True:
+            conn, reused = self._get_connection()
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                assert conn.sock is not None
+                conn.sock.settimeout(timeout or self.timeout)
+                conn.request(method, url, headers={"Content-Length": "0"})
+                resp = conn.getresponse()
+                content = resp.read()
+            except TimeoutError:
+                conn.close()
+                raise
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                # An idle connection may have been closed by the service in the
+                # meantime, in which case we retry with a new one.
+                if reused:
+                    continue
+                raise
+            break
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._put_connection(conn)
+        response = APIResponse(resp.status, resp.reason, content)
+        response.raise_for_status()
+        return response
+
+    def ping(self) -> bool:
+        """Check if the service is up."""
+        return self.request("GET", "/_ping").text == "OK"
+
+    def version(self) -> dict[str, Any]:
+        """Get the version information of the service."""
+        return self.request("GET", "/version").json()
+
+    def images(self, reference: str | None = None) -> list[dict[str, Any]]:
+        """List the images, optionally only those that match a reference."""
+        params = {}
+        if reference:
+            params["filters"] = json.dumps({"reference": [reference]})
+        return self.request("GET", "/images/json", params=params).json() or []
+
+    def tag(self, image: str, repo: str, tag: str) -> None:
+        """Tag an image as `repo:tag`."""
+        self.request("POST", f"/images/{image}/tag", params={"repo": repo, "tag": tag})
+
+    def containers(self, all: bool = False) -> list[dict[str, Any]]:
+        """List the running containers, or all of them."""
+        params = {"all": "true"} if all else {}
+        return self.request("GET", "/containers/json", params=params).json() or []
+
+    def kill(self, container: str, timeout: float | None = None) -> None:
+        """Kill a container."""
+        self.request("POST", f"/containers/{container}/kill", timeout=timeout)
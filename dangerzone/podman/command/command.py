@@ -1,16 +1,11 @@
 import contextlib
+import http.client
 import platform
 import subprocess
+import time
 from pathlib import Path
 
-# FIXME: We are commenting out the following import, because it requires the Python
-# Podman client, which Dangerzone does not have as a dependency yet.
-#
-# The side-effect of this change is that we can't start the Podman REST API service, but
-# we don't need this feature yet.
-#
-# from podman import client
-from .. import errors
+from .. import client, errors
 from . import cli_runner, machine_manager
 
 
@@ -145,49 +140,47 @@ class PodmanCommand:
         self.proc_service = None
         return ret
 
-    # See the import comment at the top of this file for more info.
-    #
-    # def wait_for_service(
-    #     self,
-    #     uri: str,
-    #     timeout: Optional[int] = None,
-    #     check_interval: float = 0.1,
-    # ):
-    #     """Wait for the Podman system service to be operational.
-
-    #     This method checks two things; if the system service is still running,
-    #     and if we can ping it successfully.
-
-    #     Args:
-    #         uri (str): The URI for the service.
-    #         proc (subprocess.Popen): The process handle for Podman's system service.
-    #         timeout (int, optional): How long to wait until the service is operational
-    #         check_interval (float): The interval between health checks
-
-    #     Returns:
-    #         int: The exit code of the service process.
-    #     """
-    #     if self.proc_service is None:
-    #         raise errors.PodmanError(
-    #             "The Podman service has not started yet, so there's nothing to wait"
-    #         )
-
-    #     start = time.monotonic()
-    #     with client.PodmanClient(base_url=uri) as c:
-    #         while True:
-    #             if timeout and time.monotonic() - start > timeout:
-    #                 raise errors.ServiceTimeout(timeout)
-
-    #             ret = self.proc_service.poll()
-    #             if ret is not None:
-    #                 raise errors.ServiceTerminated(ret)
-
-    #             try:
-    #                 if c.ping():
-    #                     break
-    #             except errors.APIError:
-    #                 pass
-    #             time.sleep(check_interval)
+    def wait_for_service(
+        self,
+        uri: str,
+        timeout: float | None = None,
+        check_interval: float = 0.1,
+    ) -> None:
+        """Wait for the Podman system service to be operational.
+
+        This method checks two things; if the system service is still running,
+        and if we can ping it successfully.
+
+        Args:
+            uri (str): The URI for the service.
+            timeout (float, optional): How long to wait until the service is operational
+            check_interval (float): The interval between health checks
+
+        Raises:
+            errors.ServiceTimeout: If the service did not reply in time.
+            errors.ServiceTerminated: If the service has exited.
+        """
+        if self.proc_service is None:
+            raise errors.PodmanError(
+                "The Podman service has not started yet, so there's nothing to wait"
+            )
+
+        start = time.monotonic()
+        with client.PodmanClient(base_url=uri) as c:
+            while True:
+                if timeout and time.monotonic() - start > timeout:
+                    raise errors.ServiceTimeout(timeout)
+
+                ret = self.proc_service.poll()
+                if ret is not None:
+                    raise errors.ServiceTerminated(ret)
+
+                try:
+                    if c.ping():
+                        break
+                except (OSError, http.client.HTTPException, errors.APIError):
+                    pass
+                time.sleep(check_interval)
 
     @contextlib.contextmanager
     def service(
@@ -221,5 +214,7 @@ class PodmanCommand:
             self.stop_service(timeout=stop_timeout)
             raise
 
-        yield
-        self.stop_service(timeout=stop_timeout)
+        try:
+            yield
+        finally:
+            self.stop_service(timeout=stop_timeout)
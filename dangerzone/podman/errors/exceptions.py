@@ -169,7 +169,7 @@ class CommandError(PodmanError):
 
 
 class ServiceTimeout(PodmanError):
-    def __init__(self, timeout: int) -> None:
+    def __init__(self, timeout: float) -> None:
         msg = f"The Podman service failed to reply to a ping within {timeout} seconds"
         super().__init__(msg)
 
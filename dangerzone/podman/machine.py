@@ -1,18 +1,163 @@
+import atexit
 import builtins
+import contextlib
 import functools
 import json
 import logging
+import os
 import platform
 import subprocess
+import sys
+import time
+from collections.abc import Generator
 from pathlib import Path
+from typing import IO
 
 from .. import container_utils, util
-from ..errors import OtherMachineRunningError
+from ..errors import MachineLeaseError, OtherMachineRunningError
 from .command import PodmanCommand
 from .errors import CommandError
 
 logger = logging.getLogger(__name__)
 
+# The processes that use the Podman machine hold a lease file in this directory.
+LEASE_DIR = util.get_cache_dir() / "machine"
+# How often the reaper checks if the Podman machine is idle, in seconds.
+REAPER_INTERVAL = 30
+# How long we wait for a lock that another process holds, in seconds.
+LOCK_TIMEOUT = 60
+LOCK_RETRY_INTERVAL = 0.1
+
+
+def _lock(f: IO, blocking: bool = True) -> bool:
+    """Lock a file exclusively. Return False if it's locked by another process.
+
+    If `blocking` is True, wait up to LOCK_TIMEOUT seconds for the lock. We poll for
+    it, instead of using the blocking mode of the OS, because on Windows this mode
+    gives up after 10 seconds.
+    """
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not _try_lock(f):
+        if not blocking or time.monotonic() >= deadline:
+            return False
+        time.sleep(LOCK_RETRY_INTERVAL)
+    return True
+
+
+def _try_lock(f: IO) -> bool:
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+
+            # Lock the first byte of the file, which is the convention for lock files.
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def _locked(path: Path, blocking: bool = True) -> Generator[bool, None, None]:
+    """Hold an exclusive lock on a file, and yield whether we could take it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as f:
+        # The lock is released when the file is closed.
+        yield _lock(f, blocking=blocking)
+
+
+class MachineLease:
+    """Record that this process uses the Podman machine.
+
+    The lease is a file that this process keeps locked, so that other processes can
+    tell if it's still in use, even if this process has crashed. Acquiring and
+    releasing the lease marks the Podman machine as used, for the idle timeout of the
+    reaper.
+    """
+
+    def __init__(self) -> None:
+        self._file: IO | None = None
+
+    @property
+    def path(self) -> Path:
+        return LEASE_DIR / f"{os.getpid()}.lease"
+
+    def acquire(self) -> None:
+        if self._file is not None:
+            return
+        # Do not race with a reaper that is about to stop the Podman machine.
+        with _locked(LEASE_DIR / "machine.lock") as locked:
+            if not locked:
+                raise MachineLeaseError(
+                    "Timed out waiting for another process to release the Podman"
+                    " machine"
+                )
+            f = self.path.open("a+")
+            if not _lock(f):
+                f.close()
+                raise MachineLeaseError(f"Could not lock the lease file: {self.path}")
+            self._file = f
+            touch_last_used()
+        atexit.register(self.release)
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        touch_last_used()
+        self._file.close()
+        self._file = None
+        self.path.unlink(missing_ok=True)
+
+
+# The lease of this process.
+lease = MachineLease()
+
+
+def touch_last_used() -> None:
+    """Mark that the Podman machine has just been used."""
+    (LEASE_DIR / "last-used").touch()
+
+
+def count_active_leases() -> int:
+    """Count the processes that use the Podman machine, and clean up stale leases."""
+    active = 0
+    for path in LEASE_DIR.glob("*.lease"):
+        try:
+            with open(path, "a+") as f:
+                if not _lock(f, blocking=False):
+                    active += 1
+                    continue
+        except OSError:
+            active += 1
+            continue
+        logger.debug(f"Removing stale lease: {path}")
+        path.unlink(missing_ok=True)
+    return active
+
+
+def idle_seconds() -> float:
+    """Get how long the Podman machine has been idle, in seconds."""
+    try:
+        return time.time() - (LEASE_DIR / "last-used").stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def reaper_command(idle_minutes: int) -> list[str]:
+    """Get the command that runs the reaper for the Podman machine."""
+    args = ["reap", "--idle-timeout", str(idle_minutes)]
+    if getattr(sys, "frozen", False):
+        # In our bundles, `dangerzone-machine` lives next to the main executable.
+        name = "dangerzone-machine"
+        if platform.system() == "Windows":
+            name += ".exe"
+        return [str(Path(sys.executable).with_name(name)), *args]
+    return [sys.executable, "-m", "dangerzone.podman.cli", *args]
+
 
 class PodmanMachineManager:
     """Manages the lifecycle of Dangerzone's Podman machines."""
@@ -50,6 +195,20 @@ class PodmanMachineManager:
                 except CommandError as e:
                     logger.warning(f"Failed to remove stale machine {name}: {e}")
 
+    @staticmethod
+    def _has_resources(machine: dict, cpus: int | None, memory: int | None) -> bool:
+        """Check if a machine, as listed by Podman, has the requested resources."""
+        try:
+            if cpus is not None and int(machine["CPUs"]) != cpus:
+                return False
+            # Podman lists the memory of the machine in bytes.
+            if memory is not None and int(machine["Memory"]) != memory * 2**20:
+                return False
+        except (KeyError, TypeError, ValueError):
+            # We can't tell, so keep the machine as it is.
+            pass
+        return True
+
     def list_other_running_machines(self) -> list[str]:
         """List other running Podman machines, excluding the expected one."""
         other_running_machines = []
@@ -69,13 +228,31 @@ class PodmanMachineManager:
         memory: int | None = None,
         timezone: str = "Etc/UTC",  # Do not leak local timezone
     ) -> None:
-        """Initialize a new Podman machine."""
+        """Initialize a new Podman machine.
+
+        If the machine exists, but with different CPUs or memory (in MiB) than the
+        requested ones, it's recreated, unless it's running.
+        """
         existing_machines = self._get_existing_dangerzone_machines()
         self._remove_stale_machines(existing_machines)
 
-        if any(m.get("Name") == self.name for m in existing_machines):
-            logger.info(f"Podman machine '{self.name}' already exists.")
-            return
+        for m in existing_machines:
+            if m.get("Name") != self.name:
+                continue
+            if self._has_resources(m, cpus, memory):
+                logger.info(f"Podman machine '{self.name}' already exists.")
+                return
+            if m.get("Running"):
+                logger.info(
+                    f"Podman machine '{self.name}' is running, so it will not be"
+                    " resized now"
+                )
+                return
+            logger.info(
+                f"Recreating Podman machine '{self.name}' with {cpus} CPUs and"
+                f" {memory} MiB of memory"
+            )
+            self.remove()
 
         logger.info(f"Initializing Podman machine: {self.name}")
         self.podman.machine.init(
@@ -124,6 +301,66 @@ class PodmanMachineManager:
         if wait:
             logger.info(f"Podman machine '{name}' stopped successfully.")
 
+    def is_running(self) -> bool:
+        """Check if the Dangerzone machine is running."""
+        return any(
+            m.get("Name") == self.name and m.get("Running")
+            for m in self._get_existing_dangerzone_machines()
+        )
+
+    def stop_if_idle(self, idle_timeout: float) -> bool:
+        """Stop the machine if no process has used it for `idle_timeout` seconds.
+
+        Return True if the machine is no longer running.
+        """
+        with _locked(LEASE_DIR / "machine.lock", blocking=False) as locked:
+            if not locked:
+                # A process is acquiring a lease right now.
+                return False
+            if not self.is_running():
+                return True
+            if count_active_leases() > 0 or idle_seconds() < idle_timeout:
+                return False
+            logger.info(
+                f"Podman machine '{self.name}' has been idle for more than"
+                f" {idle_timeout} seconds"
+            )
+            self.stop()
+            return True
+
+    def reap(
+        self, idle_timeout: float, check_interval: float = REAPER_INTERVAL
+    ) -> None:
+        """Stop the machine once it becomes idle.
+
+        Return once the machine has stopped, or if another reaper is running.
+        """
+        with _locked(LEASE_DIR / "reaper.lock", blocking=False) as locked:
+            if not locked:
+                logger.info("Another reaper for the Podman machine is running")
+                return
+            if not (LEASE_DIR / "last-used").exists():
+                touch_last_used()
+            while not self.stop_if_idle(idle_timeout):
+                time.sleep(check_interval)
+
+    def spawn_reaper(self, idle_minutes: int) -> None:
+        """Start a reaper in the background, which outlives this process."""
+        cmd = reaper_command(idle_minutes)
+        logger.debug(f"Starting the reaper for the Podman machine: {cmd}")
+        kwargs: dict = {}
+        if platform.system() == "Windows":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP  # type: ignore [attr-defined]
+        else:
+            kwargs["start_new_session"] = True
+        subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **kwargs,
+        )
+
     def remove(self, name: str | None = None) -> None:
         """Remove a Podman machine."""
         if name is None:
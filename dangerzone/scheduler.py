@@ -0,0 +1,222 @@
+import bisect
+import enum
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from .document import Document
+
+log = logging.getLogger(__name__)
+
+# Documents larger than this are considered large, and only a few of them may be
+# converted at once, so that parallel conversions do not exhaust the memory.
+LARGE_DOCUMENT_BYTES = 50 * 1024 * 1024
+MAX_LARGE_JOBS = 1
+
+# Documents that are not PDFs or images need to be converted to PDF first, which
+# takes longer than their size would suggest.
+DIRECT_CONVERSION_EXTENSIONS = {
+    ".pdf",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".png",
+    ".tif",
+    ".tiff",
+    ".bmp",
+    ".pnm",
+    ".pbm",
+    ".ppm",
+    ".svg",
+}
+OFFICE_CONVERSION_COST_FACTOR = 4
+
+
+class Order(enum.Enum):
+    """The order in which documents are converted."""
+
+    ADDED = "added"  # In the order they were added
+    SIZE = "size"  # Shortest job first, as estimated by the size and type
+
+
+def estimate_cost(document: Document) -> int:
+    """Estimate how long it takes to convert a document, in arbitrary units."""
+    try:
+        size = os.path.getsize(document.input_filename)
+    except OSError:
+        # The document will fail quickly anyway.
+        return 0
+    ext = os.path.splitext(document.input_filename)[1].lower()
+    if ext not in DIRECT_CONVERSION_EXTENSIONS:
+        size *= OFFICE_CONVERSION_COST_FACTOR
+    return size
+
+
+def is_large(document: Document) -> bool:
+    try:
+        return os.path.getsize(document.input_filename) > LARGE_DOCUMENT_BYTES
+    except OSError:
+        return False
+
+
+# An entry of the scheduler's queue: (sort key, document, is large, submission time)
+_Entry = tuple[tuple[int, int, int], Document, bool, float]
+
+
+class Scheduler:
+    """Thread-safe queue that decides which document to convert next.
+
+    Documents with a higher priority are converted first. Documents with the same
+    priority are converted either in the order they were submitted, or shortest job
+    first. Only `max_large_jobs` large documents may be converted at once; while
+    this limit is reached, smaller documents can overtake the large ones.
+
+    If `max_pending` is set, `submit()` blocks while that many documents wait in the
+    queue, so that lazily created documents are not enumerated too far ahead of their
+    conversions. Note that in this case, documents can only be reordered within the
+    queue.
+    """
+
+    def __init__(
+        self,
+        order: Order = Order.ADDED,
+        max_large_jobs: int = MAX_LARGE_JOBS,
+        max_pending: int | None = None,
+    ) -> None:
+        if max_large_jobs < 1:
+            raise ValueError("At least one large document must be allowed to run")
+        self.order = order
+        self.max_large_jobs = max_large_jobs
+        self.max_pending = max_pending
+        # Wait time in the queue (in seconds), per input filename.
+        self.wait_times: dict[str, float] = {}
+
+        # Heap of the queued entries. The sort keys are unique, so the documents
+        # themselves are never compared.
+        self._queue: list[_Entry] = []
+        # Large documents that had to give way to smaller ones, sorted by key. Only
+        # large documents end up here, so this stays short.
+        self._held_back: deque[_Entry] = deque()
+        self._counter = itertools.count()
+        self._running_large: set[Document] = set()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def submit(self, document: Document, priority: int = 0) -> None:
+        cost = estimate_cost(document) if self.order is Order.SIZE else 0
+        key = (-priority, cost, next(self._counter))
+        entry = (key, document, is_large(document), time.monotonic())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Cannot submit documents to a closed scheduler")
+            while self.max_pending is not None and self._pending() >= self.max_pending:
+                self._cond.wait()
+            heapq.heappush(self._queue, entry)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Mark that no more documents will be submitted."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self) -> Document | None:
+        """Get the next document to convert.
+
+        Block until a document can be converted, or return None if there are no more
+        documents to convert.
+        """
+        with self._cond:
+            while True:
+                entry = self._next_entry()
+                if entry is not None:
+                    _, document, large, submitted = entry
+                    if large:
+                        self._running_large.add(document)
+                    self._record_wait_time(document, time.monotonic() - submitted)
+                    self._cond.notify_all()
+                    return document
+                if self._closed and not self._pending():
+                    return None
+                self._cond.wait()
+
+    def _next_entry(self) -> _Entry | None:
+        """Remove and return the first entry that can be converted right now."""
+        can_run_large = len(self._running_large) < self.max_large_jobs
+        if (
+            can_run_large
+            and self._held_back
+            and (not self._queue or self._held_back[0] < self._queue[0])
+        ):
+            return self._held_back.popleft()
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            if entry[2] and not can_run_large:
+                bisect.insort(self._held_back, entry)
+                continue
+            return entry
+        return None
+
+    def _pending(self) -> int:
+        return len(self._queue) + len(self._held_back)
+
+    def task_done(self, document: Document) -> None:
+        """Mark the conversion of a document returned by `get()` as complete."""
+        with self._cond:
+            if document in self._running_large:
+                self._running_large.remove(document)
+                self._cond.notify_all()
+
+    def _record_wait_time(self, document: Document, wait_time: float) -> None:
+        self.wait_times[document.input_filename] = wait_time
+        log.debug(f"Doc {document.id} waited {wait_time:.2f}s in the queue")
+
+
+class ConversionWorkers:
+    """Threads that convert the documents of a scheduler, as they are submitted.
+
+    Each worker converts whichever document the scheduler picks next, so documents
+    that wait in the queue do not occupy a thread. The workers exit once the scheduler
+    is closed and drained. The CLI and the GUI share them, so that both convert
+    documents the same way.
+    """
+
+    def __init__(
+        self,
+        scheduler: Scheduler,
+        convert: Callable[[Document], None],
+        max_workers: int,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("At least one conversion worker is required")
+        self.scheduler = scheduler
+        self.convert = convert
+        self.max_workers = max_workers
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.max_workers):
+            thread = threading.Thread(
+                target=self._work, name=f"conversion-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        while (document := self.scheduler.get()) is not None:
+            try:
+                self.convert(document)
+            except Exception:
+                log.exception(f"Unexpected error while converting '{document}'")
+            finally:
+                self.scheduler.task_done(document)
+
+    def join(self) -> None:
+        """Wait until the workers have converted all the documents."""
+        for thread in self._threads:
+            thread.join()
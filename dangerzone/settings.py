@@ -60,6 +60,13 @@ class Settings:
             "updater_errors": 0,
             "output_dir": None,
             "stop_other_podman_machines": "ask",
+            "podman_api": False,
+            # Stop the Podman machine after these many idle minutes, instead of
+            # after every run.
+            "machine_idle_timeout": None,
+            # Convert up to these many documents in parallel disposable qubes, if the
+            # memory allows it.
+            "qubes_parallel_conversions": None,
         }
 
     def custom_runtime_specified(self) -> bool:
@@ -2,6 +2,7 @@ import logging
 import platform
 
 from . import container_utils, settings, startup
+from .podman import machine
 from .podman.machine import PodmanMachineManager
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,13 @@ class MachineStopTask(startup._NonLinuxTask):
         )
 
     def run(self) -> None:
+        machine.lease.release()
+        if settings.Settings().get("machine_idle_timeout"):
+            logger.info("The Dangerzone VM will stop once it has been idle for a while")
+            return
+        if machine.count_active_leases() > 0:
+            logger.info("The Dangerzone VM is used by another process, so we keep it")
+            return
         PodmanMachineManager().stop()
 
 
@@ -26,9 +34,13 @@ class ContainerStopTask(startup.Task):
     name = "Stopping the sandbox"
 
     def run(self) -> None:
-        # In practice, we don't expect more than 1 container in flight.
-        for cont in container_utils.list_containers():
-            container_utils.kill_container(cont)
+        tracker = container_utils.CONTAINER_TRACKER
+        if tracker.is_alive():
+            containers = tracker.containers()
+        else:
+            containers = container_utils.list_containers()
+        container_utils.kill_containers(containers)
+        tracker.stop()
 
 
 class ShutdownMixin:
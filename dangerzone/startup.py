@@ -3,8 +3,9 @@ import logging
 import platform
 from collections.abc import Sequence
 
-from . import errors, settings, util
+from . import container_utils, errors, settings, util
 from .isolation_provider import qubes
+from .podman import machine
 from .podman.machine import PodmanMachineManager
 from .updater import (
     ErrorReport,
@@ -78,7 +79,17 @@ class MachineInitTask(_NonLinuxTask):
         )
 
     def run(self) -> None:
-        PodmanMachineManager().init()
+        # WSL2 machines share the resources of the host, so only macOS machines are
+        # sized.
+        if platform.system() == "Darwin":
+            # Size the machine for the conversions of the container isolation
+            # provider, as the Podman configuration does.
+            cpus, memory = container_utils.get_machine_resources(
+                container_utils.MAX_PARALLEL_CONVERSIONS
+            )
+            PodmanMachineManager().init(cpus=cpus, memory=memory)
+        else:
+            PodmanMachineManager().init()
 
 
 class MachineStartTask(_NonLinuxTask):
@@ -91,7 +102,12 @@ class MachineStartTask(_NonLinuxTask):
         )
 
     def run(self) -> None:
-        PodmanMachineManager().start()
+        machine.lease.acquire()
+        manager = PodmanMachineManager()
+        manager.start()
+        idle_timeout = settings.Settings().get("machine_idle_timeout")
+        if idle_timeout:
+            manager.spawn_reaper(idle_timeout)
 
 
 class MachineStopOthersTask(_NonLinuxTask):
@@ -174,3 +174,64 @@ def get_tails_socks_proxy() -> str:
     [1] https://spec.torproject.org/proposals/171-separate-streams.txt
     """
     return f"socks5://{os.urandom(8).hex()}:0@127.0.0.1:9050"
+
+
+def _parse_meminfo(meminfo: str) -> tuple[int, int]:
+    """Get the total and available memory from `/proc/meminfo` (Linux)."""
+    fields = {}
+    for line in meminfo.splitlines():
+        key, _, value = line.partition(":")
+        fields[key] = int(value.split()[0]) * 1024
+    return fields["MemTotal"], fields["MemAvailable"]
+
+
+def _parse_vm_stat(vm_stat: str) -> int:
+    """Get the available memory from the output of `vm_stat` (macOS)."""
+    lines = vm_stat.splitlines()
+    page_size = int(lines[0].split("page size of ")[1].split()[0])
+    pages = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        pages[key.strip()] = int(value.strip().rstrip("."))
+    free = pages["Pages free"] + pages["Pages inactive"] + pages["Pages speculative"]
+    return free * page_size
+
+
+def _get_windows_memory() -> tuple[int, int]:
+    import ctypes
+
+    class MEMORYSTATUSEX(ctypes.Structure):
+        _fields_ = [
+            ("dwLength", ctypes.c_ulong),
+            ("dwMemoryLoad", ctypes.c_ulong),
+            ("ullTotalPhys", ctypes.c_ulonglong),
+            ("ullAvailPhys", ctypes.c_ulonglong),
+            ("ullTotalPageFile", ctypes.c_ulonglong),
+            ("ullAvailPageFile", ctypes.c_ulonglong),
+            ("ullTotalVirtual", ctypes.c_ulonglong),
+            ("ullAvailVirtual", ctypes.c_ulonglong),
+            ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+        ]
+
+    status = MEMORYSTATUSEX()
+    status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+    if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):  # type: ignore [attr-defined]
+        raise OSError("GlobalMemoryStatusEx() failed")
+    return status.ullTotalPhys, status.ullAvailPhys
+
+
+def get_host_memory() -> tuple[int, int] | None:
+    """Get the total and available memory of the host in bytes, if possible."""
+    try:
+        if sys.platform == "win32":
+            return _get_windows_memory()
+        elif sys.platform == "darwin":
+            total = subprocess_run(
+                ["sysctl", "-n", "hw.memsize"], capture_output=True, check=True
+            ).stdout
+            vm_stat = subprocess_run(["vm_stat"], capture_output=True, check=True)
+            return int(total), _parse_vm_stat(vm_stat.stdout.decode())
+        else:
+            return _parse_meminfo(Path("/proc/meminfo").read_text())
+    except (OSError, ValueError, KeyError, IndexError, subprocess.SubprocessError):
+        return None
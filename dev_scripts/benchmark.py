@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Measure the cost of converting pages to PDF on the host.
+
+The cost is measured per fidelity profile, and per colorspace of the pages. The size
+of the pixels is reported both uncompressed and compressed, along with the time it
+takes the host to decompress them.
+
+The pages of a PDF document are rendered to pixels, the way the sandbox does it, and
+then converted back to a PDF. By default, a synthetic text document is used.
+
+Run it from the root of the repository with:
+
+    poetry run python dev_scripts/benchmark.py [--input document.pdf]
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+import zlib
+
+import fitz
+
+from dangerzone.conversion_errors import (
+    COLORSPACE_BILEVEL,
+    COLORSPACE_GRAY,
+    COLORSPACE_RGB,
+    FIDELITY_PROFILES,
+    FRAME_LENGTH_BYTES,
+)
+from dangerzone.isolation_provider.base import ProtocolReader
+from dangerzone.isolation_provider.dummy import Dummy
+
+COLORSPACES = {
+    "rgb": COLORSPACE_RGB,
+    "gray": COLORSPACE_GRAY,
+    "bilevel": COLORSPACE_BILEVEL,
+}
+# Translate gray pixels to bits, where dark pixels are black (1).
+BILEVEL_TABLE = bytes(ord("1") if i < 128 else ord("0") for i in range(256))
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor"
+    " incididunt ut labore et dolore magna aliqua."
+)
+
+
+def synthetic_document(pages: int) -> fitz.Document:
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=612, height=792)  # Letter
+        for line in range(50):
+            page.insert_text((50, 60 + line * 14), LOREM, fontsize=9)
+    return doc
+
+
+def to_bilevel(pix: fitz.Pixmap) -> bytes:
+    """Pack the pixels of a grayscale pixmap into bits, padding each row to a byte."""
+    rows = []
+    padding = b"0" * (-pix.width % 8)
+    for y in range(pix.height):
+        row = pix.samples[y * pix.width : (y + 1) * pix.width]
+        bits = row.translate(BILEVEL_TABLE) + padding
+        rows.append(int(bits, 2).to_bytes(len(bits) // 8, "big"))
+    return b"".join(rows)
+
+
+def render(
+    doc: fitz.Document, dpi: int, colorspace: int
+) -> list[tuple[bytes, int, int]]:
+    pixmaps = []
+    for page in doc:
+        if colorspace == COLORSPACE_RGB:
+            pix = page.get_pixmap(dpi=dpi)
+            pixels = pix.samples
+        else:
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            pixels = pix.samples if colorspace == COLORSPACE_GRAY else to_bilevel(pix)
+        pixmaps.append((pixels, pix.width, pix.height))
+    return pixmaps
+
+
+def benchmark(
+    provider: Dummy, doc: fitz.Document, fidelity: str, colorspace: int
+) -> dict[str, float]:
+    dpi = FIDELITY_PROFILES[fidelity]
+    pages = render(doc, dpi, colorspace)
+    timings = []
+    inflate_timings = []
+    frame_bytes = 0
+    pdf_bytes = 0
+    for pixels, width, height in pages:
+        frame = zlib.compress(pixels, 1)
+        frame_bytes += len(frame)
+        f = io.BytesIO(len(frame).to_bytes(FRAME_LENGTH_BYTES, "big") + frame)
+        start = time.perf_counter()
+        ProtocolReader(f).read_compressed_pixels(len(pixels))
+        inflate_timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        page_doc = provider.pixels_to_pdf_page(pixels, width, height, dpi, colorspace)
+        timings.append(time.perf_counter() - start)
+        pdf_bytes += len(page_doc.tobytes())
+    return {
+        "dpi": dpi,
+        "ms_per_page": statistics.median(timings) * 1000,
+        "pixel_kib_per_page": sum(len(p[0]) for p in pages) / len(pages) / 1024,
+        "frame_kib_per_page": frame_bytes / len(pages) / 1024,
+        "inflate_ms_per_page": statistics.median(inflate_timings) * 1000,
+        "pdf_kib_per_page": pdf_bytes / len(pages) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input", help="PDF document to use for the benchmark")
+    parser.add_argument(
+        "--pages", type=int, default=5, help="Pages of the synthetic document"
+    )
+    args = parser.parse_args()
+
+    # The dummy provider refuses to run outside of development environments.
+    sys.dangerzone_dev = True  # type: ignore[attr-defined]
+    provider = Dummy()
+    doc = fitz.open(args.input) if args.input else synthetic_document(args.pages)
+
+    print(
+        f"{'profile':<10}{'dpi':>6}{'colorspace':>12}{'ms/page':>10}"
+        f"{'pixels KiB':>12}{'zlib KiB':>10}{'inflate ms':>12}{'PDF KiB':>10}"
+    )
+    for fidelity in FIDELITY_PROFILES:
+        for name, colorspace in COLORSPACES.items():
+            r = benchmark(provider, doc, fidelity, colorspace)
+            print(
+                f"{fidelity:<10}{r['dpi']:>6}{name:>12}{r['ms_per_page']:>10.1f}"
+                f"{r['pixel_kib_per_page']:>12.0f}{r['frame_kib_per_page']:>10.1f}"
+                f"{r['inflate_ms_per_page']:>12.1f}{r['pdf_kib_per_page']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -42,9 +42,29 @@ def isolated_settings(mocker: MockerFixture, tmp_path: Path) -> Settings:
     return Settings()
 
 
+@pytest.fixture(autouse=True)
+def isolated_journals(
+    mocker: MockerFixture, tmp_path_factory: pytest.TempPathFactory
+) -> Path:
+    # Keep the journals out of `tmp_path`, since some tests check its contents.
+    journal_dir = tmp_path_factory.mktemp("journals")
+    mocker.patch("dangerzone.journal.get_journal_dir", return_value=journal_dir)
+    return journal_dir
+
+
+@pytest.fixture(autouse=True)
+def isolated_machine_leases(
+    mocker: MockerFixture, tmp_path_factory: pytest.TempPathFactory
+) -> Path:
+    lease_dir = tmp_path_factory.mktemp("machine")
+    mocker.patch("dangerzone.podman.machine.LEASE_DIR", lease_dir)
+    return lease_dir
+
+
 @pytest.fixture(autouse=True)
 def setup_function() -> Generator[None, None, None]:
     container_utils.init_podman_command.cache_clear()
+    container_utils.get_podman_client.cache_clear()
     yield
 
 
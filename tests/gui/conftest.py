@@ -30,6 +30,15 @@ from dangerzone.gui.logic import DangerzoneGui
 from dangerzone.isolation_provider.dummy import Dummy
 
 
+@pytest.fixture(autouse=True)
+def isolated_pdf_viewers_cache(
+    mocker: MockerFixture, tmp_path_factory: pytest.TempPathFactory
+) -> Path:
+    cache_path = tmp_path_factory.mktemp("cache") / "pdf_viewers.json"
+    mocker.patch("dangerzone.gui.logic.get_pdf_viewers_cache", return_value=cache_path)
+    return cache_path
+
+
 @pytest.fixture
 def dangerzone_gui(
     qtbot: QtBot, mocker: MockerFixture, tmp_path: Path
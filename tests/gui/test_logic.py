@@ -1,5 +1,7 @@
+import os
 import platform
 import subprocess
+from pathlib import Path
 from unittest import mock
 
 import pytest
@@ -49,6 +51,7 @@ def test_order_mime_handers() -> None:
         mock.patch.dict("os.environ", {"XDG_DATA_DIRS": "/usr/local/share:/usr/share"}),
     ):
         dz = DangerzoneGui(mock_app, dummy)
+        dz.wait_for_pdf_viewers()
 
         mock_default_mime_hander.assert_called_once_with(
             ["xdg-mime", "query", "default", "application/pdf"]
@@ -97,6 +100,7 @@ def test_mime_handers_succeeds_no_default_found() -> None:
         mock.patch.dict("os.environ", {"XDG_DATA_DIRS": "/usr/local/share:/usr/share"}),
     ):
         dz = DangerzoneGui(mock_app, dummy)
+        dz.wait_for_pdf_viewers()
 
         mock_default_mime_hander.assert_called_once_with(
             ["xdg-mime", "query", "default", "application/pdf"]
@@ -128,5 +132,52 @@ def test_malformed_desktop_entry_is_catched() -> None:
         mock.patch.dict("os.environ", {"XDG_DATA_DIRS": "/usr/local/share:/usr/share"}),
     ):
         mock_desktop.side_effect = ParsingError("Oh noes!", "malformed.desktop")
-        DangerzoneGui(mock_app, dummy)
+        DangerzoneGui(mock_app, dummy).wait_for_pdf_viewers()
         mock_desktop.assert_called()
+
+
+@pytest.mark.skipif(platform.system() != "Linux", reason="Linux-only test")
+def test_pdf_viewers_are_cached(tmp_path: Path) -> None:
+    """
+    Given that the PDF viewers have been found before,
+    ensure that the desktop entries are parsed again only if the application
+    directories have changed.
+    """
+    mock_app = mock.MagicMock()
+    dummy = mock.MagicMock()
+    apps_dir = tmp_path / "share" / "applications"
+    apps_dir.mkdir(parents=True)
+    (apps_dir / "org.gnome.Evince.desktop").write_text(
+        "[Desktop Entry]\nType=Application\nName=Evince\nExec=evince %U\n"
+        "MimeType=application/pdf;\n"
+    )
+
+    with (
+        mock.patch("subprocess.check_output", return_value=b"\n"),
+        mock.patch.dict("os.environ", {"XDG_DATA_DIRS": str(tmp_path / "share")}),
+        mock.patch(
+            "dangerzone.gui.logic.DesktopEntry", side_effect=DesktopEntry
+        ) as mock_desktop,
+    ):
+        dz = DangerzoneGui(mock_app, dummy)
+        dz.wait_for_pdf_viewers()
+        assert dz.pdf_viewers == {"Evince": "evince %U"}
+        assert mock_desktop.call_count == 1
+        mock_app.pdf_viewers_found.emit.assert_called_once()
+
+        # The second time, the cached PDF viewers are used.
+        dz = DangerzoneGui(mock_app, dummy)
+        dz.wait_for_pdf_viewers()
+        assert dz.pdf_viewers == {"Evince": "evince %U"}
+        assert mock_desktop.call_count == 1
+
+        # Once an application is added, the desktop entries are parsed again.
+        (apps_dir / "mupdf.desktop").write_text(
+            "[Desktop Entry]\nType=Application\nName=MuPDF\nExec=mupdf %f\n"
+            "MimeType=application/pdf;\n"
+        )
+        os.utime(apps_dir, (0, 0))
+        dz = DangerzoneGui(mock_app, dummy)
+        dz.wait_for_pdf_viewers()
+        assert set(dz.pdf_viewers) == {"Evince", "MuPDF"}
+        assert mock_desktop.call_count == 3
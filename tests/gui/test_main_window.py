@@ -31,6 +31,7 @@ from dangerzone.gui.logic import DangerzoneGui
 from dangerzone.gui.main_window import (
     ConversionWidget,
     MainWindow,
+    ProgressAggregator,
     QtCore,
     QtGui,
 )
@@ -787,8 +788,8 @@ def test_close_event(
         "dangerzone.container_utils.list_containers",
         return_value=[container_name],
     )
-    mock_kill_container = mocker.patch(
-        "dangerzone.container_utils.kill_container",
+    mock_kill_containers = mocker.patch(
+        "dangerzone.container_utils.kill_containers",
     )
     # Mock status bar updates
     handle_shutdown_begin_spy = mocker.spy(window.status_bar, "handle_shutdown_begin")
@@ -815,7 +816,7 @@ def test_close_event(
         mock_podman_machine_manager().stop.assert_not_called()
         handle_task_machine_stop_spy.assert_not_called()
     mock_list_containers.assert_called_once()
-    mock_kill_container.assert_called_once_with(container_name)
+    mock_kill_containers.assert_called_once_with([container_name])
     handle_shutdown_begin_spy.assert_called_once()
     handle_task_container_stop_spy.assert_called_once()
 
@@ -1382,6 +1383,8 @@ class TestRestartConversion:
     ) -> None:
         doc1 = Document(sample_pdf2)
         doc2 = Document(sample_pdf)
+        conversion_widget.dangerzone.add_document(doc1)
+        conversion_widget.dangerzone.add_document(doc2)
         conversion_widget.documents_list.docs_list = [doc1, doc2]
 
         doc1.state = Document.STATE_SAFE
@@ -1396,6 +1399,28 @@ class TestRestartConversion:
         ):
             conversion_widget.documents_list._on_doc_done()
 
+    def test_cancel_conversions(
+        self,
+        conversion_widget: ConversionWidget,
+        mocker: MockerFixture,
+        qtbot: QtBot,
+        sample_pdf: str,
+    ) -> None:
+        conversion_widget.documents_selected([Document(sample_pdf)])
+        mocker.patch.object(conversion_widget.documents_list, "start_conversion")
+        cancel = mocker.patch.object(conversion_widget.dangerzone, "cancel_conversions")
+        assert conversion_widget.cancel_button.isHidden()
+
+        conversion_widget.start_clicked()
+        assert not conversion_widget.cancel_button.isHidden()
+        qtbot.mouseClick(
+            conversion_widget.cancel_button, QtCore.Qt.MouseButton.LeftButton
+        )
+        cancel.assert_called_once_with()
+
+        conversion_widget.documents_list.all_conversions_finished.emit()
+        assert conversion_widget.cancel_button.isHidden()
+
     def test_reset_clears_state(
         self,
         conversion_widget: ConversionWidget,
@@ -1446,7 +1471,7 @@ class TestQueueDuringConversion:
     def _simulate_running_conversion(
         self,
         conversion_widget: ConversionWidget,
-        mock_pool: MagicMock,
+        mock_workers: MagicMock,
         initial_doc: Document,
     ) -> None:
         """Put the widget in the state it would be in while doc is being converted."""
@@ -1456,8 +1481,7 @@ class TestQueueDuringConversion:
         conversion_widget.documents_list.show()
         initial_doc.state = Document.STATE_CONVERTING
         conversion_widget.documents_list.submitted_docs.add(initial_doc)
-        conversion_widget.documents_list.thread_pool = mock_pool
-        conversion_widget.documents_list.thread_pool_initized = True
+        conversion_widget.documents_list.workers = mock_workers
         conversion_widget.dangerzone.is_waiting_finished = True
 
     def test_queueing_adds_new_doc_to_running_conversion(
@@ -1469,8 +1493,8 @@ class TestQueueDuringConversion:
     ) -> None:
         """Docs passed while a conversion is running are queued and submitted."""
         doc1 = self._copy_doc(sample_pdf, tmp_path, "doc1.pdf")
-        mock_pool = mocker.MagicMock()
-        self._simulate_running_conversion(conversion_widget, mock_pool, doc1)
+        self._simulate_running_conversion(conversion_widget, mocker.MagicMock(), doc1)
+        submit = mocker.spy(conversion_widget.documents_list.scheduler, "submit")
 
         doc2 = self._copy_doc(sample_pdf, tmp_path, "doc2.pdf")
         conversion_widget.documents_selected([doc2])
@@ -1478,7 +1502,7 @@ class TestQueueDuringConversion:
         assert doc2 in conversion_widget.documents_list.docs_list
         assert doc2 in conversion_widget.documents_list.submitted_docs
         # doc1 is already in submitted_docs and must not be re-queued.
-        assert mock_pool.apply_async.call_count == 1
+        submit.assert_called_once_with(doc2, 0)
         # Conversion view stays: the settings widget should not reappear.
         assert conversion_widget.settings_widget.isHidden()
         assert not conversion_widget.documents_list.isHidden()
@@ -1492,8 +1516,7 @@ class TestQueueDuringConversion:
     ) -> None:
         """Queued docs go through configure_document so chosen settings apply to them."""
         doc1 = self._copy_doc(sample_pdf, tmp_path, "doc1.pdf")
-        mock_pool = mocker.MagicMock()
-        self._simulate_running_conversion(conversion_widget, mock_pool, doc1)
+        self._simulate_running_conversion(conversion_widget, mocker.MagicMock(), doc1)
 
         spy = mocker.spy(conversion_widget.settings_widget, "configure_document")
 
@@ -1526,3 +1549,148 @@ class TestQueueDuringConversion:
         unconverted = conversion_widget.dangerzone.get_unconverted_documents()
         assert len(unconverted) == 1
         assert unconverted[0].input_filename == doc2.input_filename
+
+
+class TestProgressAggregator:
+    def test_coalesce_updates(
+        self, qtbot: QtBot, mocker: MockerFixture, sample_pdf: str
+    ) -> None:
+        doc = Document(sample_pdf)
+        progress = ProgressAggregator()
+        callback = mocker.MagicMock()
+        progress.updated.connect(callback)
+
+        for page in range(1, 1001):
+            progress.push(doc, False, f"Converting page {page}/1000", page // 10)
+        progress.flush()
+        callback.assert_called_once_with(doc, False, "Converting page 1000/1000", 100)
+
+        # Nothing is delivered if there are no new updates.
+        progress.flush()
+        assert callback.call_count == 1
+
+    def test_errors_are_not_hidden(
+        self, qtbot: QtBot, mocker: MockerFixture, sample_pdf: str
+    ) -> None:
+        doc = Document(sample_pdf)
+        progress = ProgressAggregator()
+        callback = mocker.MagicMock()
+        progress.updated.connect(callback)
+
+        progress.push(doc, True, "Conversion failed", 50)
+        progress.push(doc, False, "Cleaning up", 100)
+        progress.flush()
+        callback.assert_called_once_with(doc, True, "Conversion failed", 50)
+
+    def test_timer_delivers_updates(
+        self, qtbot: QtBot, mocker: MockerFixture, sample_pdf: str
+    ) -> None:
+        doc = Document(sample_pdf)
+        progress = ProgressAggregator(interval_ms=10)
+        callback = mocker.MagicMock()
+        progress.updated.connect(callback)
+        progress.start()
+
+        progress.push(doc, False, "Converting page 1/1", 50)
+        qtbot.waitUntil(callback.assert_called_once)
+        progress.stop()
+        assert not progress.timer.isActive()
+
+
+class TestDocumentsList:
+    def test_many_documents(
+        self,
+        qtbot: QtBot,
+        conversion_widget: ConversionWidget,
+        sample_pdf: str,
+    ) -> None:
+        documents_list = conversion_widget.documents_list
+        docs = [Document(sample_pdf, f"/tmp/safe-{i}.pdf") for i in range(10000)]
+        documents_list.documents_added(docs)
+        documents_list.show()
+
+        model = documents_list.documents_model
+        assert model.rowCount() == 10000
+        assert documents_list.docs_list == docs
+        # Rows are painted on demand, instead of having a widget each.
+        assert documents_list.findChildren(QtWidgets.QProgressBar) == []
+        assert model.data(model.index(42)) == os.path.basename(sample_pdf)
+
+        documents_list.clear()
+        assert model.rowCount() == 0
+
+    def test_update_progress(
+        self,
+        qtbot: QtBot,
+        conversion_widget: ConversionWidget,
+        sample_pdf: str,
+        sample_pdf2: str,
+    ) -> None:
+        documents_list = conversion_widget.documents_list
+        model = documents_list.documents_model
+        doc1 = Document(sample_pdf)
+        doc2 = Document(sample_pdf2)
+        documents_list.documents_added([doc1, doc2])
+
+        with qtbot.waitSignal(model.dataChanged) as blocker:
+            model.update_progress(doc2, False, "Converting page 1/2", 50)
+        assert blocker.args is not None
+        assert blocker.args[0].row() == 1
+        row = model.data(model.index(1), model.ProgressRole)
+        assert (row.error, row.text, row.percentage) == (
+            False,
+            "Converting page 1/2",
+            50,
+        )
+        assert model.data(model.index(1), QtCore.Qt.ToolTipRole) == row.text
+
+        # Errors stick, even if the conversion reports more progress afterwards.
+        model.update_progress(doc2, True, "Conversion failed", 50)
+        model.update_progress(doc2, False, "Cleaning up", 100)
+        assert (row.error, row.text) == (True, "Conversion failed")
+
+    def test_open_when_done(
+        self,
+        qtbot: QtBot,
+        mocker: MockerFixture,
+        conversion_widget: ConversionWidget,
+        sample_pdf: str,
+        sample_pdf2: str,
+    ) -> None:
+        documents_list = conversion_widget.documents_list
+        dangerzone = conversion_widget.dangerzone
+        mocker.patch.object(dangerzone.settings, "get", return_value=True)
+        open_pdf_viewer = mocker.patch.object(dangerzone, "open_pdf_viewer")
+        doc1 = Document(sample_pdf)
+        doc2 = Document(sample_pdf2, "/tmp/safe.pdf")
+        dangerzone.add_document(doc1)
+        dangerzone.add_document(doc2)
+        documents_list.documents_added([doc1, doc2])
+
+        doc1.mark_as_failed()
+        documents_list._on_task_finished(doc1, True)
+        open_pdf_viewer.assert_not_called()
+
+        doc2.mark_as_safe()
+        with qtbot.waitSignal(documents_list.all_conversions_finished):
+            documents_list._on_task_finished(doc2, False)
+        open_pdf_viewer.assert_called_once_with("/tmp/safe.pdf")
+
+
+def test_images_are_cached(qtbot: QtBot, mocker: MockerFixture) -> None:
+    main_window_module.load_resource.cache_clear()
+    main_window_module.load_svg_image.cache_clear()
+    main_window_module.load_status_image.cache_clear()
+    get_resource_path_spy = mocker.spy(main_window_module, "get_resource_path")
+
+    svg = main_window_module.load_svg_image("document.svg", width=20, height=24)
+    assert not svg.isNull()
+    assert main_window_module.load_svg_image("document.svg", width=20, height=24) is svg
+    # Rendering the same image at a different size does not read it again.
+    main_window_module.load_svg_image("document.svg", width=40, height=48)
+
+    status = main_window_module.load_status_image("status_safe.png")
+    assert status.size() == QtCore.QSize(15, 15)
+    assert main_window_module.load_status_image("status_safe.png") is status
+
+    assert get_resource_path_spy.call_count == 2
@@ -0,0 +1,536 @@
+import io
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import typing
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+
+import fitz
+import pytest
+from pytest_mock import MockerFixture
+
+from dangerzone import conversion_errors as errors
+from dangerzone.document import Document
+from dangerzone.isolation_provider import base
+from dangerzone.isolation_provider.pipeline import Page, Pipeline
+
+
+def test_stderr_buffer_keeps_most_recent_lines() -> None:
+    buf = base.StderrBuffer(max_bytes=10)
+    for line in [b"aaaa\n", b"bbbb\n", b"cccc\n"]:
+        buf.write(line)
+
+    assert buf.getvalue() == b"bbbb\ncccc\n"
+    assert buf.dropped_bytes == 5
+
+
+def test_stderr_buffer_truncates_long_lines() -> None:
+    buf = base.StderrBuffer(max_bytes=4)
+    buf.write(b"0123456789")
+
+    assert buf.getvalue() == b"6789"
+    assert buf.dropped_bytes == 6
+
+
+def test_stderr_streamer_logs_sanitized_lines(
+    sample_pdf: str, caplog: pytest.LogCaptureFixture
+) -> None:
+    doc = Document(sample_pdf)
+    streamer = base.StderrStreamer(doc)
+    with caplog.at_level("INFO"):
+        streamer.write(b"hello\x1b[31m\n")
+
+    assert f"[doc {doc.id}] hello�[31m" in caplog.messages
+
+
+def test_stderr_streamer_log_file(sample_pdf: str, tmp_path: Path) -> None:
+    doc = Document(sample_pdf)
+    log_file = tmp_path / "logs" / "doc.log"
+    streamer = base.StderrStreamer(doc, log_file)
+    streamer.write(b"first\n")
+    streamer.write(b"second\n")
+    streamer.close()
+
+    assert log_file.read_text() == "first\nsecond\n"
+
+
+def test_stderr_thread_is_bounded(mocker: MockerFixture) -> None:
+    provider = mocker.MagicMock(spec=base.IsolationProvider)
+    p = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import sys; [print(i, file=sys.stderr) for i in range(1000)]",
+        ],
+        stderr=subprocess.PIPE,
+    )
+    buf = base.StderrBuffer(max_bytes=8)
+    thread = base.IsolationProvider.start_stderr_thread(provider, p, buf)
+    assert thread is not None
+    thread.join(timeout=10)
+    p.wait()
+
+    assert buf.getvalue() == b"998\n999\n"
+
+
+class SleepingProvider(base.IsolationProvider):
+    """Isolation provider whose conversion process never produces any output."""
+
+    def requires_install(self) -> bool:
+        return False
+
+    def get_max_parallel_conversions(self) -> int:
+        return 1
+
+    def start_doc_to_pixels_proc(self, document: Document) -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(60)"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    def terminate_doc_to_pixels_proc(
+        self, document: Document, p: subprocess.Popen
+    ) -> None:
+        base.terminate_process_group(p)
+
+
+def test_cancel_running_conversion(
+    mocker: MockerFixture, sample_pdf: str, tmp_path: Path
+) -> None:
+    provider = SleepingProvider()
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    progress_callback = mocker.MagicMock()
+
+    def cancel_when_running() -> None:
+        while not provider._procs:
+            time.sleep(0.01)
+        provider.cancel(doc)
+
+    thread = threading.Thread(target=cancel_when_running)
+    thread.start()
+    start = time.monotonic()
+    provider.convert(doc, None, progress_callback)
+    thread.join()
+
+    assert time.monotonic() - start < 10
+    assert doc.is_failed()
+    progress_callback.assert_called_with(True, "The conversion was cancelled", 0)
+    assert not provider._procs
+    assert not provider.is_cancelled(doc)
+
+
+def test_cancel_queued_conversion(mocker: MockerFixture, sample_pdf: str) -> None:
+    provider = SleepingProvider()
+    start_proc = mocker.spy(provider, "start_doc_to_pixels_proc")
+    mark_as_converting = mocker.spy(Document, "mark_as_converting")
+    doc = Document(sample_pdf)
+
+    provider.cancel(doc)
+    provider.convert(doc, None)
+
+    assert doc.is_failed()
+    start_proc.assert_not_called()
+    mark_as_converting.assert_not_called()
+    assert not provider.is_cancelled(doc)
+
+
+def encode_ints(*nums: int) -> bytes:
+    return b"".join(n.to_bytes(errors.INT_BYTES, "big", signed=False) for n in nums)
+
+
+def test_read_header_legacy() -> None:
+    f = io.BytesIO(encode_ints(3))
+    assert base.ProtocolReader(f).read_header() == (3, errors.DEFAULT_DPI, 0)
+
+
+def test_read_header_extended() -> None:
+    f = io.BytesIO(
+        encode_ints(errors.PROTOCOL_MAGIC, errors.PROTOCOL_VERSION, 0, 300, 3)
+    )
+    assert base.ProtocolReader(f).read_header() == (3, 300, 0)
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        # Unknown version
+        (errors.PROTOCOL_MAGIC, errors.PROTOCOL_VERSION + 1, 0, 150, 1),
+        # Features that the host did not advertise
+        (errors.PROTOCOL_MAGIC, errors.PROTOCOL_VERSION, 0x8000, 150, 1),
+        # Resolution that does not match a fidelity profile
+        (errors.PROTOCOL_MAGIC, errors.PROTOCOL_VERSION, 0, 1200, 1),
+    ],
+)
+def test_read_header_invalid(header: tuple[int, ...]) -> None:
+    with pytest.raises(errors.InvalidProtocolHeader):
+        base.ProtocolReader(io.BytesIO(encode_ints(*header))).read_header()
+
+
+def test_read_header_truncated() -> None:
+    f = io.BytesIO(encode_ints(errors.PROTOCOL_MAGIC, errors.PROTOCOL_VERSION))
+    with pytest.raises(errors.ConverterProcException):
+        base.ProtocolReader(f).read_header()
+
+
+def test_unknown_fidelity() -> None:
+    with pytest.raises(ValueError):
+        SleepingProvider(fidelity="ultra")
+
+
+class PagesProvider(SleepingProvider):
+    """Isolation provider whose conversion process sends a single white page."""
+
+    def start_doc_to_pixels_proc(self, document: Document) -> subprocess.Popen:
+        script = (
+            "import os, sys; sys.stdin.buffer.read();"
+            " dpi = int(os.environ['DZ_DPI']);"
+            f" ints = [{errors.PROTOCOL_MAGIC}, {errors.PROTOCOL_VERSION}, 0, dpi, 1,"
+            " dpi, dpi];"
+            " sys.stdout.buffer.write(b''.join(i.to_bytes(2, 'big') for i in ints));"
+            " sys.stdout.buffer.write(b'\\xff' * dpi * dpi * 3)"
+        )
+        return subprocess.Popen(
+            [sys.executable, "-c", script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            env={**os.environ, **self.get_protocol_env()},
+        )
+
+
+@pytest.mark.parametrize("fidelity", list(errors.FIDELITY_PROFILES))
+def test_fidelity_profile(fidelity: str, sample_pdf: str, tmp_path: Path) -> None:
+    provider = PagesProvider(fidelity=fidelity)
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    provider.convert(doc, None)
+
+    assert doc.is_safe()
+    # The sandbox sends a page that is one inch wide and high, in pixels.
+    with fitz.open(doc.output_filename) as safe_doc:
+        assert safe_doc[0].rect.width == pytest.approx(72)
+        assert safe_doc[0].rect.height == pytest.approx(72)
+        xref = safe_doc[0].get_images()[0][0]
+        assert safe_doc.extract_image(xref)["width"] == provider.dpi
+
+
+class TricklingStream(io.RawIOBase):
+    """Stream that returns at most one byte per read, like a slow pipe."""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: typing.Any) -> int:
+        return self.data.readinto(memoryview(b)[:1])
+
+
+def test_protocol_reader_partial_reads() -> None:
+    stream = TricklingStream(encode_ints(9, 2, 1) + b"\xff" * 2)
+    reader = base.ProtocolReader(typing.cast(typing.IO[bytes], stream))
+    assert reader.read_int() == 9
+    assert (reader.read_int(), reader.read_int()) == (2, 1)
+    assert reader.read_pixels(2) == b"\xff\xff"
+    with pytest.raises(errors.ConverterProcException):
+        reader.read_int()
+
+
+def test_protocol_reader_reuses_page_buffer() -> None:
+    reader = base.ProtocolReader(io.BytesIO(b"a" * 4 + b"b" * 4 + b"c" * 2))
+    first = reader.read_pixels(4)
+    assert first == b"aaaa"
+    second = reader.read_pixels(4)
+    assert second is first
+    assert second == b"bbbb"
+    # The buffer is resized in place for pages of a different size.
+    assert reader.read_pixels(2) is first
+    assert first == b"cc"
+
+
+def encode_frame(frame: bytes) -> bytes:
+    length = len(frame).to_bytes(errors.FRAME_LENGTH_BYTES, "big", signed=False)
+    return length + frame
+
+
+def test_read_compressed_pixels() -> None:
+    pixels = b"\xff" * 1000 + b"\x00" * 1000
+    f = io.BytesIO(encode_frame(zlib.compress(pixels)) + b"next")
+    assert base.ProtocolReader(f).read_compressed_pixels(len(pixels)) == pixels
+    assert f.read() == b"next"
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        # Decompression bomb: decompresses to much more than the page size
+        encode_frame(zlib.compress(b"\x00" * 10_000_000)),
+        # Decompresses to less than the page size
+        encode_frame(zlib.compress(b"\x00" * 999)),
+        # Trailing data after the compressed stream
+        encode_frame(zlib.compress(b"\x00" * 1000) + b"\x00"),
+        # Not compressed with zlib
+        encode_frame(b"\x00" * 1000),
+        # Frame larger than the page could ever compress to
+        encode_frame(b"\x00" * 2000),
+    ],
+)
+def test_read_compressed_pixels_invalid(frame: bytes) -> None:
+    with pytest.raises(errors.InvalidCompressedPage):
+        base.ProtocolReader(io.BytesIO(frame)).read_compressed_pixels(1000)
+
+
+def test_read_compressed_pixels_length_is_checked_first() -> None:
+    # The frame length is rejected before trying to read the frame.
+    f = io.BytesIO((2**31).to_bytes(errors.FRAME_LENGTH_BYTES, "big"))
+    with pytest.raises(errors.InvalidCompressedPage):
+        base.ProtocolReader(f).read_compressed_pixels(1000)
+
+
+class OutputProvider(SleepingProvider):
+    """Isolation provider whose conversion process sends a predefined output."""
+
+    def __init__(self, output: bytes) -> None:
+        super().__init__()
+        self.output = output
+
+    def start_doc_to_pixels_proc(self, document: Document) -> subprocess.Popen:
+        script = (
+            "import sys; sys.stdin.buffer.read();"
+            f" sys.stdout.buffer.write(bytes.fromhex('{self.output.hex()}'))"
+        )
+        return subprocess.Popen(
+            [sys.executable, "-c", script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def colorspace_output(colorspace: int, pixels: bytes) -> bytes:
+    header = encode_ints(
+        errors.PROTOCOL_MAGIC,
+        errors.PROTOCOL_VERSION,
+        errors.FEATURE_COLORSPACE,
+        errors.DEFAULT_DPI,
+        1,  # Pages
+    )
+    return header + encode_ints(10, 2, colorspace) + pixels
+
+
+@pytest.mark.parametrize(
+    "colorspace, pixels, pdf_colorspace",
+    [
+        (errors.COLORSPACE_RGB, b"\xff" * 10 * 2 * 3, 3),
+        (errors.COLORSPACE_GRAY, b"\xff" * 10 * 2, 1),
+        # Rows of 10 pixels are padded to 2 bytes.
+        (errors.COLORSPACE_BILEVEL, b"\x80\x00" * 2, 1),
+    ],
+)
+def test_page_colorspace(
+    colorspace: int,
+    pixels: bytes,
+    pdf_colorspace: int,
+    sample_pdf: str,
+    tmp_path: Path,
+) -> None:
+    provider = OutputProvider(colorspace_output(colorspace, pixels))
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    provider.convert(doc, None)
+
+    assert doc.is_safe()
+    with fitz.open(doc.output_filename) as safe_doc:
+        xref = safe_doc[0].get_images()[0][0]
+        image = safe_doc.extract_image(xref)
+        assert image["colorspace"] == pdf_colorspace
+        assert (image["width"], image["height"]) == (10, 2)
+
+
+def test_compressed_page(sample_pdf: str, tmp_path: Path) -> None:
+    header = encode_ints(
+        errors.PROTOCOL_MAGIC,
+        errors.PROTOCOL_VERSION,
+        errors.FEATURE_COLORSPACE | errors.FEATURE_COMPRESSION,
+        errors.DEFAULT_DPI,
+        1,  # Pages
+    )
+    page = encode_ints(10, 2, errors.COLORSPACE_GRAY)
+    page += encode_frame(zlib.compress(b"\x80" * 10 * 2))
+    provider = OutputProvider(header + page)
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    provider.convert(doc, None)
+
+    assert doc.is_safe()
+    with fitz.open(doc.output_filename) as safe_doc:
+        pixmap = safe_doc[0].get_pixmap(dpi=errors.DEFAULT_DPI, colorspace=fitz.csGRAY)
+        assert set(pixmap.samples) == {0x80}
+
+
+def test_bilevel_page_pixels() -> None:
+    # The first pixel of each row is black, and the rest are white.
+    pixmap = base.pixels_to_pixmap(b"\x80\x00" * 2, 10, 2, errors.COLORSPACE_BILEVEL)
+    assert pixmap.samples == (b"\x00" + b"\xff" * 9) * 2
+    assert pixmap.colorspace.n == 1
+
+    # Rows without padding
+    pixmap = base.pixels_to_pixmap(b"\x0f\xf0", 16, 1, errors.COLORSPACE_BILEVEL)
+    assert pixmap.samples == b"\xff" * 4 + b"\x00" * 8 + b"\xff" * 4
+
+    with pytest.raises(ValueError):
+        base.pixels_to_pixmap(b"\x80\x00" * 3, 10, 2, errors.COLORSPACE_BILEVEL)
+
+
+@pytest.mark.parametrize(
+    "output, error",
+    [
+        # Unknown colorspace
+        (colorspace_output(3, b"\xff" * 10 * 2 * 3), errors.InvalidPageColorspace),
+        # Too few pixels for a grayscale page
+        (
+            colorspace_output(errors.COLORSPACE_GRAY, b"\xff" * 10),
+            errors.UnexpectedConversionError,
+        ),
+    ],
+)
+def test_page_colorspace_invalid(
+    output: bytes,
+    error: type[errors.ConversionException],
+    mocker: MockerFixture,
+    sample_pdf: str,
+    tmp_path: Path,
+) -> None:
+    provider = OutputProvider(output)
+    mocker.patch.object(
+        provider, "get_proc_exception", return_value=errors.UnexpectedConversionError()
+    )
+    progress_callback = mocker.MagicMock()
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    provider.convert(doc, None, progress_callback)
+
+    assert doc.is_failed()
+    progress_callback.assert_called_with(True, error.error_message, 0)
+    assert not os.path.exists(doc.output_filename)
+
+
+class ThreadedOcrProvider(OutputProvider):
+    """Isolation provider that OCRs pages in threads, so that OCR can be mocked."""
+
+    def create_ocr_pool(self, max_workers: int) -> Executor:
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def test_ocr_pages_in_order(
+    mocker: MockerFixture, sample_pdf: str, tmp_path: Path
+) -> None:
+    def fake_ocr_page_worker(
+        pixels: bytes,
+        width: int,
+        height: int,
+        ocr_lang: str,
+        tessdata_dir: str,
+        dpi: int,
+        colorspace: int,
+    ) -> bytes:
+        # Complete the pages out of order.
+        time.sleep(random.uniform(0, 0.02))
+        pixmap = base.pixels_to_pixmap(pixels, width, height, colorspace, dpi)
+        page_doc = fitz.Document()
+        page_doc.insert_file(pixmap)
+        return page_doc.tobytes()
+
+    mocker.patch.object(base, "_ocr_page_worker", fake_ocr_page_worker)
+    mocker.patch.object(base, "get_tessdata_dir", return_value=tmp_path)
+    n_pages = 20
+    output = encode_ints(n_pages)
+    for width in range(1, n_pages + 1):
+        output += encode_ints(width, 1) + b"\xff" * width * 3
+    provider = ThreadedOcrProvider(output)
+    provider.ocr_min_workers = 2
+    provider.ocr_max_workers = 4
+    provider.ocr_max_queued = 2
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    provider.convert(doc, "eng")
+
+    assert doc.is_safe()
+    with fitz.open(doc.output_filename) as safe_doc:
+        widths = [
+            safe_doc.extract_image(page.get_images()[0][0])["width"]
+            for page in safe_doc
+        ]
+    assert widths == list(range(1, n_pages + 1))
+    stats = provider.pop_ocr_stats(doc)
+    assert stats is not None
+    assert stats["pages"] == n_pages
+    assert provider.pop_ocr_stats(doc) is None
+
+
+class ThumbnailProvider(OutputProvider):
+    """Isolation provider that taps the pages, before they are assembled."""
+
+    def create_pipeline(self, *args: typing.Any) -> Pipeline:
+        pipeline = super().create_pipeline(*args)
+        pipeline.add_stage("thumbnail", self.thumbnail_pages, before="assemble")
+        return pipeline
+
+    def thumbnail_pages(self, pages: Iterator[Page]) -> Iterator[Page]:
+        self.thumbnails: list[tuple[int, int]] = []
+        for page in pages:
+            assert page.pdf is not None
+            self.thumbnails.append((page.number, page.pdf.page_count))
+            yield page
+
+
+def test_pipeline_stage(sample_pdf: str, tmp_path: Path) -> None:
+    n_pages = 3
+    output = encode_ints(n_pages)
+    for width in range(1, n_pages + 1):
+        output += encode_ints(width, 1) + b"\xff" * width * 3
+    provider = ThumbnailProvider(output)
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    provider.convert(doc, None)
+
+    assert doc.is_safe()
+    assert provider.thumbnails == [(1, 1), (2, 1), (3, 1)]
+    stats = provider.pop_pipeline_stats(doc)
+    assert stats is not None
+    assert list(stats) == ["read", "encode", "thumbnail", "assemble", "write"]
+    assert all(s["pages"] == n_pages for s in stats.values())
+    assert provider.pop_pipeline_stats(doc) is None
+
+
+def test_no_stderr_sink_without_capture(sample_pdf: str, tmp_path: Path) -> None:
+    output = encode_ints(1) + encode_ints(1, 1) + b"\xff" * 3
+    provider = OutputProvider(output)
+    provider.stream_stderr = True
+    provider.stderr_log_dir = tmp_path / "logs"
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    provider.convert(doc, None)
+
+    # The stderr of the conversion process is not captured, so there is no log file.
+    assert doc.is_safe()
+    assert not provider.stderr_log_dir.exists()
+
+
+def test_pipeline_stats_bounded(
+    mocker: MockerFixture, sample_pdf: str, tmp_path: Path
+) -> None:
+    mocker.patch.object(base, "MAX_STATS_DOCUMENTS", 2)
+    output = encode_ints(1) + encode_ints(1, 1) + b"\xff" * 3
+    docs = [Document(sample_pdf, str(tmp_path / f"safe-{i}.pdf")) for i in range(3)]
+    provider = OutputProvider(output)
+    for doc in docs:
+        provider.convert(doc, None)
+        assert doc.is_safe()
+
+    assert list(provider.pipeline_stats) == [docs[1].id, docs[2].id]
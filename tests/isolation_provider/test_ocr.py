@@ -0,0 +1,80 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from dangerzone.isolation_provider import ocr
+
+
+@pytest.fixture(autouse=True)
+def cpus(mocker: MockerFixture) -> int:
+    mocker.patch("os.cpu_count", return_value=8)
+    return 8
+
+
+def complete_window(
+    scaler: ocr.OcrScaler, latency: float, waiting: bool = True
+) -> None:
+    for _ in range(ocr.LATENCY_WINDOW):
+        scaler.page_done(latency, pages_waiting=waiting)
+
+
+def test_default_limits() -> None:
+    scaler = ocr.OcrScaler()
+    assert scaler.workers == 4
+    assert (scaler.min_workers, scaler.max_workers, scaler.max_queued) == (1, 8, 8)
+
+
+@pytest.mark.parametrize(
+    "min_workers, max_workers, max_queued",
+    [(0, 4, None), (5, 4, None), (1, 4, -1)],
+)
+def test_invalid_limits(
+    min_workers: int, max_workers: int, max_queued: int | None
+) -> None:
+    with pytest.raises(ValueError):
+        ocr.OcrScaler(min_workers, max_workers, max_queued)
+
+
+def test_scale_up_when_idle() -> None:
+    scaler = ocr.OcrScaler(max_workers=5, load_average=lambda: 2.0)
+    complete_window(scaler, 1.0)
+    assert scaler.workers == 5
+    # Adding the worker improved the throughput, but we reached the limit.
+    complete_window(scaler, 1.0)
+    assert scaler.workers == 5
+    assert scaler.peak_workers == 5
+
+
+def test_no_scale_up_without_waiting_pages() -> None:
+    scaler = ocr.OcrScaler(load_average=lambda: 0.0)
+    complete_window(scaler, 1.0, waiting=False)
+    assert scaler.workers == 4
+
+
+def test_scale_down_when_oversubscribed() -> None:
+    scaler = ocr.OcrScaler(min_workers=3, load_average=lambda: 12.0)
+    complete_window(scaler, 1.0)
+    assert scaler.workers == 3
+    complete_window(scaler, 1.0)
+    assert scaler.workers == 3
+
+
+def test_revert_scale_up_without_throughput_gain() -> None:
+    scaler = ocr.OcrScaler(load_average=lambda: None)
+    complete_window(scaler, 1.0)
+    assert scaler.workers == 5
+    # Each page became slower, and 5 workers are not faster than 4.
+    complete_window(scaler, 1.25)
+    assert scaler.workers == 4
+
+
+def test_utilisation(mocker: MockerFixture) -> None:
+    now = mocker.patch("time.monotonic", return_value=100.0)
+    scaler = ocr.OcrScaler(min_workers=2, max_workers=2)
+    now.return_value = 110.0
+    # 2 workers for 10 seconds, busy for 15 of the 20 worker-seconds
+    for _ in range(3):
+        scaler.page_done(5.0, pages_waiting=False)
+    assert scaler.utilisation() == pytest.approx(0.75)
+    stats = scaler.stats()
+    assert stats["pages"] == 3
+    assert stats["seconds_per_page"] == pytest.approx(5.0)
@@ -0,0 +1,81 @@
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from dangerzone.isolation_provider.pipeline import Page, Pipeline
+
+
+def double(pages: Iterator[Page]) -> Iterator[Page]:
+    for page in pages:
+        page.width *= 2
+        yield page
+
+
+def slow(pages: Iterator[Page]) -> Iterator[Page]:
+    for page in pages:
+        time.sleep(0.01)
+        yield page
+
+
+def test_stages_run_in_order() -> None:
+    seen = []
+
+    def record(pages: Iterator[Page]) -> Iterator[Page]:
+        for page in pages:
+            seen.append((page.number, page.width))
+            yield page
+
+    def source(pages: Iterator[Page]) -> Iterator[Page]:
+        for page in pages:
+            page.width = page.number
+            yield page
+
+    pipeline = Pipeline([("source", source), ("record", record)])
+    pipeline.add_stage("double", double, before="record")
+    assert pipeline.names == ["source", "double", "record"]
+
+    pipeline.run(Page(n) for n in range(1, 4))
+    assert seen == [(1, 2), (2, 4), (3, 6)]
+    assert {name: s["pages"] for name, s in pipeline.stats().items()} == {
+        "source": 3,
+        "double": 3,
+        "record": 3,
+    }
+
+
+def test_add_stage_invalid() -> None:
+    pipeline = Pipeline([("double", double)])
+    with pytest.raises(ValueError):
+        pipeline.add_stage("double", double)
+    with pytest.raises(ValueError):
+        pipeline.add_stage("slow", slow, before="missing")
+
+
+def test_stage_seconds_exclude_upstream() -> None:
+    pipeline = Pipeline([("slow", slow), ("double", double)])
+    pipeline.run(Page(n) for n in range(5))
+    stats = pipeline.stats()
+    assert stats["slow"]["seconds"] >= 0.05
+    assert stats["double"]["seconds"] < stats["slow"]["seconds"]
+
+
+def test_stages_are_closed_on_error() -> None:
+    closed = []
+
+    def buffering(pages: Iterator[Page]) -> Iterator[Page]:
+        try:
+            yield from pages
+        finally:
+            closed.append("buffering")
+
+    def failing(pages: Iterator[Page]) -> Iterator[Page]:
+        for page in pages:
+            if page.number == 2:
+                raise RuntimeError("Stage failed")
+            yield page
+
+    pipeline = Pipeline([("buffering", buffering), ("failing", failing)])
+    with pytest.raises(RuntimeError):
+        pipeline.run(Page(n) for n in range(1, 4))
+    assert closed == ["buffering"]
@@ -1,7 +1,9 @@
+import io
 import os
 import pathlib
 import subprocess
 import time
+import zipfile
 
 import pytest
 from pytest import MonkeyPatch
@@ -9,15 +11,45 @@ from pytest_mock import MockerFixture
 
 from dangerzone import conversion_errors as errors
 from dangerzone.document import Document
+from dangerzone.isolation_provider import qubes
 from dangerzone.isolation_provider.qubes import Qubes, is_qubes_native_conversion
+from dangerzone.settings import Settings
 
 from .base import IsolationProviderTermination, IsolationProviderTest
 
-# Run the tests in this module only if we can spawn disposable qubes.
-if not is_qubes_native_conversion():
-    pytest.skip("Qubes native conversion is not enabled", allow_module_level=True)
-elif os.environ.get("DUMMY_CONVERSION"):
-    pytest.skip("Dummy conversion is enabled", allow_module_level=True)
+# Run the conversion tests in this module only if we can spawn disposable qubes.
+requires_disposables = pytest.mark.skipif(
+    not is_qubes_native_conversion() or bool(os.environ.get("DUMMY_CONVERSION")),
+    reason="Qubes native conversion is not enabled, or dummy conversion is enabled",
+)
+
+
+@pytest.mark.parametrize(
+    "setting,available_mib,expected",
+    [
+        (None, None, qubes.DEFAULT_PARALLEL_CONVERSIONS),
+        (4, None, 4),
+        (4, 2048, 2),
+        (4, 100, 1),
+        (0, 8192, qubes.DEFAULT_PARALLEL_CONVERSIONS),
+    ],
+)
+def test_max_parallel_conversions(
+    mocker: MockerFixture,
+    isolated_settings: Settings,
+    setting: int | None,
+    available_mib: int | None,
+    expected: int,
+) -> None:
+    """Test that parallel disposable qubes are bounded by the available memory."""
+    isolated_settings.set("qubes_parallel_conversions", setting)
+    host_memory = None
+    if available_mib is not None:
+        host_memory = (8 * 2**30, available_mib * 2**20)
+    mocker.patch(
+        "dangerzone.isolation_provider.qubes.get_host_memory", return_value=host_memory
+    )
+    assert Qubes().get_max_parallel_conversions() == expected
 
 
 class QubesWait(Qubes):
@@ -52,6 +84,32 @@ def provider() -> QubesWait:
     return QubesWait()
 
 
+def test_teleport_dz_module(tmp_path: pathlib.Path) -> None:
+    """Test that the zipped dangerzone module is cached until its files change."""
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "conversion.py").write_text("x = 1\n")
+    (tmp_path / "README.md").write_text("Not Python")
+    qubes._zip_dz_module.cache_clear()
+
+    def teleport() -> zipfile.ZipFile:
+        pipe = io.BytesIO()
+        Qubes().teleport_dz_module(str(tmp_path), pipe)
+        data = pipe.getvalue()
+        assert int.from_bytes(data[:4], "big") == len(data) - 4
+        return zipfile.ZipFile(io.BytesIO(data[4:]))
+
+    z = teleport()
+    assert z.namelist() == ["dangerzone_insecure_converter/", "pkg/conversion.py"]
+    teleport()
+    assert qubes._zip_dz_module.cache_info().misses == 1
+
+    (tmp_path / "pkg" / "conversion.py").write_text("x = 22\n")
+    z = teleport()
+    assert z.read("pkg/conversion.py") == b"x = 22\n"
+    assert qubes._zip_dz_module.cache_info().misses == 2
+
+
+@requires_disposables
 class TestQubes(IsolationProviderTest):
     def test_out_of_ram(
         self,
@@ -78,5 +136,6 @@ class TestQubes(IsolationProviderTest):
             assert provider.get_proc_exception(proc) == errors.QubesQrexecFailed
 
 
+@requires_disposables
 class TestQubesTermination(IsolationProviderTermination):
     pass
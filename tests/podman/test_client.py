@@ -0,0 +1,118 @@
+import http.server
+import json
+import socketserver
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from dangerzone.podman import client, errors
+
+
+class FakePodmanHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakePodmanService"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def reply(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.server.requests.append(("GET", self.path))
+        if self.path.endswith("/_ping"):
+            self.reply(200, b"OK")
+        elif "/images/json" in self.path:
+            self.reply(200, json.dumps([{"Id": "id", "Digest": "sha256:d"}]).encode())
+        else:
+            self.reply(404, json.dumps({"message": "no such endpoint"}).encode())
+
+    def do_POST(self) -> None:
+        self.server.requests.append(("POST", self.path))
+        if "/containers/missing/kill" in self.path:
+            self.reply(404, json.dumps({"message": "no such container"}).encode())
+        else:
+            self.reply(204, b"")
+
+
+class FakePodmanService(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, FakePodmanHandler)
+        self.connections = 0
+        self.requests: list[tuple[str, str]] = []
+
+
+@pytest.fixture
+def service(tmp_path: Path) -> Iterator[FakePodmanService]:
+    server = FakePodmanService(str(tmp_path / "s"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_socket_path_from_uri() -> None:
+    assert client.socket_path_from_uri("unix:///run/podman.sock") == "/run/podman.sock"
+    with pytest.raises(errors.PodmanError):
+        client.socket_path_from_uri("tcp://localhost:8080")
+
+
+def test_requests_reuse_connections(service: FakePodmanService) -> None:
+    with client.PodmanClient(base_url=f"unix://{service.server_address}") as c:
+        assert c.ping()
+        assert c.images("dangerzone") == [{"Id": "id", "Digest": "sha256:d"}]
+        c.kill("dangerzone-test")
+
+    assert service.connections == 1
+    filters = "%7B%22reference%22%3A+%5B%22dangerzone%22%5D%7D"
+    assert service.requests[1] == (
+        "GET",
+        f"/v4.0.0/libpod/images/json?filters={filters}",
+    )
+    assert service.requests[2] == (
+        "POST",
+        "/v4.0.0/libpod/containers/dangerzone-test/kill",
+    )
+
+
+def test_errors(service: FakePodmanService) -> None:
+    with client.PodmanClient(base_url=f"unix://{service.server_address}") as c:
+        with pytest.raises(errors.NotFound) as e:
+            c.kill("missing")
+        assert e.value.status_code == 404
+        assert "no such container" in str(e.value)
+
+        # The connection remains usable after an error.
+        assert c.ping()
+    assert service.connections == 1
+
+
+def test_reconnect_after_service_closes_connection(
+    service: FakePodmanService,
+) -> None:
+    with client.PodmanClient(base_url=f"unix://{service.server_address}") as c:
+        assert c.ping()
+        # Simulate the service closing the idle connection.
+        for conn in list(c._pool.queue):
+            assert conn.sock is not None
+            conn.sock.close()
+        assert c.ping()
+    assert service.connections == 2
+
+
+def test_service_unavailable(tmp_path: Path) -> None:
+    c = client.PodmanClient(base_url=f"unix://{tmp_path / 'missing'}")
+    with pytest.raises(OSError):
+        c.ping()
@@ -1,6 +1,9 @@
 import json
+import os
 import platform
+import time
 from collections.abc import Callable
+from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
@@ -9,7 +12,7 @@ from pytest_subprocess import FakeProcess
 
 from dangerzone import errors as dz_errors
 from dangerzone.isolation_provider.qubes import is_qubes_native_conversion
-from dangerzone.podman import errors
+from dangerzone.podman import errors, machine
 from dangerzone.podman.machine import PodmanMachineManager
 from dangerzone.util import get_version
 
@@ -107,6 +110,60 @@ def test_initialize_machine_stale_exists(
     assert rec_init.call_count() == 1
 
 
+def test_initialize_machine_with_other_resources(
+    machine_manager: PodmanMachineManager,
+    podman_register: Callable,
+    fp: FakeProcess,
+) -> None:
+    """Test that an existing machine is recreated if its resources have changed."""
+    version = get_version()
+    machine_name = f"dz-internal-{version}"
+    image_path = str(machine_manager._get_machine_image_path())
+
+    listed = {"Name": machine_name, "CPUs": 2, "Memory": str(2048 * 2**20)}
+    rec_list = podman_register(
+        ["machine", "list", "--format", "json"], stdout=json.dumps([listed])
+    )
+    rec_rm = podman_register(["machine", "rm", machine_name, "--force"])
+    rec_init = podman_register(
+        [
+            "machine",
+            "init",
+            machine_name,
+            "--cpus",
+            "4",
+            "--image",
+            image_path,
+            "--memory",
+            "4096",
+            "--timezone",
+            "Etc/UTC",
+        ]
+    )
+
+    # The machine is kept if it has the requested resources.
+    machine_manager.init(cpus=2, memory=2048)
+    assert rec_rm.call_count() == 0
+    assert rec_init.call_count() == 0
+
+    # The machine is not resized while it's running.
+    rec_list = podman_register(
+        ["machine", "list", "--format", "json"],
+        stdout=json.dumps([{**listed, "Running": True}]),
+    )
+    machine_manager.init(cpus=4, memory=4096)
+    assert rec_rm.call_count() == 0
+    assert rec_init.call_count() == 0
+
+    rec_list = podman_register(
+        ["machine", "list", "--format", "json"], stdout=json.dumps([listed])
+    )
+    machine_manager.init(cpus=4, memory=4096)
+    assert rec_list.call_count() == 1
+    assert rec_rm.call_count() == 1
+    assert rec_init.call_count() == 1
+
+
 def test_start_machine_success(
     machine_manager: PodmanMachineManager, podman_register: Callable
 ) -> None:
@@ -303,3 +360,80 @@ def test_initialize_machine_with_timezone(
     machine_manager.init(timezone="America/New_York")
     assert rec_list.call_count() == 1
     assert rec_init.call_count() == 1
+
+
+def test_machine_lease(isolated_machine_leases: Path) -> None:
+    """Test that leases mark the Podman machine as used."""
+    lease = machine.MachineLease()
+    lease.acquire()
+    assert machine.count_active_leases() == 1
+    assert machine.idle_seconds() < 5
+
+    # Leases of processes that have exited are cleaned up.
+    stale = isolated_machine_leases / "12345678.lease"
+    stale.touch()
+    assert machine.count_active_leases() == 1
+    assert not stale.exists()
+
+    lease.release()
+    assert machine.count_active_leases() == 0
+    assert not lease.path.exists()
+
+
+def test_machine_lease_lock_timeout(
+    mocker: MockerFixture, isolated_machine_leases: Path
+) -> None:
+    """Test that acquiring a lease fails if the machine lock is held for too long."""
+    mocker.patch.object(machine, "LOCK_TIMEOUT", 0.2)
+    lease = machine.MachineLease()
+    with (
+        machine._locked(isolated_machine_leases / "machine.lock"),
+        pytest.raises(dz_errors.MachineLeaseError),
+    ):
+        lease.acquire()
+    assert machine.count_active_leases() == 0
+
+    lease.acquire()
+    assert machine.count_active_leases() == 1
+    lease.release()
+
+
+def test_stop_if_idle(
+    mocker: MockerFixture,
+    machine_manager: PodmanMachineManager,
+    isolated_machine_leases: Path,
+) -> None:
+    """Test that the Podman machine stops only when it's idle."""
+    mocker.patch.object(machine_manager, "is_running", return_value=True)
+    mock_stop = mocker.patch.object(machine_manager, "stop")
+
+    lease = machine.MachineLease()
+    lease.acquire()
+    assert not machine_manager.stop_if_idle(idle_timeout=0)
+
+    lease.release()
+    assert not machine_manager.stop_if_idle(idle_timeout=60)
+    mock_stop.assert_not_called()
+
+    last_used = isolated_machine_leases / "last-used"
+    os.utime(last_used, (time.time() - 120, time.time() - 120))
+    assert machine_manager.stop_if_idle(idle_timeout=60)
+    mock_stop.assert_called_once()
+
+
+def test_reap_single_reaper(
+    mocker: MockerFixture,
+    machine_manager: PodmanMachineManager,
+    isolated_machine_leases: Path,
+) -> None:
+    """Test that only one reaper runs at a time."""
+    mock_stop_if_idle = mocker.patch.object(
+        machine_manager, "stop_if_idle", side_effect=[False, True]
+    )
+
+    with machine._locked(isolated_machine_leases / "reaper.lock"):
+        machine_manager.reap(idle_timeout=60, check_interval=0)
+    mock_stop_if_idle.assert_not_called()
+
+    machine_manager.reap(idle_timeout=60, check_interval=0)
+    assert mock_stop_if_idle.call_count == 2
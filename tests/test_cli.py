@@ -2,6 +2,7 @@ import copy
 import os
 import platform
 import shutil
+import subprocess
 import sys
 import tempfile
 import traceback
@@ -189,6 +190,30 @@ class TestCliBasic(TestCli):
             version = f.read().strip()
             assert version in result.stdout
 
+    def test_import_time(self) -> None:
+        """Check that the CLI does not import heavy modules before it needs them.
+
+        Commands like ``--version``, or invocations with invalid arguments, should
+        start fast, so the isolation providers (PyMuPDF), the updater (requests,
+        markdown) and the GUI (PySide) must not be imported along with the CLI.
+        """
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import dangerzone.cli"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Each line has the format: "import time: <self us> | <cumulative us> | <name>"
+        imports = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            imports[name.strip()] = int(cumulative)
+
+        heavy = {"fitz", "pymupdf", "requests", "markdown", "PySide2", "PySide6"}
+        assert not heavy & imports.keys()
+
     @pytest.mark.skipif(
         bool(os.environ.get("DUMMY_CONVERSION") or os.environ.get("QUBES_CONVERSION")),
         reason="Test requires a container-based isolation provider",
@@ -337,6 +362,96 @@ class TestCliConversion(TestCliBasic):
         result = self.run_cli(['--output-filename="output.pdf"'] + file_paths)
         result.assert_failure()
 
+    def test_recursive(self, tmp_path: Path, sample_pdf: str) -> None:
+        docs_dir = tmp_path / "docs"
+        (docs_dir / "sub").mkdir(parents=True)
+        for path in ["1.pdf", "sub/2.pdf"]:
+            shutil.copyfile(sample_pdf, docs_dir / path)
+        (docs_dir / "notes.txt").write_text("not supported")
+
+        result = self.run_cli(["--recursive", str(docs_dir)])
+        result.assert_success()
+
+        assert (docs_dir / f"1{SAFE_EXTENSION}").exists()
+        assert (docs_dir / "sub" / f"2{SAFE_EXTENSION}").exists()
+        assert len(os.listdir(docs_dir)) == 4
+
+        # Converting the directory again must not convert the safe documents.
+        result = self.run_cli(["--recursive", str(docs_dir)])
+        result.assert_success()
+        assert len(os.listdir(docs_dir)) == 4
+        assert len(os.listdir(docs_dir / "sub")) == 2
+
+    def test_files_from(self, tmp_path: Path, sample_pdf: str) -> None:
+        file_paths = []
+        for filename in ["1.pdf", "2.pdf", "notes.txt"]:
+            doc_path = tmp_path / filename
+            shutil.copyfile(sample_pdf, doc_path)
+            file_paths.append(str(doc_path))
+        files_from = tmp_path / "files.txt"
+        files_from.write_text("\n".join(file_paths) + "\n")
+
+        result = self.run_cli(["--files-from", str(files_from)])
+        result.assert_success()
+
+        assert (tmp_path / f"1{SAFE_EXTENSION}").exists()
+        assert (tmp_path / f"2{SAFE_EXTENSION}").exists()
+        assert not (tmp_path / f"notes{SAFE_EXTENSION}").exists()
+
+    def test_files_from_missing_file(self, tmp_path: Path, sample_pdf: str) -> None:
+        files_from = tmp_path / "files.txt"
+        files_from.write_text(str(tmp_path / "missing.pdf"))
+
+        result = self.run_cli(["--files-from", str(files_from), sample_pdf])
+        result.assert_failure(message="missing.pdf")
+
+    def test_files_from_missing_list(self, tmp_path: Path) -> None:
+        result = self.run_cli(["--files-from", str(tmp_path / "missing.txt")])
+        result.assert_failure(message="does not exist")
+
+    def test_resume(self, tmp_path: Path, sample_pdf: str) -> None:
+        docs_dir = tmp_path / "docs"
+        docs_dir.mkdir()
+        shutil.copyfile(sample_pdf, docs_dir / "1.pdf")
+        files_from = tmp_path / "files.txt"
+        files_from.write_text(f"{docs_dir / '1.pdf'}\n{docs_dir / '2.pdf'}\n")
+
+        result = self.run_cli(["--files-from", str(files_from)])
+        result.assert_failure(message="2.pdf")
+        assert (docs_dir / f"1{SAFE_EXTENSION}").exists()
+
+        # Fix the missing document, and resume the conversion.
+        shutil.copyfile(sample_pdf, docs_dir / "2.pdf")
+        result = self.run_cli(["--files-from", str(files_from), "--resume"])
+        result.assert_success()
+        assert "Skipped 1 document(s) converted in a previous run" in result.stdout
+        assert (docs_dir / f"2{SAFE_EXTENSION}").exists()
+
+        # Once the job completes, there is nothing left to resume.
+        result = self.run_cli(["--files-from", str(files_from), "--resume"])
+        result.assert_success()
+        assert "Skipped" not in result.stdout
+
+    def test_debug_log_dir(self, tmp_path: Path, sample_pdf: str) -> None:
+        doc_path = tmp_path / "doc.pdf"
+        shutil.copyfile(sample_pdf, doc_path)
+        log_dir = tmp_path / "logs"
+
+        result = self.run_cli(
+            ["--debug", "--debug-log-dir", str(log_dir), str(doc_path)]
+        )
+        result.assert_success()
+        assert len(list(log_dir.glob("doc-to-pixels-*.log"))) == 1
+        assert "DOC TO PIXELS LOG START" not in result.stdout
+
+    def test_recursive_fail_on_output_filename(
+        self, tmp_path: Path, sample_pdf: str
+    ) -> None:
+        result = self.run_cli(
+            ["--output-filename", str(tmp_path / "out.pdf"), "--recursive", "."]
+        )
+        result.assert_failure(message="can only be used with one input file")
+
     def test_archive(self, tmp_path: Path, sample_pdf: str) -> None:
         original_doc_path = str(tmp_path / "doc.pdf")
         safe_doc_path = str(tmp_path / f"doc{SAFE_EXTENSION}")
@@ -351,6 +466,25 @@ class TestCliConversion(TestCliBasic):
         assert os.path.exists(archived_doc_path)
         assert os.path.exists(safe_doc_path)
 
+    def test_files_from_archive_bad_entry(
+        self, tmp_path: Path, sample_pdf: str
+    ) -> None:
+        docs = [tmp_path / "1.pdf", tmp_path / "missing" / "2.pdf", tmp_path / "3.pdf"]
+        shutil.copyfile(sample_pdf, docs[0])
+        shutil.copyfile(sample_pdf, docs[2])
+        files_from = tmp_path / "files.txt"
+        files_from.write_text("\n".join(str(d) for d in docs) + "\n")
+
+        # A document in a nonexistent directory fails, but the rest of the batch is
+        # converted and archived.
+        result = self.run_cli(["--archive", "--files-from", str(files_from)])
+        result.assert_failure(message="2.pdf")
+        assert "Safe PDF(s) created successfully" in result.stdout
+        assert "Failed to convert document(s)" in result.stdout
+        for name in ("1", "3"):
+            assert (tmp_path / f"{name}{SAFE_EXTENSION}").exists()
+            assert (tmp_path / ARCHIVE_SUBDIR / f"{name}.pdf").exists()
+
     def test_dummy_conversion(self, tmp_path: Path, sample_pdf: str) -> None:
         self.run_cli([sample_pdf, "--unsafe-dummy-conversion"])
 
@@ -1,10 +1,16 @@
+import json
+import os
 import pathlib
 import subprocess
+import time
 from typing import Any
 
+import pytest
 from pytest_mock import MockerFixture
 
-from dangerzone import container_utils, settings
+from dangerzone import container_utils, errors, settings
+from dangerzone.podman.client import APIResponse
+from dangerzone.podman.errors import NotFound
 
 
 def test_get_podman_path(mocker: MockerFixture) -> None:
@@ -36,6 +42,7 @@ def test_create_containers_conf(mocker: MockerFixture, tmp_path: pathlib.Path) -
     seccomp_path = tmp_path / "seccomp.json"
     mocker.patch("dangerzone.container_utils.SECCOMP_PATH", seccomp_path)
     mocker.patch("os.cpu_count", return_value=4)
+    mocker.patch("dangerzone.container_utils.get_host_memory", return_value=None)
 
     path = tmp_path / "path" / "to" / "containers.conf"
     mocker.patch("platform.system", return_value="Windows")
@@ -44,10 +51,53 @@ def test_create_containers_conf(mocker: MockerFixture, tmp_path: pathlib.Path) -
     conf = path.read_text()
     assert "helper_binaries_dir" in conf
     assert "cpus=4" in conf
+    assert "memory=2560" in conf
     assert f'volumes=["{tmp_path}:{tmp_path}:ro"]'.replace("\\", "\\\\") in conf
 
+    # The file is not rewritten if its content has not changed.
+    mtime = path.stat().st_mtime_ns
+    write_text = mocker.spy(pathlib.Path, "write_text")
     container_utils.create_containers_conf()
     assert conf == path.read_text()
+    assert path.stat().st_mtime_ns == mtime
+    write_text.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "parallel,host_cpus,total_mib,expected",
+    [
+        (1, 8, None, (8, 2560)),
+        (3, 8, None, (8, 5632)),
+        (8, 4, None, (4, 13312)),
+        (3, 8, 7000, (8, 3072)),
+        (1, 1, 2048, (1, 2048)),
+        (0, 8, None, (8, 2560)),
+    ],
+)
+def test_get_machine_resources(
+    mocker: MockerFixture,
+    parallel: int,
+    host_cpus: int,
+    total_mib: int | None,
+    expected: tuple[int, int],
+) -> None:
+    mocker.patch("os.cpu_count", return_value=host_cpus)
+    host_memory = None
+    if total_mib is not None:
+        host_memory = (total_mib * 2**20, 512 * 2**20)
+    mocker.patch("dangerzone.container_utils.get_host_memory", return_value=host_memory)
+    assert container_utils.get_machine_resources(parallel) == expected
+
+
+def test_get_machine_resources_stable(mocker: MockerFixture) -> None:
+    """Test that the size of the machine does not follow the free memory."""
+    mocker.patch("os.cpu_count", return_value=8)
+    get_host_memory = mocker.patch("dangerzone.container_utils.get_host_memory")
+    sizes = set()
+    for available_mib in (1024, 3000, 3500, 12000):
+        get_host_memory.return_value = (16 * 2**30, available_mib * 2**20)
+        sizes.add(container_utils.get_machine_resources(3))
+    assert sizes == {(8, 5632)}
 
 
 def test_init_podman_command(mocker: MockerFixture) -> None:
@@ -197,3 +247,184 @@ def test_clear_old_images_deletes_digests(mocker: MockerFixture) -> None:
 
     # Check that we removed the old images
     mock_podman.return_value.run.assert_any_call(["rmi", "--force", *old_digests_full])
+
+
+def test_get_podman_client_disabled(mocker: MockerFixture) -> None:
+    """Test that we use the Podman CLI, unless the user has enabled the API."""
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+    assert container_utils.get_podman_client() is None
+    mock_podman.assert_not_called()
+
+
+def test_get_podman_client_fallback(
+    mocker: MockerFixture, isolated_settings: settings.Settings, caplog: Any
+) -> None:
+    """Test that we use the Podman CLI, if the Podman service fails to start."""
+    isolated_settings.set("podman_api", True)
+    mocker.patch("platform.system", return_value="Linux")
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+    mock_podman.return_value.wait_for_service.side_effect = container_utils.PodmanError(
+        "test error"
+    )
+
+    assert container_utils.get_podman_client() is None
+    mock_podman.return_value.stop_service.assert_called_once()
+    assert "Could not start the Podman service" in caplog.text
+
+
+def test_list_containers_api(mocker: MockerFixture) -> None:
+    """Test that list_containers queries the Podman service, if available."""
+    mock_client = mocker.patch("dangerzone.container_utils.get_podman_client")
+    mock_client.return_value.containers.return_value = [
+        {"Names": ["dangerzone-container1"]},
+        {"Names": ["other-container"]},
+    ]
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+
+    assert container_utils.list_containers() == ["dangerzone-container1"]
+    mock_client.return_value.containers.assert_called_once_with(all=True)
+    mock_podman.return_value.run.assert_not_called()
+
+
+def test_list_containers_api_fallback(mocker: MockerFixture, caplog: Any) -> None:
+    """Test that list_containers uses the Podman CLI, if the service fails."""
+    mock_client = mocker.patch("dangerzone.container_utils.get_podman_client")
+    mock_client.return_value.containers.side_effect = ConnectionRefusedError()
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+    mock_podman.return_value.run.return_value = "dangerzone-container1"
+
+    assert container_utils.list_containers() == ["dangerzone-container1"]
+    assert "Could not list the containers with the Podman service" in caplog.text
+
+
+def test_kill_container_api(mocker: MockerFixture) -> None:
+    """Test that kill_container ignores containers that have already stopped."""
+    mock_client = mocker.patch("dangerzone.container_utils.get_podman_client")
+    mock_client.return_value.kill.side_effect = NotFound(
+        "Not Found", response=APIResponse(404, "Not Found", b"")
+    )
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+
+    container_utils.kill_container("test-container")
+    mock_client.return_value.kill.assert_called_once_with(
+        "test-container", timeout=container_utils.TIMEOUT_KILL
+    )
+    mock_podman.return_value.run.assert_not_called()
+
+
+def test_kill_containers(mocker: MockerFixture) -> None:
+    """Test that kill_containers kills and removes all containers at once."""
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+
+    container_utils.kill_containers(["dangerzone-1", "dangerzone-2"])
+    assert mock_podman.return_value.run.call_args_list == [
+        mocker.call(
+            ["kill", "dangerzone-1", "dangerzone-2"],
+            check=False,
+            timeout=container_utils.TIMEOUT_KILL,
+        ),
+        mocker.call(
+            ["rm", "--force", "--ignore", "dangerzone-1", "dangerzone-2"],
+            check=False,
+            timeout=container_utils.TIMEOUT_KILL,
+        ),
+    ]
+
+    mock_podman.reset_mock()
+    container_utils.kill_containers([])
+    mock_podman.return_value.run.assert_not_called()
+
+
+def event(name: str, status: str) -> bytes:
+    return json.dumps({"Name": name, "Status": status, "Type": "container"}).encode()
+
+
+def test_container_tracker(mocker: MockerFixture) -> None:
+    """Test that the container tracker follows the events of Dangerzone containers."""
+    read_fd, write_fd = os.pipe()
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+    mock_proc = mocker.MagicMock(spec=subprocess.Popen)
+    mock_proc.stdout = os.fdopen(read_fd, "rb")
+    mock_podman.return_value.run.return_value = mock_proc
+    mocker.patch(
+        "dangerzone.container_utils.list_containers",
+        return_value=["dangerzone-old"],
+    )
+
+    tracker = container_utils.ContainerTracker()
+    assert tracker.ensure_started()
+    assert tracker.ensure_started()
+    mock_podman.return_value.run.assert_called_once()
+    assert tracker.containers() == ["dangerzone-old"]
+
+    with os.fdopen(write_fd, "wb", buffering=0) as events:
+        events.write(event("dangerzone-new", "start") + b"\n")
+        events.write(event("other-container", "start") + b"\n")
+        deadline = time.monotonic() + 5
+        while "dangerzone-new" not in tracker.states and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # A container that is still running is reported as such.
+        assert tracker.states["dangerzone-new"] == "start"
+        assert not tracker.wait_until_removed("dangerzone-new", timeout=0.1)
+        assert sorted(tracker.containers()) == ["dangerzone-new", "dangerzone-old"]
+
+        events.write(event("dangerzone-new", "remove") + b"\n")
+        assert tracker.wait_until_removed("dangerzone-new", timeout=5)
+        assert tracker.containers() == ["dangerzone-old"]
+        assert tracker.is_alive()
+
+    # Once the stream ends, the tracker is no longer alive.
+    tracker.wait_until_removed("dangerzone-old", timeout=5)
+    assert not tracker.is_alive()
+
+
+def test_container_tracker_docker_events(mocker: MockerFixture) -> None:
+    """Test that the container tracker understands the events of Docker."""
+    read_fd, write_fd = os.pipe()
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+    mock_proc = mocker.MagicMock(spec=subprocess.Popen)
+    mock_proc.stdout = os.fdopen(read_fd, "rb")
+    mock_podman.return_value.run.return_value = mock_proc
+    mocker.patch("dangerzone.container_utils.list_containers", return_value=[])
+
+    def docker_event(name: str, action: str) -> bytes:
+        event = {
+            "Type": "container",
+            "Action": action,
+            "Actor": {"ID": "abcdef", "Attributes": {"name": name}},
+        }
+        return json.dumps(event).encode() + b"\n"
+
+    tracker = container_utils.ContainerTracker()
+    assert tracker.ensure_started()
+    with os.fdopen(write_fd, "wb", buffering=0) as events:
+        events.write(docker_event("dangerzone-new", "start"))
+        deadline = time.monotonic() + 5
+        while "dangerzone-new" not in tracker.states and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert tracker.states["dangerzone-new"] == "start"
+
+        events.write(docker_event("dangerzone-new", "destroy"))
+        assert tracker.wait_until_removed("dangerzone-new", timeout=5)
+        assert tracker.is_alive()
+
+        # If we can't parse an event, we stop tracking the containers, so that the
+        # callers query them instead.
+        events.write(b"garbage\n")
+        deadline = time.monotonic() + 5
+        while tracker.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not tracker.is_alive()
+
+
+def test_container_tracker_failure(mocker: MockerFixture) -> None:
+    """Test that the container tracker is not alive if Podman fails."""
+    mock_podman = mocker.patch("dangerzone.container_utils.init_podman_command")
+    mock_podman.side_effect = errors.ContainerException("test error")
+
+    tracker = container_utils.ContainerTracker()
+    assert not tracker.ensure_started()
+    assert not tracker.is_alive()
+    # We don't retry.
+    assert not tracker.ensure_started()
+    mock_podman.assert_called_once()
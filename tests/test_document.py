@@ -200,3 +200,68 @@ def test_mark_as_failed(sample_pdf: str) -> None:
     assert d.is_failed()
     assert not d.is_safe()
     assert not d.is_unconverted()
+
+
+def test_lazy_input_validation(tmp_path: Path) -> None:
+    missing = str(tmp_path / "missing.pdf")
+    d = Document(missing, lazy=True)
+    assert d.input_filename == missing
+    with pytest.raises(errors.InputFileNotFoundException):
+        d.validate_input()
+
+
+def test_lazy_archive_validation(mocker: MagicMock, sample_pdf: str) -> None:
+    validate_archive_dir = mocker.patch.object(
+        Document,
+        "validate_default_archive_dir",
+        side_effect=errors.UnwriteableArchiveDirException(),
+    )
+    # The archive dir of lazily created documents is checked only with their input.
+    d = Document(sample_pdf, archive=True, lazy=True)
+    assert d.archive_after_conversion
+    validate_archive_dir.assert_not_called()
+    with pytest.raises(errors.UnwriteableArchiveDirException):
+        d.validate_input()
+
+    with pytest.raises(errors.UnwriteableArchiveDirException):
+        Document(sample_pdf, archive=True)
+
+
+def test_cached_output_filenames(sample_pdf: str) -> None:
+    d = Document(sample_pdf)
+    assert d.default_output_filename.endswith(SAFE_EXTENSION)
+    d.suffix = "-trusted.pdf"
+    assert d.default_output_filename.endswith("-trusted.pdf")
+    assert d.sanitized_output_filename == d.default_output_filename
+
+    d.output_filename = "something_else.pdf"
+    assert d.sanitized_output_filename.endswith("something_else.pdf")
+
+
+def test_from_directory(tmp_path: Path) -> None:
+    docs_dir = tmp_path / "docs"
+    (docs_dir / "sub" / "nested").mkdir(parents=True)
+    (docs_dir / ARCHIVE_SUBDIR).mkdir()
+    for path in [
+        "b.pdf",
+        "a.PDF",
+        "notes.txt",
+        "sub/c.docx",
+        "sub/nested/d.pdf",
+        f"sub/nested/d{SAFE_EXTENSION}",
+        f"{ARCHIVE_SUBDIR}/e.pdf",
+    ]:
+        (docs_dir / path).write_bytes(b"")
+
+    docs = Document.from_directory(str(docs_dir), extensions=[".pdf", ".docx"])
+    names = [os.path.relpath(d.input_filename, docs_dir) for d in docs]
+    assert names == [
+        "a.PDF",
+        "b.pdf",
+        os.path.join("sub", "c.docx"),
+        os.path.join("sub", "nested", "d.pdf"),
+    ]
+
+    docs = Document.from_directory(str(docs_dir), recursive=False)
+    names = [os.path.relpath(d.input_filename, docs_dir) for d in docs]
+    assert names == ["a.PDF", "b.pdf", "notes.txt"]
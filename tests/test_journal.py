@@ -0,0 +1,82 @@
+import json
+import shutil
+from pathlib import Path
+
+from dangerzone.document import Document
+from dangerzone.journal import Journal, file_sha256
+
+
+def _convert(doc: Document) -> None:
+    doc.mark_as_converting()
+    shutil.copyfile(doc.input_filename, doc.output_filename)
+    doc.mark_as_safe()
+
+
+def test_journal_records_transitions(tmp_path: Path, sample_pdf: str) -> None:
+    journal = Journal(tmp_path / "journal.jsonl")
+    doc = Document(sample_pdf, str(tmp_path / "safe.pdf"))
+    doc.add_state_callback(journal.record)
+    _convert(doc)
+    journal.close()
+
+    lines = (tmp_path / "journal.jsonl").read_text().splitlines()
+    assert len(lines) == 2
+    record = Journal(tmp_path / "journal.jsonl", resume=True).records[sample_pdf]
+    assert record["state"] == "safe"
+    assert record["output"] == str(tmp_path / "safe.pdf")
+    assert record["sha256"] == file_sha256(sample_pdf)
+
+
+def test_journal_resume(tmp_path: Path, sample_pdf: str, sample_pdf2: str) -> None:
+    journal_path = tmp_path / "journal.jsonl"
+    journal = Journal(journal_path)
+    input_filename = str(tmp_path / "input.pdf")
+    shutil.copyfile(sample_pdf, input_filename)
+    converted = Document(input_filename)
+    failed = Document(sample_pdf2, str(tmp_path / "safe2.pdf"))
+    for doc in (converted, failed):
+        doc.add_state_callback(journal.record)
+    _convert(converted)
+    failed.mark_as_converting()
+    failed.mark_as_failed()
+    journal.close()
+    # Simulate a journal line that was not written completely.
+    with journal_path.open("a") as f:
+        f.write('{"input": ')
+
+    journal = Journal(journal_path, resume=True)
+    assert journal.is_completed(input_filename)
+    assert not journal.is_completed(sample_pdf2)
+    pending = list(journal.filter_pending([Document(input_filename), failed]))
+    assert pending == [failed]
+    assert journal.skipped == [input_filename]
+
+    # Documents that changed since their conversion must be converted again.
+    with open(input_filename, "ab") as f:
+        f.write(b"\n")
+    assert not journal.is_completed(input_filename)
+
+    # Starting a job from scratch discards the previous journal.
+    Journal(journal_path)
+    assert not journal_path.exists()
+
+
+def test_journal_incomplete_records(tmp_path: Path, sample_pdf: str) -> None:
+    journal_path = tmp_path / "journal.jsonl"
+    output = tmp_path / "safe.pdf"
+    shutil.copyfile(sample_pdf, output)
+    # A safe record without a hash (e.g., if the input could not be hashed), and
+    # records without a state or output.
+    records = [
+        {"input": sample_pdf, "output": str(output), "state": "safe"},
+        {"input": "/tmp/no-state.pdf", "output": str(output)},
+        {"input": "/tmp/no-output.pdf", "state": "safe", "sha256": None},
+    ]
+    journal_path.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+    journal = Journal(journal_path, resume=True)
+    for record in records:
+        assert not journal.is_completed(record["input"])
+    doc = Document(sample_pdf)
+    assert list(journal.filter_pending([doc])) == [doc]
+    assert journal.skipped == []
@@ -0,0 +1,162 @@
+import shutil
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from dangerzone import errors
+from dangerzone.document import Document
+from dangerzone.isolation_provider.dummy import Dummy
+from dangerzone.logic import DangerzoneCore
+from dangerzone.scheduler import Order, Scheduler
+
+
+@pytest.fixture
+def dangerzone() -> DangerzoneCore:
+    return DangerzoneCore(MagicMock())
+
+
+def test_add_duplicate_document(dangerzone: DangerzoneCore, sample_pdf: str) -> None:
+    dangerzone.add_document_from_filename(sample_pdf)
+    with pytest.raises(errors.AddedDuplicateDocumentException):
+        dangerzone.add_document(Document(sample_pdf))
+
+
+def test_add_many_documents(
+    dangerzone: DangerzoneCore, sample_pdf: str, tmp_path: Path
+) -> None:
+    filenames = []
+    for i in range(100):
+        filename = tmp_path / f"doc{i}.pdf"
+        shutil.copy(sample_pdf, filename)
+        filenames.append(str(filename))
+        dangerzone.add_document_from_filename(str(filename))
+
+    assert [doc.input_filename for doc in dangerzone.documents] == filenames
+    assert len(dangerzone.get_unconverted_documents()) == 100
+
+
+def test_documents_by_state(
+    dangerzone: DangerzoneCore, sample_pdf: str, sample_pdf2: str
+) -> None:
+    doc1 = Document(sample_pdf)
+    doc2 = Document(sample_pdf2)
+    dangerzone.add_document(doc1)
+    dangerzone.add_document(doc2)
+    assert dangerzone.get_unconverted_documents() == [doc1, doc2]
+
+    doc1.mark_as_converting()
+    assert dangerzone.get_unconverted_documents() == [doc2]
+    assert dangerzone.get_converting_documents() == [doc1]
+    assert dangerzone.has_pending_documents()
+
+    doc1.mark_as_safe()
+    doc2.mark_as_converting()
+    doc2.mark_as_failed()
+    assert dangerzone.get_converting_documents() == []
+    assert dangerzone.get_safe_documents() == [doc1]
+    assert dangerzone.get_failed_documents() == [doc2]
+
+    # Setting the state directly must update the indexes as well.
+    doc2.state = Document.STATE_SAFE
+    assert dangerzone.get_safe_documents() == [doc1, doc2]
+    assert dangerzone.get_failed_documents() == []
+    assert not dangerzone.has_pending_documents()
+
+
+def test_documents_by_state_insertion_order(
+    dangerzone: DangerzoneCore, sample_pdf: str, sample_pdf2: str
+) -> None:
+    doc1 = Document(sample_pdf)
+    doc2 = Document(sample_pdf2)
+    dangerzone.add_document(doc1)
+    dangerzone.add_document(doc2)
+
+    # Documents are returned in the order they were added, not in the order their
+    # conversion finished.
+    doc2.mark_as_converting()
+    doc2.mark_as_safe()
+    doc1.mark_as_converting()
+    doc1.mark_as_safe()
+    assert dangerzone.get_safe_documents() == [doc1, doc2]
+
+
+def test_clear_documents(dangerzone: DangerzoneCore, sample_pdf: str) -> None:
+    doc = Document(sample_pdf)
+    dangerzone.add_document(doc)
+    dangerzone.clear_documents()
+    assert dangerzone.documents == []
+    assert dangerzone.get_unconverted_documents() == []
+
+    # Documents that have been removed should not affect the indexes.
+    doc.mark_as_safe()
+    assert dangerzone.get_safe_documents() == []
+
+    dangerzone.add_document(Document(sample_pdf))
+    assert len(dangerzone.get_unconverted_documents()) == 1
+
+
+def test_convert_documents_order(tmp_path: Path, sample_pdf: str) -> None:
+    converted = []
+    provider = MagicMock()
+    provider.get_max_parallel_conversions.return_value = 1
+    provider.convert.side_effect = lambda doc, *args: converted.append(doc)
+    dangerzone = DangerzoneCore(provider)
+    large = tmp_path / "large.pdf"
+    large.write_bytes(Path(sample_pdf).read_bytes() * 10)
+    dangerzone.add_document_from_filename(str(large))
+    dangerzone.add_document_from_filename(sample_pdf)
+
+    dangerzone.convert_documents(None, order=Order.SIZE)
+    assert [doc.input_filename for doc in converted] == [sample_pdf, str(large)]
+
+    # An explicit priority comes before the size of the documents.
+    converted.clear()
+    dangerzone.convert_documents(
+        None,
+        order=Order.SIZE,
+        priority=lambda doc: int(doc.input_filename == str(large)),
+    )
+    assert [doc.input_filename for doc in converted] == [str(large), sample_pdf]
+
+
+def test_cancel_conversions(
+    dangerzone: DangerzoneCore, sample_pdf: str, sample_pdf2: str
+) -> None:
+    docs = [Document(sample_pdf), Document(sample_pdf2)]
+    scheduler = Scheduler(Order.ADDED)
+    for doc in docs:
+        dangerzone.add_document(doc)
+        dangerzone.submit_document(scheduler, doc)
+    docs[0].mark_as_converting()
+    provider = dangerzone.isolation_provider
+    assert isinstance(provider, MagicMock)
+
+    dangerzone.cancel_conversions([docs[1]])
+    provider.cancel.assert_called_once_with(docs[1])
+
+    provider.cancel.reset_mock()
+    docs[1].mark_as_failed()
+    dangerzone.cancel_conversions()
+    provider.cancel.assert_called_once_with(docs[0])
+
+
+def test_cancel_conversions_unsubmitted(
+    tmp_path: Path, sample_pdf: str, sample_pdf2: str
+) -> None:
+    dangerzone = DangerzoneCore(Dummy())
+    queued = Document(sample_pdf, str(tmp_path / "queued-safe.pdf"))
+    unsubmitted = Document(sample_pdf2, str(tmp_path / "unsubmitted-safe.pdf"))
+    dangerzone.add_document(queued)
+    dangerzone.add_document(unsubmitted)
+    dangerzone.submit_document(Scheduler(Order.ADDED), queued)
+
+    # Only the queued document must be cancelled, so that the other one can still be
+    # converted later on.
+    dangerzone.cancel_conversions()
+    assert dangerzone.isolation_provider.is_cancelled(queued)
+    assert not dangerzone.isolation_provider.is_cancelled(unsubmitted)
+
+    dangerzone.convert_documents(None)
+    assert queued.is_failed()
+    assert unsubmitted.is_safe()
@@ -0,0 +1,139 @@
+import threading
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from dangerzone import scheduler
+from dangerzone.document import Document
+from dangerzone.scheduler import ConversionWorkers, Order, Scheduler
+
+
+def create_doc(path: Path, size: int) -> Document:
+    path.write_bytes(b"A" * size)
+    return Document(str(path))
+
+
+@pytest.fixture
+def docs(tmp_path: Path) -> dict[str, Document]:
+    return {
+        "big.pdf": create_doc(tmp_path / "big.pdf", 3000),
+        "small.pdf": create_doc(tmp_path / "small.pdf", 1000),
+        "medium.docx": create_doc(tmp_path / "medium.docx", 600),
+    }
+
+
+def drain(sched: Scheduler) -> list[str]:
+    sched.close()
+    names = []
+    while (doc := sched.get()) is not None:
+        names.append(Path(doc.input_filename).name)
+        sched.task_done(doc)
+    return names
+
+
+def test_order_added(docs: dict[str, Document]) -> None:
+    sched = Scheduler(Order.ADDED)
+    for doc in docs.values():
+        sched.submit(doc)
+    assert drain(sched) == ["big.pdf", "small.pdf", "medium.docx"]
+
+
+def test_order_size(docs: dict[str, Document]) -> None:
+    sched = Scheduler(Order.SIZE)
+    for doc in docs.values():
+        sched.submit(doc)
+    # Office documents are more expensive to convert than their size suggests.
+    assert drain(sched) == ["small.pdf", "medium.docx", "big.pdf"]
+    assert set(sched.wait_times) == {doc.input_filename for doc in docs.values()}
+
+
+def test_priority(docs: dict[str, Document]) -> None:
+    sched = Scheduler(Order.SIZE)
+    sched.submit(docs["small.pdf"])
+    sched.submit(docs["big.pdf"], priority=1)
+    assert drain(sched) == ["big.pdf", "small.pdf"]
+
+
+def test_max_large_jobs(
+    mocker: MockerFixture, tmp_path: Path, docs: dict[str, Document]
+) -> None:
+    mocker.patch.object(scheduler, "LARGE_DOCUMENT_BYTES", 2000)
+    big2 = create_doc(tmp_path / "big2.pdf", 3000)
+    sched = Scheduler(Order.ADDED, max_large_jobs=1)
+    sched.submit(docs["big.pdf"])
+    sched.submit(big2)
+    sched.submit(docs["small.pdf"])
+
+    assert sched.get() == docs["big.pdf"]
+    # The second large document must wait for the first one to complete.
+    assert sched.get() == docs["small.pdf"]
+    sched.task_done(docs["small.pdf"])
+    sched.task_done(docs["big.pdf"])
+    assert sched.get() == big2
+
+    with pytest.raises(ValueError):
+        Scheduler(max_large_jobs=0)
+
+
+def test_held_back_priority(
+    mocker: MockerFixture, tmp_path: Path, docs: dict[str, Document]
+) -> None:
+    mocker.patch.object(scheduler, "LARGE_DOCUMENT_BYTES", 2000)
+    big2 = create_doc(tmp_path / "big2.pdf", 3000)
+    big3 = create_doc(tmp_path / "big3.pdf", 3000)
+    sched = Scheduler(Order.ADDED, max_large_jobs=1)
+    sched.submit(docs["big.pdf"])
+    sched.submit(big2)
+    sched.submit(docs["small.pdf"])
+    assert sched.get() == docs["big.pdf"]
+    assert sched.get() == docs["small.pdf"]
+
+    # Large documents that are held back still respect the priorities.
+    sched.submit(big3, priority=1)
+    sched.task_done(docs["big.pdf"])
+    assert sched.get() == big3
+    sched.task_done(big3)
+    assert drain(sched) == ["big2.pdf"]
+
+
+def test_max_pending(docs: dict[str, Document]) -> None:
+    sched = Scheduler(max_pending=1)
+    sched.submit(docs["big.pdf"])
+    submitted = threading.Event()
+
+    def submit() -> None:
+        sched.submit(docs["small.pdf"])
+        submitted.set()
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    assert not submitted.wait(0.1)
+    assert sched.get() == docs["big.pdf"]
+    assert submitted.wait(10)
+    thread.join()
+    assert drain(sched) == ["small.pdf"]
+
+
+def test_conversion_workers(docs: dict[str, Document]) -> None:
+    sched = Scheduler()
+    converted = []
+
+    def convert(document: Document) -> None:
+        converted.append(document)
+        if document is docs["small.pdf"]:
+            raise RuntimeError("Conversion failed")
+
+    workers = ConversionWorkers(sched, convert, max_workers=2)
+    workers.start()
+    for doc in docs.values():
+        sched.submit(doc)
+    sched.close()
+    workers.join()
+
+    # An error in a conversion does not stop the workers.
+    assert sorted(converted, key=id) == sorted(docs.values(), key=id)
+    assert not any(t.is_alive() for t in workers._threads)
+
+    with pytest.raises(ValueError):
+        ConversionWorkers(sched, convert, max_workers=0)